@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita a API de chat completions do Azure OpenAI
+
+Usado para benchmarks de carga e latência do sistema de geração de testes
+sem consumir cota real: concorrência em lote, retentativas, limite de taxa
+e cache podem ser exercitados offline.
+
+Uso:
+    python azure_stub_server.py --port 8089 --latency lognormal:-0.5,0.4 --throttle-rate 0.05
+
+    export AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089/
+    export AZURE_OPENAI_API_KEY=stub
+    python main_cli.py --directory src/
+"""
+
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+CHAT_PATH = re.compile(r'^/openai/deployments/(?P<deployment>[^/]+)/chat/completions$')
+
+
+class LatencyModel:
+    """Distribuição de latência configurável (fixed, uniform, normal, lognormal, exponential)."""
+
+    def __init__(self, spec: str = 'fixed:0'):
+        """Interpreta especificações como 'normal:0.8,0.2'."""
+        kind, _, params = spec.partition(':')
+        self.kind = kind.strip().lower()
+        self.params = [float(value) for value in params.split(',') if value.strip()]
+
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if self.kind not in expected or len(self.params) != expected[self.kind]:
+            raise ValueError(f"Latência inválida: {spec!r} (ex.: fixed:0.5, uniform:0.2,1.5, "
+                             f"normal:0.8,0.2, lognormal:-0.5,0.4, exponential:0.7)")
+
+    def sample(self) -> float:
+        """Sorteia uma latência em segundos (nunca negativa)."""
+        if self.kind == 'fixed':
+            value = self.params[0]
+        elif self.kind == 'uniform':
+            value = random.uniform(*self.params)
+        elif self.kind == 'normal':
+            value = random.gauss(*self.params)
+        elif self.kind == 'lognormal':
+            value = random.lognormvariate(*self.params)
+        else:
+            value = random.expovariate(1 / self.params[0]) if self.params[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+class StubState:
+    """Configuração e contadores compartilhados entre as threads do servidor."""
+
+    def __init__(self, args):
+        """Inicializa a partir dos argumentos de linha de comando."""
+        self.latency = LatencyModel(args.latency)
+        self.token_latency = args.token_latency
+        self.error_rate = args.error_rate
+        self.throttle_rate = args.throttle_rate
+        self.retry_after = args.retry_after
+        self.rpm = args.rpm
+        self.chunk_words = max(1, args.chunk_words)
+        self.verbose = args.verbose
+        self._lock = threading.Lock()
+        self._window = []
+        self.stats = {'requests': 0, 'completed': 0, 'streamed': 0,
+                      'errors': 0, 'throttled': 0, 'in_flight': 0, 'max_in_flight': 0}
+
+    def count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+            if key == 'in_flight':
+                self.stats['max_in_flight'] = max(self.stats['max_in_flight'], self.stats['in_flight'])
+
+    def over_rpm(self) -> bool:
+        """Indica se a janela do último minuto excedeu o limite de requisições."""
+        if not self.rpm:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._window = [moment for moment in self._window if now - moment < 60]
+            if len(self._window) >= self.rpm:
+                return True
+            self._window.append(now)
+            return False
+
+
+def build_completion_text(prompt: str) -> str:
+    """Gera um módulo pytest plausível para as funções e classes citadas no prompt."""
+    functions = [name for name in re.findall(r'^\s*(?:async\s+)?def (\w+)', prompt, re.MULTILINE)
+                 if not name.startswith('_')]
+    classes = re.findall(r'^class (\w+)', prompt, re.MULTILINE)
+
+    parts = ['import pytest', 'from unittest.mock import Mock, patch', '']
+    for name in dict.fromkeys(functions):
+        parts.append(f'''
+def test_{name}_caso_normal():
+    """Verifica o comportamento esperado de {name}."""
+    assert callable({name}) or True
+
+
+def test_{name}_caso_extremo():
+    """Verifica valores de borda em {name}."""
+    with pytest.raises(Exception):
+        raise ValueError("{name}")
+''')
+    for name in dict.fromkeys(classes):
+        parts.append(f'''
+class Test{name}:
+    """Testes da classe {name}."""
+
+    def test_instanciacao(self):
+        assert {name} is not None
+''')
+    if len(parts) == 3:
+        parts.append('\ndef test_placeholder():\n    assert True\n')
+    return '\n'.join(parts)
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, math.ceil(len(text) / 4))
+
+
+class AzureStubHandler(BaseHTTPRequestHandler):
+    """Handler HTTP/1.1 (keep-alive) compatível com o cliente openai/LangChain."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AzureOpenAIStub/1.0'
+
+    @property
+    def state(self) -> StubState:
+        return self.server.state
+
+    def log_message(self, format, *args):
+        if self.state.verbose:
+            sys.stderr.write(f"{self.address_string()} - {format % args}\n")
+
+    def do_GET(self):
+        if self.path.split('?')[0] in ('/health', '/stats'):
+            self._send_json(200, {'status': 'ok', **self.state.stats})
+        else:
+            self._send_json(404, {'error': {'code': 'NotFound', 'message': self.path}})
+
+    def do_POST(self):
+        match = CHAT_PATH.match(self.path.split('?')[0])
+        length = int(self.headers.get('Content-Length') or 0)
+        raw_body = self.rfile.read(length) if length else b''
+        if not match:
+            self._send_json(404, {'error': {'code': 'DeploymentNotFound', 'message': self.path}})
+            return
+
+        try:
+            body = json.loads(raw_body or b'{}')
+        except ValueError:
+            self._send_json(400, {'error': {'code': 'BadRequest', 'message': 'JSON inválido'}})
+            return
+
+        state = self.state
+        state.count('requests')
+        state.count('in_flight')
+        try:
+            self._handle_completion(match.group('deployment'), body)
+        finally:
+            state.count('in_flight', -1)
+
+    def _handle_completion(self, deployment: str, body: Dict[str, Any]):
+        state = self.state
+        time.sleep(state.latency.sample())
+
+        if state.over_rpm() or random.random() < state.throttle_rate:
+            state.count('throttled')
+            self._send_json(429, {'error': {
+                'code': '429',
+                'message': f'Requests to the ChatCompletions_Create Operation have exceeded '
+                           f'call rate limit. Please retry after {state.retry_after:g} seconds.'
+            }}, headers={'Retry-After': f'{state.retry_after:g}',
+                         'retry-after-ms': str(int(state.retry_after * 1000))})
+            return
+
+        if random.random() < state.error_rate:
+            state.count('errors')
+            self._send_json(500, {'error': {'code': 'InternalServerError',
+                                            'message': 'Falha simulada do servidor'}})
+            return
+
+        prompt = '\n'.join(self._message_text(message) for message in body.get('messages', []))
+        content = build_completion_text(prompt)
+        max_tokens = body.get('max_tokens')
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[:max_tokens * 4]
+        usage = {
+            'prompt_tokens': estimate_tokens(prompt),
+            'completion_tokens': estimate_tokens(content),
+        }
+        usage['total_tokens'] = usage['prompt_tokens'] + usage['completion_tokens']
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex[:24]}'
+        if body.get('stream'):
+            self._stream_completion(completion_id, deployment, content, usage, body)
+        else:
+            state.count('completed')
+            self._send_json(200, {
+                'id': completion_id,
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': deployment,
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': content}
+                }],
+                'usage': usage
+            })
+
+    def _stream_completion(self, completion_id: str, deployment: str, content: str,
+                           usage: Dict[str, int], body: Dict[str, Any]):
+        """Envia a resposta como Server-Sent Events, em pedaços de algumas palavras."""
+        state = self.state
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None,
+                  extra: Optional[Dict[str, Any]] = None) -> bytes:
+            payload = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': deployment,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}]
+            }
+            payload.update(extra or {})
+            return f"data: {json.dumps(payload)}\n\n".encode('utf-8')
+
+        try:
+            self.wfile.write(chunk({'role': 'assistant', 'content': ''}))
+            for piece in self._pieces(content):
+                time.sleep(state.token_latency * estimate_tokens(piece))
+                self.wfile.write(chunk({'content': piece}))
+                self.wfile.flush()
+            include_usage = (body.get('stream_options') or {}).get('include_usage')
+            self.wfile.write(chunk({}, 'stop', {'usage': usage} if include_usage else None))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            state.count('streamed')
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # cliente abortou a geração (ex.: early abort)
+
+    def _pieces(self, content: str) -> List[str]:
+        words = re.split(r'(\s+)', content)
+        size = self.state.chunk_words * 2
+        return [''.join(words[index:index + size]) for index in range(0, len(words), size)]
+
+    @staticmethod
+    def _message_text(message: Dict[str, Any]) -> str:
+        content = message.get('content', '')
+        if isinstance(content, list):
+            return '\n'.join(part.get('text', '') for part in content if isinstance(part, dict))
+        return str(content)
+
+    def _send_json(self, status: int, payload: Dict[str, Any],
+                   headers: Optional[Dict[str, str]] = None):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('apim-request-id', uuid.uuid4().hex)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def create_server(host: str, port: int, args) -> ThreadingHTTPServer:
+    """Cria o servidor (porta 0 escolhe uma porta livre)."""
+    server = ThreadingHTTPServer((host, port), AzureStubHandler)
+    server.daemon_threads = True
+    server.state = StubState(args)
+    return server
+
+
+def create_argument_parser():
+    """Cria parser para argumentos de linha de comando."""
+    parser = argparse.ArgumentParser(
+        description='Servidor local que imita o Azure OpenAI para benchmarks de carga e latência'
+    )
+    parser.add_argument('--host', default='127.0.0.1', help='Endereço de escuta')
+    parser.add_argument('--port', type=int, default=8089, help='Porta de escuta (0 = livre)')
+    parser.add_argument('--latency', default='lognormal:-0.5,0.4',
+                        help='Distribuição da latência até a resposta (ex.: fixed:0.5, '
+                             'uniform:0.2,1.5, normal:0.8,0.2, lognormal:-0.5,0.4, exponential:0.7)')
+    parser.add_argument('--token-latency', type=float, default=0.0,
+                        help='Atraso por token nos chunks de streaming (segundos)')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='Fração de respostas 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='Fração de respostas 429')
+    parser.add_argument('--retry-after', type=float, default=1.0,
+                        help='Valor do header Retry-After nas respostas 429 (segundos)')
+    parser.add_argument('--rpm', type=int, default=0,
+                        help='Limite de requisições por minuto (excedentes recebem 429)')
+    parser.add_argument('--chunk-words', type=int, default=4,
+                        help='Palavras por chunk no streaming')
+    parser.add_argument('--verbose', action='store_true', help='Registra cada requisição')
+    return parser
+
+
+def main():
+    """Função principal do servidor."""
+    args = create_argument_parser().parse_args()
+    try:
+        server = create_server(args.host, args.port, args)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+
+    host, port = server.server_address[:2]
+    print(f"🚀 Azure OpenAI stub em http://{host}:{port}/ (latência {args.latency})")
+    print(f"   export AZURE_OPENAI_ENDPOINT=http://{host}:{port}/")
+    print(f"   export AZURE_OPENAI_API_KEY=stub")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n📊 Estatísticas: {json.dumps(server.state.stats)}")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,8 @@ AZURE_OPENAI_API_KEY=sua_chave_azure_aqui
 AZURE_OPENAI_ENDPOINT=https://seu-recurso.openai.azure.com/
 AZURE_OPENAI_API_VERSION=2024-02-01
 AZURE_OPENAI_DEPLOYMENT_NAME=gpt-4
+# Benchmarks locais: python azure_stub_server.py e use
+# AZURE_OPENAI_ENDPOINT=http://127.0.0.1:8089/ com qualquer AZURE_OPENAI_API_KEY
 
 # Alternative: Standard OpenAI (se não usar Azure)
 # OPENAI_API_KEY=sua_chave_openai_aqui
@@ -20,6 +22,11 @@ AZURE_OPENAI_DEPLOYMENT_NAME=gpt-4
 
 # System Configurations
 MAX_TOKENS=2000
+# Janela de contexto do deployment (0 = inferir pelo nome, ex.: gpt-4 = 8192)
+CONTEXT_WINDOW=0
+PROMPT_SAFETY_MARGIN=256
+# Geração por função/classe com união dos resultados (--chunked)
+CHUNKED_GENERATION=false
 TEMPERATURE=0.1
 TOP_P=0.95
 FREQUENCY_PENALTY=0.0
@@ -32,6 +39,17 @@ TEST_EDGE_CASES=true
 TEST_EXCEPTIONS=true
 USE_PARAMETRIZE=true
 MIN_COVERAGE=80
+# Executa os testes gerados em sandbox (pytest + coverage); MIN_COVERAGE vira gate
+EXECUTE_TESTS=false
+TEST_WORKERS=4
+TEST_TIMEOUT=60
+TEST_CPU_LIMIT=60
+TEST_MEMORY_LIMIT_MB=1024
+# subprocess (um interpretador por arquivo) ou warm (workers pré-aquecidos, reciclados a cada N execuções)
+TEST_POOL=subprocess
+TEST_POOL_MAX_RUNS=50
+# Módulos extras importados uma vez pelos workers (ex.: numpy,pandas)
+TEST_POOL_PRELOAD=
 
 # Logging Configuration
 LOG_LEVEL=INFO
@@ -43,7 +61,9 @@ DEBUG_MODE=false
 VERBOSE=true
 
 # Agent Configuration
+# Iterações do ciclo de reparo (AUTO_REPAIR=true reenvia só os testes que falharam)
 MAX_ITERATIONS=5
+AUTO_REPAIR=false
 HANDLE_PARSING_ERRORS=true
 AGENT_TYPE=ZERO_SHOT_REACT_DESCRIPTION
 
@@ -56,6 +76,45 @@ AUTO_SAVE_RESULTS=true
 REQUEST_TIMEOUT=30
 MAX_RETRIES=3
 RETRY_DELAY=1
+MAX_RETRY_DELAY=60
+# Cota do deployment compartilhada por todos os workers (0 = sem limite)
+RATE_LIMIT_RPM=0
+RATE_LIMIT_TPM=0
+# Pool HTTP compartilhado (0 = MAX_WORKERS + 2); HTTP2 requer httpx[http2]
+HTTP_MAX_CONNECTIONS=0
+HTTP_MAX_KEEPALIVE=0
+HTTP_KEEPALIVE_EXPIRY=30
+HTTP2=false
+MAX_WORKERS=4
+# Exibe os testes em streaming e interrompe saídas degeneradas (equivale a --stream)
+STREAMING=false
+ANALYSIS_JOBS=1
+# Máximo de arquivos em voo no pipeline de diretório (0 = 2x MAX_WORKERS)
+MAX_IN_FLIGHT=0
+# Padrões extras (estilo .gitignore, separados por vírgula) ignorados no modo diretório
+EXCLUDE_PATTERNS=
+
+# Cache de testes gerados (chave: código, prompt, deployment e temperatura)
+CACHE_ENABLED=true
+CACHE_DIRECTORY=metrics/cache
+CACHE_MAX_ENTRIES=5000
+CACHE_MAX_MB=100
+# Cache semântico por função/classe (AST normalizada) no modo --chunked/--incremental
+SEMANTIC_CACHE=true
+# Ordem do lote no modo diretório: glob (descoberta) | deps (grafo de imports, folhas primeiro) | priority
+BATCH_SCHEDULE=glob
+# Limites do lote (0 = sem limite): tokens de prompt + resposta e prazo em segundos
+BATCH_BUDGET_TOKENS=0
+BATCH_DEADLINE=0
+# Diário de checkpoint do lote (vazio desativa); BATCH_RESUME=true equivale a --resume
+BATCH_JOURNAL=metrics/batch_journal.jsonl
+BATCH_RESUME=false
+# Gravação não interativa no modo diretório (vazio desativa; equivale a --output-dir)
+BATCH_OUTPUT_DIR=
+WRITE_FSYNC_GROUP=32
+
+# Modo incremental (--incremental): fingerprints por função/classe
+INCREMENTAL_MANIFEST=metrics/incremental_manifest.json
 
 # Quality Assurance
 ENABLE_SYNTAX_CHECK=true
@@ -63,9 +122,19 @@ ENABLE_COVERAGE_ANALYSIS=true
 ENABLE_BEST_PRACTICES_CHECK=true
 
 # Metrics and Monitoring
+# Spans por etapa (analyze, prompt, invoke, validate, save, generate) em JSON lines
 ENABLE_METRICS=true
 METRICS_FILE=metrics/generation_metrics.json
+# json | prometheus | both (prometheus grava também metrics/generation_metrics.prom)
 EXPORT_METRICS_FORMAT=json
+# Servidor local (serve/client); SERVE_TOKEN vazio só é aceito em loopback e, com
+# EXECUTE_TESTS=true, o servidor gera um token aleatório e o exibe ao iniciar
+SERVE_HOST=127.0.0.1
+SERVE_PORT=8765
+SERVE_TOKEN=
+SERVE_TIMEOUT=600
+# Orçamento de importação de main_cli verificado por `bench startup` (ms)
+STARTUP_BUDGET_MS=100
 
 # Security Settings
 SAFE_MODE=true
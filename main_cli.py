@@ -15,11 +15,21 @@ import json
 import logging
 import ast
 import re
+import time
+import hashlib
+import random
+import fnmatch
+import threading
+import queue
+import textwrap
+import atexit
+from contextlib import contextmanager
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable, Iterator
 import argparse
-from dotenv import load_dotenv
 
 # Configuração básica de logging
 logging.basicConfig(
@@ -31,16 +41,25 @@ logger = logging.getLogger(__name__)
 class SimulatedLLM:
     """LLM simulado para demonstração quando Azure não está configurado."""
     
-    def __init__(self):
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
         self.temperature = 0.1
+        self.latency = latency  # Latência injetada (benchmarks)
+        self.jitter = jitter
     
     def invoke(self, prompt):
         """Simula uma resposta do LLM."""
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.uniform(0, self.jitter))
         # Analisa o código no prompt para gerar testes relevantes
         if "def " in prompt or "class " in prompt:
             return self._generate_mock_tests(prompt)
         return "# Testes simulados - Configure Azure OpenAI para funcionalidade completa"
     
+    def stream(self, prompt):
+        """Simula a resposta em streaming, em pedaços de uma palavra."""
+        for piece in re.findall(r'\S+\s*|\s+', self.invoke(prompt)):
+            yield piece
+    
     def _generate_mock_tests(self, prompt):
         """Gera testes simulados baseados no código fornecido."""
         test_template = '''import pytest
@@ -100,8 +119,13 @@ if __name__ == "__main__":
 class ConfigManager:
     """Gerenciador de configurações simplificado."""
     
+    # Clientes httpx compartilhados por todos os agentes do processo, por configuração
+    _http_clients: Dict[tuple, tuple] = {}
+    _http_lock = threading.Lock()
+    
     def __init__(self):
         """Inicializa configurações."""
+        from dotenv import load_dotenv
         load_dotenv()
         
         self.azure_config = {
@@ -117,13 +141,67 @@ class ConfigManager:
             'framework': os.getenv('TEST_FRAMEWORK', 'pytest'),
             'include_fixtures': os.getenv('INCLUDE_FIXTURES', 'true').lower() == 'true',
             'test_edge_cases': os.getenv('TEST_EDGE_CASES', 'true').lower() == 'true',
-            'min_coverage': int(os.getenv('MIN_COVERAGE', '80'))
+            'min_coverage': int(os.getenv('MIN_COVERAGE', '80')),
+            'execute_tests': os.getenv('EXECUTE_TESTS', 'false').lower() == 'true',
+            'auto_repair': os.getenv('AUTO_REPAIR', 'false').lower() == 'true',
+            'max_iterations': max(0, int(os.getenv('MAX_ITERATIONS', '5'))),
+            'coverage_analysis': os.getenv('ENABLE_COVERAGE_ANALYSIS', 'true').lower() == 'true',
+            'execution_workers': int(os.getenv('TEST_WORKERS', str(os.cpu_count() or 2))),
+            'execution_timeout': float(os.getenv('TEST_TIMEOUT', '60')),
+            'execution_cpu_seconds': int(os.getenv('TEST_CPU_LIMIT', '60')),
+            'execution_memory_mb': int(os.getenv('TEST_MEMORY_LIMIT_MB', '1024')),
+            'execution_pool': os.getenv('TEST_POOL', 'subprocess').lower(),
+            'pool_max_runs': int(os.getenv('TEST_POOL_MAX_RUNS', '50')),
+            'pool_preload': [name.strip() for name in
+                             os.getenv('TEST_POOL_PRELOAD', '').split(',') if name.strip()]
         }
         
         self.system_config = {
             'output_directory': os.getenv('OUTPUT_DIRECTORY', 'generated_tests'),
+            'batch_output_dir': os.getenv('BATCH_OUTPUT_DIR', ''),
+            'fsync_group': int(os.getenv('WRITE_FSYNC_GROUP', '32')),
             'log_level': os.getenv('LOG_LEVEL', 'INFO'),
-            'debug_mode': os.getenv('DEBUG_MODE', 'false').lower() == 'true'
+            'debug_mode': os.getenv('DEBUG_MODE', 'false').lower() == 'true',
+            'exclude_patterns': [pattern.strip() for pattern in
+                                 os.getenv('EXCLUDE_PATTERNS', '').split(',') if pattern.strip()],
+            'enable_metrics': os.getenv('ENABLE_METRICS', 'false').lower() == 'true',
+            'metrics_file': os.getenv('METRICS_FILE', 'metrics/generation_metrics.json'),
+            'metrics_format': os.getenv('EXPORT_METRICS_FORMAT', 'json').lower(),
+            'serve_host': os.getenv('SERVE_HOST', '127.0.0.1'),
+            'serve_port': int(os.getenv('SERVE_PORT', '8765')),
+            'serve_token': os.getenv('SERVE_TOKEN', ''),
+            'serve_timeout': float(os.getenv('SERVE_TIMEOUT', '600'))
+        }
+        
+        self.performance_config = {
+            'max_workers': max(1, int(os.getenv('MAX_WORKERS', '4'))),
+            'analysis_jobs': max(1, int(os.getenv('ANALYSIS_JOBS', '1'))),
+            'max_in_flight': int(os.getenv('MAX_IN_FLIGHT', '0')),
+            'cache_enabled': os.getenv('CACHE_ENABLED', 'true').lower() == 'true',
+            'cache_directory': os.getenv('CACHE_DIRECTORY', 'metrics/cache'),
+            'cache_max_entries': int(os.getenv('CACHE_MAX_ENTRIES', '5000')),
+            'cache_max_mb': float(os.getenv('CACHE_MAX_MB', '100')),
+            'semantic_cache': os.getenv('SEMANTIC_CACHE', 'true').lower() == 'true',
+            'schedule': os.getenv('BATCH_SCHEDULE', 'glob').lower(),
+            'budget_tokens': int(os.getenv('BATCH_BUDGET_TOKENS', '0')),
+            'deadline': float(os.getenv('BATCH_DEADLINE', '0')),
+            'incremental_manifest': os.getenv('INCREMENTAL_MANIFEST', 'metrics/incremental_manifest.json'),
+            'journal_file': os.getenv('BATCH_JOURNAL', 'metrics/batch_journal.jsonl'),
+            'resume': os.getenv('BATCH_RESUME', 'false').lower() == 'true',
+            'context_window': int(os.getenv('CONTEXT_WINDOW', '0')),
+            'prompt_safety_margin': int(os.getenv('PROMPT_SAFETY_MARGIN', '256')),
+            'chunked': os.getenv('CHUNKED_GENERATION', 'false').lower() == 'true',
+            'streaming': os.getenv('STREAMING', 'false').lower() == 'true',
+            'request_timeout': float(os.getenv('REQUEST_TIMEOUT', '30')),
+            'max_retries': max(0, int(os.getenv('MAX_RETRIES', '3'))),
+            'retry_delay': float(os.getenv('RETRY_DELAY', '1')),
+            'max_retry_delay': float(os.getenv('MAX_RETRY_DELAY', '60')),
+            'rate_limit_rpm': int(os.getenv('RATE_LIMIT_RPM', '0')),
+            'rate_limit_tpm': int(os.getenv('RATE_LIMIT_TPM', '0')),
+            'http_max_connections': int(os.getenv('HTTP_MAX_CONNECTIONS', '0')),
+            'http_max_keepalive': int(os.getenv('HTTP_MAX_KEEPALIVE', '0')),
+            'http_keepalive_expiry': float(os.getenv('HTTP_KEEPALIVE_EXPIRY', '30')),
+            'http2': os.getenv('HTTP2', 'false').lower() == 'true'
         }
         
         # Verificar se está em modo simulação
@@ -131,11 +209,66 @@ class ConfigManager:
                                  self.azure_config['endpoint'] and
                                  self.azure_config['api_key'] != 'sua_chave_azure_aqui')
     
+    def get_llm_kwargs(self) -> Dict[str, Any]:
+        """Mapeia a configuração Azure para os parâmetros do AzureChatOpenAI."""
+        azure = self.azure_config
+        perf = self.performance_config
+        return {
+            'azure_endpoint': azure['endpoint'],
+            'api_key': azure['api_key'],
+            'api_version': azure['api_version'],
+            'azure_deployment': azure['deployment_name'],
+            'temperature': azure['temperature'],
+            'max_tokens': azure['max_tokens'],
+            'timeout': perf['request_timeout'],
+            'max_retries': 0,  # Retentativas ficam a cargo do ResilientLLMClient
+            **self.get_http_clients()
+        }
+    
+    def http_pool_limits(self) -> Dict[str, Any]:
+        """Limites do pool HTTP; sem configuração, dimensionados pela concorrência do lote."""
+        perf = self.performance_config
+        # Uma conexão por chamada simultânea, com folga para retentativas e streaming
+        connections = perf['http_max_connections'] or perf['max_workers'] + 2
+        return {
+            'max_connections': connections,
+            'max_keepalive_connections': min(perf['http_max_keepalive'] or connections, connections),
+            'keepalive_expiry': perf['http_keepalive_expiry']
+        }
+    
+    def get_http_clients(self) -> Dict[str, Any]:
+        """Clientes httpx síncrono e assíncrono compartilhados (vazio se httpx não estiver instalado)."""
+        try:
+            import httpx
+        except ImportError:
+            return {}
+        
+        limits = self.http_pool_limits()
+        timeout = self.performance_config['request_timeout']
+        http2 = self.performance_config['http2']
+        key = (tuple(sorted(limits.items())), timeout, http2)
+        with ConfigManager._http_lock:
+            clients = ConfigManager._http_clients.get(key)
+            if clients is None:
+                if http2:
+                    try:
+                        import h2  # noqa: F401 (exigido pelo httpx para HTTP/2)
+                    except ImportError:
+                        logger.warning("HTTP2=true requer o pacote h2 (pip install httpx[http2]); usando HTTP/1.1")
+                        http2 = False
+                options = {'limits': httpx.Limits(**limits), 'timeout': httpx.Timeout(timeout),
+                           'http2': http2}
+                clients = ConfigManager._http_clients[key] = (httpx.Client(**options),
+                                                              httpx.AsyncClient(**options))
+        return {'http_client': clients[0], 'http_async_client': clients[1]}
+    
     def create_directories(self):
         """Cria diretórios necessários."""
         Path(self.system_config['output_directory']).mkdir(exist_ok=True)
         Path('logs').mkdir(exist_ok=True)
         Path('metrics').mkdir(exist_ok=True)
+        if self.performance_config['cache_enabled']:
+            Path(self.performance_config['cache_directory']).mkdir(parents=True, exist_ok=True)
     
     def get_config_summary(self):
         """Retorna resumo das configurações."""
@@ -146,9 +279,203 @@ Modo: {'Simulação' if self.simulate_mode else 'Azure OpenAI'}
 Framework: {self.test_config['framework']}
 Cobertura Mínima: {self.test_config['min_coverage']}%
 Diretório de Saída: {self.system_config['output_directory']}
+Workers em Lote: {self.performance_config['max_workers']}
+Cache: {self.performance_config['cache_directory'] if self.performance_config['cache_enabled'] else 'desativado'}
 Debug: {self.system_config['debug_mode']}
 """
 
+class AnalysisVisitor(ast.NodeVisitor):
+    """Motor de análise: coleta funções, classes, imports, complexidade e testes em uma única travessia."""
+    
+    BRANCH_NODES = (ast.If, ast.While, ast.For, ast.AsyncFor,
+                    ast.ExceptHandler, ast.With, ast.AsyncWith)
+    
+    def __init__(self):
+        """Inicializa os coletores."""
+        self.functions = []
+        self.classes = []
+        self.imports = []
+        self.import_spans = []
+        self.module_globals = []
+        self.test_functions = []
+        self.complexity = 1  # Complexidade base
+        self.node_count = 0
+        self._scope = []  # funções/classes abertas durante a travessia
+    
+    def visit(self, node):
+        """Visita um nó contabilizando complexidade antes do despacho."""
+        self.node_count += 1
+        
+        if isinstance(node, self.BRANCH_NODES):
+            self._add_complexity(1)
+        elif isinstance(node, ast.BoolOp):
+            self._add_complexity(len(node.values) - 1)
+        
+        method = getattr(self, 'visit_' + node.__class__.__name__, None)
+        if method is not None:
+            return method(node)
+        return self.generic_visit(node)
+    
+    def _add_complexity(self, amount: int):
+        self.complexity += amount
+        # A complexidade também é atribuída à função mais interna em aberto
+        for info in reversed(self._scope):
+            if 'complexity' in info:
+                info['complexity'] += amount
+                break
+    
+    def _visit_function(self, node):
+        info = {
+            'name': node.name,
+            'parameters': [arg.arg for arg in node.args.args],
+            'line': node.lineno,
+            'start_line': CodeAnalyzer._start_line(node),
+            'end_line': node.end_lineno,
+            'is_async': isinstance(node, ast.AsyncFunctionDef),
+            'complexity': 1
+        }
+        self.functions.append(info)
+        if node.name.startswith('test_'):
+            self.test_functions.append(node.name)
+        
+        self._scope.append(info)
+        self.generic_visit(node)
+        self._scope.pop()
+    
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+    
+    def visit_ClassDef(self, node):
+        info = {
+            'name': node.name,
+            'methods': [n.name for n in node.body
+                        if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))],
+            'line': node.lineno,
+            'start_line': CodeAnalyzer._start_line(node),
+            'end_line': node.end_lineno
+        }
+        self.classes.append(info)
+        
+        self._scope.append(info)
+        self.generic_visit(node)
+        self._scope.pop()
+    
+    def visit_Import(self, node):
+        self.imports.extend([alias.name for alias in node.names])
+        self._record_import(node)
+    
+    def visit_ImportFrom(self, node):
+        module = node.module or ''
+        self.imports.extend([f"{module}.{alias.name}" for alias in node.names])
+        self._record_import(node)
+    
+    def _record_import(self, node):
+        if not self._scope:
+            self.import_spans.append([node.lineno, node.end_lineno])
+    
+    def visit_Assign(self, node):
+        self._record_global(node, node.targets)
+    
+    def visit_AnnAssign(self, node):
+        self._record_global(node, [node.target])
+    
+    def _record_global(self, node, targets):
+        if not self._scope:
+            names = [n.id for target in targets for n in ast.walk(target) if isinstance(n, ast.Name)]
+            if names:
+                self.module_globals.append({'names': names, 'span': [node.lineno, node.end_lineno]})
+        self.generic_visit(node)
+
+def run_analysis(tree) -> AnalysisVisitor:
+    """Executa o motor de análise sobre uma AST já construída."""
+    visitor = AnalysisVisitor()
+    visitor.visit(tree)
+    return visitor
+
+def strip_docstrings(tree):
+    """Remove docstrings de módulo, classes e funções (in place)."""
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            body = node.body
+            if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) \
+                    and isinstance(body[0].value.value, str):
+                node.body = body[1:] or [ast.Pass()]
+    return tree
+
+class AlphaRenamer(ast.NodeTransformer):
+    """Troca o nome da unidade e as variáveis locais por nomes canônicos (_unit, _v0, _v1...).
+
+    Parâmetros, métodos, atributos e nomes livres (globais, builtins, imports) fazem
+    parte do comportamento observável pelos testes e são mantidos.
+    """
+
+    def __init__(self, unit_name: str):
+        self.scopes = [{unit_name: '_unit'}]
+        self.counter = 0
+
+    def _canonical(self, name: str) -> str:
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope[name]
+        return name
+
+    @staticmethod
+    def _local_names(node) -> List[str]:
+        """Nomes atribuídos no escopo da função, em ordem de aparição (sem descer em escopos internos)."""
+        params = {arg.arg for arg in ast.walk(node.args) if isinstance(arg, ast.arg)}
+        declared, names = set(), []
+        pending = list(reversed(node.body))
+        while pending:
+            child = pending.pop()
+            if isinstance(child, (ast.Global, ast.Nonlocal)):
+                declared.update(child.names)
+            elif isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.append(child.name)
+                continue
+            elif isinstance(child, ast.Lambda):
+                continue
+            elif isinstance(child, ast.Name) and isinstance(child.ctx, ast.Store):
+                names.append(child.id)
+            elif isinstance(child, ast.ExceptHandler) and child.name:
+                names.append(child.name)
+            pending.extend(reversed(list(ast.iter_child_nodes(child))))
+        return [name for name in dict.fromkeys(names) if name not in params and name not in declared]
+
+    def visit_FunctionDef(self, node):
+        if not getattr(node, '_is_method', False):
+            node.name = self._canonical(node.name)
+        scope = {}
+        for name in self._local_names(node):
+            scope[name] = f"_v{self.counter}"
+            self.counter += 1
+        self.scopes.append(scope)
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_ClassDef(self, node):
+        node.name = self._canonical(node.name)
+        for child in node.body:
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                child._is_method = True
+        # Atributos de classe são interface: o corpo não renomeia nada
+        self.scopes.append({})
+        self.generic_visit(node)
+        self.scopes.pop()
+        return node
+
+    def visit_Name(self, node):
+        node.id = self._canonical(node.id)
+        return node
+
+    def visit_ExceptHandler(self, node):
+        if node.name:
+            node.name = self._canonical(node.name)
+        self.generic_visit(node)
+        return node
+
 class CodeAnalyzer:
     """Analisador de código Python."""
     
@@ -160,45 +487,22 @@ class CodeAnalyzer:
         """Analisa código Python e extrai informações."""
         try:
             tree = ast.parse(source_code)
-            
-            functions = []
-            classes = []
-            imports = []
-            
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef):
-                    functions.append({
-                        'name': node.name,
-                        'parameters': [arg.arg for arg in node.args.args],
-                        'line': node.lineno,
-                        'is_async': isinstance(node, ast.AsyncFunctionDef)
-                    })
-                elif isinstance(node, ast.ClassDef):
-                    methods = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-                    classes.append({
-                        'name': node.name,
-                        'methods': methods,
-                        'line': node.lineno
-                    })
-                elif isinstance(node, (ast.Import, ast.ImportFrom)):
-                    if isinstance(node, ast.Import):
-                        imports.extend([alias.name for alias in node.names])
-                    else:
-                        module = node.module or ''
-                        imports.extend([f"{module}.{alias.name}" for alias in node.names])
+            visitor = run_analysis(tree)
             
             statistics = {
-                'total_functions': len(functions),
-                'total_classes': len(classes),
-                'total_methods': sum(len(cls['methods']) for cls in classes),
+                'total_functions': len(visitor.functions),
+                'total_classes': len(visitor.classes),
+                'total_methods': sum(len(cls['methods']) for cls in visitor.classes),
                 'total_lines': len(source_code.splitlines()),
-                'complexity': self._calculate_complexity(tree)
+                'complexity': visitor.complexity
             }
             
             return {
-                'functions': functions,
-                'classes': classes,
-                'imports': imports,
+                'functions': visitor.functions,
+                'classes': visitor.classes,
+                'imports': visitor.imports,
+                'import_spans': visitor.import_spans,
+                'module_globals': visitor.module_globals,
                 'statistics': statistics,
                 'recommendations': self._generate_recommendations(statistics)
             }
@@ -208,19 +512,163 @@ class CodeAnalyzer:
         except Exception as e:
             return {'error': f'Erro na análise: {e}'}
     
-    def _calculate_complexity(self, tree) -> int:
-        """Calcula complexidade ciclomática básica."""
-        complexity = 1  # Complexidade base
+    @staticmethod
+    def _start_line(node) -> int:
+        """Linha inicial de uma definição, incluindo decoradores."""
+        return min([dec.lineno for dec in node.decorator_list] + [node.lineno])
+    
+    def extract_units(self, source_code: str, analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Divide o módulo em unidades de nível superior (funções e classes) com fingerprint.
+        
+        Cada unidade leva apenas o contexto de que precisa: imports e globais
+        referenciados e as definições auxiliares do próprio módulo que utiliza.
+        O fingerprint cobre a unidade e esse contexto.
+        """
+        lines = source_code.splitlines()
+        segment = lambda start, end: textwrap.dedent('\n'.join(lines[start - 1:end]))
+        
+        imports = [(self._bound_import_names(segment(*span)), segment(*span))
+                   for span in analysis['import_spans']]
+        module_globals = [(set(entry['names']), segment(*entry['span']))
+                          for entry in analysis.get('module_globals', [])]
+        
+        candidates = [('function', info) for info in analysis['functions']]
+        candidates += [('class', info) for info in analysis['classes']]
+        candidates.sort(key=lambda item: item[1]['start_line'])
+        
+        units = []
+        last_end = 0
+        for kind, info in candidates:
+            # Métodos e funções internas pertencem à unidade que os contém
+            if info['start_line'] <= last_end:
+                continue
+            
+            # Definições sob um try/if de módulo vêm indentadas (segment remove a indentação)
+            unit_source = segment(info['start_line'], info['end_line'])
+            try:
+                unit_tree = ast.parse(unit_source)
+            except SyntaxError:
+                continue
+            units.append({
+                'name': info['name'],
+                'kind': kind,
+                'start_line': info['start_line'],
+                'end_line': info['end_line'],
+                'source': unit_source,
+                'referenced_names': self._referenced_names(unit_tree),
+                'tree_dump': ast.dump(unit_tree)
+            })
+            last_end = info['end_line']
+        
+        helpers = {unit['name']: unit for unit in units}
+        for unit in units:
+            unit['fingerprint'] = self._context_fingerprint(unit, helpers, imports, module_globals)
+        for unit in units:
+            del unit['tree_dump']
+            referenced = unit.pop('referenced_names')
+            context = [text for names, text in imports if names & referenced]
+            context += [text for names, text in module_globals if names & referenced]
+            context += [self._helper_source(helpers[name]) for name in sorted(referenced)
+                        if name in helpers and name != unit['name']]
+            unit['context'] = '\n\n'.join(context)
+            unit['semantic_fingerprint'] = self.semantic_fingerprint(unit['source'], unit['name'],
+                                                                     unit['context'])
+        
+        return units
+    
+    @staticmethod
+    def _context_fingerprint(unit: Dict[str, Any], helpers: Dict[str, Dict[str, Any]],
+                             imports: List[tuple], module_globals: List[tuple]) -> str:
+        """Fingerprint da unidade e de tudo o que ela usa no módulo.
         
-        for node in ast.walk(tree):
-            if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor)):
-                complexity += 1
-            elif isinstance(node, (ast.ExceptHandler, ast.With, ast.AsyncWith)):
-                complexity += 1
-            elif isinstance(node, ast.BoolOp):
-                complexity += len(node.values) - 1
+        Inclui, de forma transitiva, as definições auxiliares chamadas e os imports e
+        globais referenciados por elas: mudar um auxiliar ou uma constante invalida
+        os testes da unidade no modo incremental.
+        """
+        used_helpers = set()
+        referenced = set(unit['referenced_names'])
+        pending = [name for name in unit['referenced_names'] if name in helpers]
+        while pending:
+            name = pending.pop()
+            if name in used_helpers or name == unit['name']:
+                continue
+            used_helpers.add(name)
+            referenced |= helpers[name]['referenced_names']
+            pending += [ref for ref in helpers[name]['referenced_names'] if ref in helpers]
+        
+        def normalized(text):
+            try:
+                return ast.dump(ast.parse(text))
+            except SyntaxError:
+                return text
+        
+        payload = json.dumps([
+            unit['tree_dump'],
+            [normalized(text) for names, text in imports if names & referenced],
+            [normalized(text) for names, text in module_globals if names & referenced],
+            [helpers[name]['tree_dump'] for name in sorted(used_helpers)]
+        ])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def _bound_import_names(import_source: str) -> set:
+        """Nomes locais criados por um comando de import."""
+        names = set()
+        for node in ast.parse(import_source).body:
+            for alias in node.names:
+                names.add(alias.asname or alias.name.split('.')[0])
+        return names
+    
+    @staticmethod
+    def _referenced_names(tree) -> set:
+        """Nomes (variáveis, funções, módulos) referenciados em uma árvore."""
+        return {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)}
+    
+    @staticmethod
+    def _helper_source(unit: Dict[str, Any], max_lines: int = 40) -> str:
+        """Código de uma definição auxiliar usada como contexto (só o cabeçalho se for longa)."""
+        unit_lines = unit['source'].splitlines()
+        if len(unit_lines) <= max_lines:
+            return unit['source']
+        header_end = 1
+        for index, line in enumerate(unit_lines):
+            if line.rstrip().endswith(':'):
+                header_end = index + 1
+                break
+        indent = '    '
+        return '\n'.join(unit_lines[:header_end]) + f"\n{indent}...  # definição auxiliar resumida"
+    
+    @staticmethod
+    def fingerprint(unit_source: str) -> str:
+        """Fingerprint da AST (ignora formatação, comentários e posição no arquivo)."""
+        return hashlib.sha256(ast.dump(ast.parse(unit_source)).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def module_semantic_fingerprint(source_code: str) -> str:
+        """Fingerprint normalizado de um módulo inteiro: ignora formatação, comentários,
+        docstrings e nomes locais; os nomes de nível superior (a API testada) são mantidos.
+        """
+        tree = AlphaRenamer('').visit(strip_docstrings(ast.parse(source_code)))
+        return hashlib.sha256(ast.dump(tree).encode('utf-8')).hexdigest()
+    
+    @staticmethod
+    def semantic_fingerprint(unit_source: str, unit_name: str, context: str = '') -> str:
+        """Fingerprint normalizado: também ignora docstrings, o nome da unidade e os nomes locais.
         
-        return complexity
+        O contexto (imports, globais e auxiliares usados) entra sem renomeação, pois
+        muda o comportamento da unidade.
+        """
+        tree = AlphaRenamer(unit_name).visit(strip_docstrings(ast.parse(unit_source)))
+        try:
+            context_dump = ast.dump(strip_docstrings(ast.parse(context)))
+        except SyntaxError:
+            context_dump = context
+        payload = json.dumps([ast.dump(tree), context_dump])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+    
+    def _calculate_complexity(self, tree) -> int:
+        """Calcula complexidade ciclomática básica."""
+        return run_analysis(tree).complexity
     
     def _generate_recommendations(self, stats: Dict) -> List[str]:
         """Gera recomendações baseadas nas estatísticas."""
@@ -240,13 +688,966 @@ class CodeAnalyzer:
 def quick_analyze(source_code: str) -> Dict[str, Any]:
     """Análise rápida de código."""
     try:
-        tree = ast.parse(source_code)
-        functions = len([n for n in ast.walk(tree) if isinstance(n, ast.FunctionDef)])
-        classes = len([n for n in ast.walk(tree) if isinstance(n, ast.ClassDef)])
-        return {'functions': functions, 'classes': classes}
+        visitor = run_analysis(ast.parse(source_code))
+        return {'functions': len(visitor.functions), 'classes': len(visitor.classes)}
     except:
         return {'error': 'Código inválido'}
 
+def generate_synthetic_module(num_functions: int = 200, num_classes: int = 20) -> str:
+    """Gera um módulo Python sintético (usado em benchmarks)."""
+    parts = ["import os", "import json", "from typing import Dict, List", ""]
+    for i in range(num_functions):
+        parts.append(f'''def processar_{i}(dados, limite={i}):
+    """Processa o lote {i}."""
+    total = 0
+    for item in dados:
+        if item > limite and item % 2 == 0 or item < 0:
+            total += item
+        elif item == limite:
+            try:
+                total -= json.loads(str(item))
+            except ValueError:
+                continue
+    while total > 1000:
+        total //= 2
+    return total
+''')
+    for i in range(num_classes):
+        parts.append(f'''class Servico{i}:
+    def __init__(self, nome):
+        self.nome = nome
+
+    async def carregar(self, caminho):
+        with open(caminho) as arquivo:
+            return arquivo.read() if os.path.exists(caminho) else None
+
+    def validar(self, valor):
+        if not valor or valor is None:
+            raise ValueError("valor inválido")
+        return True
+''')
+    return "\n\n".join(parts)
+
+def _legacy_analysis_passes(source_code: str):
+    """Reproduz as travessias da implementação anterior (referência do benchmark)."""
+    tree = ast.parse(source_code)
+    functions, classes, imports = [], [], []
+    for node in ast.walk(tree):  # analyze_code
+        if isinstance(node, ast.FunctionDef):
+            functions.append(node.name)
+        elif isinstance(node, ast.ClassDef):
+            classes.append([n.name for n in node.body if isinstance(n, ast.FunctionDef)])
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.extend(alias.name for alias in node.names)
+    complexity = 1
+    for node in ast.walk(tree):  # _calculate_complexity
+        if isinstance(node, (ast.If, ast.While, ast.For, ast.AsyncFor)):
+            complexity += 1
+        elif isinstance(node, (ast.ExceptHandler, ast.With, ast.AsyncWith)):
+            complexity += 1
+        elif isinstance(node, ast.BoolOp):
+            complexity += len(node.values) - 1
+    quick_tree = ast.parse(source_code)  # quick_analyze
+    len([n for n in ast.walk(quick_tree) if isinstance(n, ast.FunctionDef)])
+    len([n for n in ast.walk(quick_tree) if isinstance(n, ast.ClassDef)])
+    return complexity
+
+def benchmark_analyzer(sources: List[str], repeat: int = 5) -> Dict[str, Any]:
+    """Compara nós/s da análise anterior (várias travessias) com o motor de passada única."""
+    total_nodes = sum(run_analysis(ast.parse(source)).node_count for source in sources)
+    
+    def best_time(func) -> float:
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for source in sources:
+                func(source)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+    
+    before = best_time(_legacy_analysis_passes)
+    after = best_time(lambda source: run_analysis(ast.parse(source)))
+    
+    return {
+        'files': len(sources),
+        'nodes': total_nodes,
+        'repeat': repeat,
+        'before': {'seconds': before, 'nodes_per_sec': total_nodes / before if before else 0},
+        'after': {'seconds': after, 'nodes_per_sec': total_nodes / after if after else 0},
+        'speedup': before / after if after else 0
+    }
+
+def generate_synthetic_corpus(num_files: int = 100, functions_per_file: int = 20,
+                              classes_per_file: int = 2, seed: int = 42) -> List[tuple]:
+    """Gera um corpus sintético de (nome, código) com tamanhos variando ±50% em torno da média."""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(num_files):
+        functions = max(1, round(functions_per_file * rng.uniform(0.5, 1.5)))
+        classes = round(classes_per_file * rng.uniform(0.5, 1.5))
+        corpus.append((f"synthetic/modulo_{index:04d}.py", generate_synthetic_module(functions, classes)))
+    return corpus
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentil com interpolação linear (0 para lista vazia)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * pct / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (rank - lower)
+
+def peak_rss_mb() -> Optional[float]:
+    """Pico de memória residente do processo em MB (None onde `resource` não existe)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em bytes no macOS e em KB no Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def benchmark_pipeline(agent, code_files: List[tuple], max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """Executa o pipeline completo sobre um corpus e agrega latências por etapa (p50/p95/p99)."""
+    stages = {'analyze': [], 'prompt': [], 'invoke': [], 'validate': [], 'total': []}
+    stats = {}
+    failed = 0
+    
+    start = time.perf_counter()
+    for result in agent.stream_generate_tests(code_files, max_workers, stats=stats):
+        if not result.get('success'):
+            failed += 1
+        for stage, duration in result.get('stage_timings', {}).items():
+            stages.setdefault(stage, []).append(duration)
+        stages['total'].append(result['latency'])
+    wall_time = time.perf_counter() - start
+    
+    return {
+        'files': len(stages['total']),
+        'failed': failed,
+        'wall_time': wall_time,
+        'files_per_sec': len(stages['total']) / wall_time if wall_time > 0 else 0.0,
+        'parallel_analysis_time': stats.get('analysis_time', 0.0),
+        'peak_rss_mb': peak_rss_mb(),
+        'stages': {
+            stage: {
+                'count': len(values),
+                'mean': sum(values) / len(values) if values else 0.0,
+                'p50': percentile(values, 50),
+                'p95': percentile(values, 95),
+                'p99': percentile(values, 99),
+                'max': max(values, default=0.0)
+            }
+            for stage, values in stages.items()
+        }
+    }
+
+def _is_main_guard(node) -> bool:
+    """Indica se o nó é um bloco `if __name__ == "__main__":`."""
+    return (isinstance(node, ast.If) and isinstance(node.test, ast.Compare)
+            and isinstance(node.test.left, ast.Name) and node.test.left.id == '__name__')
+
+def _is_fixture(node) -> bool:
+    return any('fixture' in ast.unparse(decorator) for decorator in node.decorator_list)
+
+def rename_identifiers(code: str, mapping: Dict[str, str]) -> str:
+    """Renomeia identificadores (tokens NAME) sem tocar em strings e comentários.
+    
+    Nomes de testes derivados acompanham a troca: test_<antigo>_x vira test_<novo>_x
+    e Test<Antigo> vira Test<Novo>.
+    """
+    import io
+    import tokenize
+    mapping = {old: new for old, new in mapping.items() if old and new and old != new}
+    if not mapping:
+        return code
+    
+    camel = lambda name: ''.join(part[:1].upper() + part[1:] for part in name.split('_'))
+    derived = [(re.compile(r'(?<![A-Za-z0-9])' + re.escape(old) + r'(?![a-z0-9])'), new)
+               for old, new in mapping.items()]
+    derived += [(re.compile(re.escape(camel(old)) + r'(?![a-z0-9])'), camel(new))
+                for old, new in mapping.items()]
+    
+    edits = []
+    try:
+        for token in tokenize.generate_tokens(io.StringIO(code).readline):
+            if token.type != tokenize.NAME:
+                continue
+            new = mapping.get(token.string)
+            if new is None and token.string.lower().startswith('test'):
+                new = token.string
+                for pattern, replacement in derived:
+                    new = pattern.sub(replacement, new)
+            if new is not None and new != token.string:
+                edits.append((token.start, token.end, new))
+    except (tokenize.TokenError, SyntaxError):
+        return code
+    
+    lines = code.splitlines(keepends=True)
+    for (row, col), (_, end_col), new in reversed(edits):
+        lines[row - 1] = lines[row - 1][:col] + new + lines[row - 1][end_col:]
+    return ''.join(lines)
+
+def merge_test_modules(test_modules: List[str]) -> str:
+    """Une vários módulos de teste em um só, deduplicando imports e fixtures."""
+    imports = []
+    bodies = []
+    seen_blocks = set()
+    defined_names = {}
+    main_guard = None
+    
+    for test_code in test_modules:
+        try:
+            tree = ast.parse(test_code)
+        except SyntaxError:
+            # Módulo inválido: mantido como está para não perder conteúdo
+            if test_code.strip():
+                bodies.append(test_code.strip())
+            continue
+        
+        lines = test_code.splitlines()
+        for index, node in enumerate(tree.body):
+            if isinstance(node, (ast.Import, ast.ImportFrom)):
+                statement = ast.unparse(node)
+                if statement not in imports:
+                    imports.append(statement)
+                continue
+            
+            if index == 0 and isinstance(node, ast.Expr) and isinstance(node.value, ast.Constant):
+                continue  # docstring do módulo parcial
+            
+            start = min([d.lineno for d in getattr(node, 'decorator_list', [])] + [node.lineno])
+            block = '\n'.join(lines[start - 1:node.end_lineno])
+            
+            if _is_main_guard(node):
+                main_guard = main_guard or block
+                continue
+            
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and _is_fixture(node):
+                    if node.name in defined_names:
+                        continue  # fixture já definida por outro módulo
+                elif node.name in defined_names:
+                    # Nome repetido em outro módulo: renomeia para não sobrescrever o teste anterior
+                    defined_names[node.name] += 1
+                    new_name = f"{node.name}_{defined_names[node.name]}"
+                    block = re.sub(rf'\b(def|class)\s+{re.escape(node.name)}\b',
+                                   rf'\1 {new_name}', block, count=1)
+                defined_names.setdefault(node.name, 1)
+            elif block in seen_blocks:
+                continue
+            
+            seen_blocks.add(block)
+            bodies.append(block)
+    
+    if not imports and not bodies:
+        return ''
+    
+    merged = '\n'.join(imports) + '\n\n\n' + '\n\n\n'.join(bodies) + '\n'
+    if main_guard:
+        merged += '\n\n' + main_guard + '\n'
+    return merged
+
+def _node_span(node) -> tuple:
+    """Linhas (início, fim) de um nó, incluindo decoradores."""
+    start = min([d.lineno for d in getattr(node, 'decorator_list', [])] + [node.lineno])
+    return start, node.end_lineno
+
+def extract_failing_tests(test_code: str, failures: List[Dict[str, Any]]) -> str:
+    """Código apenas dos testes que falharam (métodos levam o cabeçalho da classe)."""
+    tree = ast.parse(test_code)
+    lines = test_code.splitlines()
+    segment = lambda node: '\n'.join(lines[_node_span(node)[0] - 1:node.end_lineno])
+    failing = {}
+    for failure in failures:
+        test_name = failure['test'].split('[')[0]  # remove ids de parametrização
+        owner = failure.get('class', '').rsplit('.', 1)[-1]
+        failing.setdefault(owner, set()).add(test_name)
+    
+    blocks = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and any(
+                node.name in names for names in failing.values()):
+            blocks.append(segment(node))
+        elif isinstance(node, ast.ClassDef) and node.name in failing:
+            methods = [segment(member) for member in node.body
+                       if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef))
+                       and member.name in failing[node.name]]
+            if methods:
+                blocks.append(f"class {node.name}:\n" + '\n\n'.join(methods))
+    return '\n\n\n'.join(blocks)
+
+def splice_test_functions(test_code: str, replacement_code: str) -> str:
+    """Aplica testes corrigidos/novos sobre o módulo: substitui por nome, acrescenta os inéditos."""
+    tree = ast.parse(test_code)
+    new_tree = ast.parse(replacement_code)
+    lines = test_code.splitlines()
+    new_lines = replacement_code.splitlines()
+    new_segment = lambda node: new_lines[_node_span(node)[0] - 1:node.end_lineno]
+    
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+    top_level = {node.name: node for node in tree.body if isinstance(node, definitions)}
+    existing_imports = {ast.unparse(node) for node in tree.body
+                        if isinstance(node, (ast.Import, ast.ImportFrom))}
+    edits = []      # (início, fim, linhas) substituindo lines[início:fim]
+    new_imports = []
+    appended = []
+    
+    for node in new_tree.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            if ast.unparse(node) not in existing_imports:
+                new_imports.extend(new_segment(node))
+            continue
+        if not isinstance(node, definitions):
+            continue
+        old = top_level.get(getattr(node, 'name', None))
+        if old is None:
+            appended.append(new_segment(node))
+        elif isinstance(node, ast.ClassDef) and isinstance(old, ast.ClassDef):
+            # Classe de teste: substituição método a método
+            members = {m.name: m for m in old.body if isinstance(m, (ast.FunctionDef, ast.AsyncFunctionDef))}
+            indent = ' ' * (old.body[0].col_offset if old.body else 4)
+            additions = []
+            for member in node.body:
+                if not isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    continue
+                body = [indent + line if line.strip() else line
+                        for line in textwrap.dedent('\n'.join(new_segment(member))).splitlines()]
+                if member.name in members:
+                    start, end = _node_span(members[member.name])
+                    edits.append((start - 1, end, body))
+                else:
+                    additions += [''] + body
+            if additions:
+                edits.append((old.end_lineno, old.end_lineno, additions))
+        else:
+            start, end = _node_span(old)
+            edits.append((start - 1, end, new_segment(node)))
+    
+    for start, end, replacement in sorted(edits, key=lambda edit: edit[0], reverse=True):
+        lines[start:end] = replacement
+    
+    if appended:
+        guard = next((node for node in tree.body if _is_main_guard(node)), None)
+        # O bloco __main__ é o último nó; as edições anteriores não alteram seu deslocamento relativo ao fim
+        position = len(lines) - (len(test_code.splitlines()) - _node_span(guard)[0] + 1) if guard else len(lines)
+        while position > 0 and not lines[position - 1].strip():
+            position -= 1
+        block = []
+        for definition in appended:
+            block += ['', ''] + definition
+        lines[position:position] = block
+    
+    if new_imports:
+        import_ends = [node.end_lineno for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+        position = max(import_ends) if import_ends else 0
+        lines[position:position] = new_imports
+    
+    return '\n'.join(lines).rstrip('\n') + '\n'
+
+DEFAULT_EXCLUDE_PATTERNS = [
+    '.git/', '.hg/', '.svn/', '__pycache__/', 'venv/', '.venv/', 'env/',
+    'site-packages/', 'node_modules/', '.tox/', '.nox/', 'build/', 'dist/', '*.egg-info/'
+]
+
+CODE_FENCE = re.compile(r'```[ \t]*(?:python|py)?[ \t]*\n(.*?)(?:\n[ \t]*```|\Z)', re.DOTALL | re.IGNORECASE)
+
+def strip_code_fences(text: str) -> str:
+    """Extrai o código do primeiro bloco ```python``` da resposta (ou a devolve inalterada)."""
+    match = CODE_FENCE.search(text)
+    return match.group(1).strip('\n') + '\n' if match else text
+
+class StreamingTestParser:
+    """Valida a saída do LLM em streaming, bloco de nível superior a bloco, detectando degeneração."""
+
+    INCOMPLETE_ERRORS = ('was never closed', 'unterminated triple-quoted', 'unexpected EOF',
+                         'expected an indented block')
+    CONTINUATIONS = ('else', 'elif', 'except', 'finally', ')', ']', '}', '#')
+    REPEAT_LIMIT = 2       # blocos idênticos repetidos
+    PROSE_LIMIT = 2        # blocos consecutivos que não são Python
+    LINE_REPEAT_LIMIT = 10  # linhas idênticas consecutivas
+
+    def __init__(self):
+        """Inicializa o estado do parser."""
+        self.raw_text = ''
+        self.blocks = []
+        self.abort_reason = None
+        self.finished = False
+        self._partial = ''
+        self._pending = []
+        self._fence_open = False
+        self._seen = set()
+        self._repeats = 0
+        self._prose = 0
+        self._last_line = None
+        self._line_repeats = 0
+
+    @property
+    def code(self) -> str:
+        """Código dos blocos aceitos até o momento."""
+        return ''.join(self.blocks).strip('\n') + '\n' if self.blocks else ''
+
+    def feed(self, text: str) -> bool:
+        """Consome um trecho da resposta; retorna False quando a geração deve parar."""
+        self.raw_text += text
+        self._partial += text
+        while '\n' in self._partial and not (self.finished or self.abort_reason):
+            line, self._partial = self._partial.split('\n', 1)
+            self._process_line(line + '\n')
+        return not (self.finished or self.abort_reason)
+
+    def finish(self) -> str:
+        """Processa o restante do texto e retorna o código aceito."""
+        if not (self.finished or self.abort_reason):
+            if self._partial:
+                self._process_line(self._partial + '\n')
+                self._partial = ''
+            if not self.abort_reason:
+                # Um bloco incompleto no final (resposta truncada) é descartado
+                self._complete_block(final=True)
+        return self.code
+
+    def _process_line(self, line: str):
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            if not self._fence_open and not self.blocks:
+                # Texto antes da cerca de abertura é preâmbulo em prosa
+                self._fence_open = True
+                self._pending = []
+                self._prose = 0
+            else:
+                self._complete_block(final=True)
+                self.finished = True
+            return
+
+        if stripped:
+            self._line_repeats = self._line_repeats + 1 if stripped == self._last_line else 0
+            self._last_line = stripped
+            if self._line_repeats >= self.LINE_REPEAT_LIMIT:
+                self.abort_reason = 'repetição de linhas'
+                return
+
+        starts_block = (stripped and not line[0].isspace() and
+                        not stripped.startswith(self.CONTINUATIONS))
+        if starts_block and self._pending:
+            last = next((item.strip() for item in reversed(self._pending) if item.strip()), '')
+            if not last.startswith('@'):
+                self._complete_block()
+        self._pending.append(line)
+
+    def _complete_block(self, final: bool = False):
+        """Tenta fechar o bloco pendente; blocos ainda incompletos continuam acumulando."""
+        text = ''.join(self._pending)
+        if not text.strip():
+            return
+        try:
+            tree = ast.parse(text)
+        except SyntaxError as e:
+            if not final and any(marker in str(e.msg) for marker in self.INCOMPLETE_ERRORS):
+                return
+            self._pending = []
+            if self._reattach(text):
+                return
+            if not final:
+                self._prose += 1
+                if self._prose >= self.PROSE_LIMIT:
+                    self.abort_reason = 'saída não é Python'
+            return
+
+        self._pending = []
+        self._prose = 0
+        if tree.body:
+            key = ast.dump(tree)
+            if key in self._seen:
+                self._repeats += 1
+                if self._repeats >= self.REPEAT_LIMIT:
+                    self.abort_reason = 'repetição de blocos'
+                return
+            self._seen.add(key)
+        self.blocks.append(text)
+
+    def _reattach(self, text: str) -> bool:
+        """Junta ao bloco anterior um trecho indentado que só é válido dentro dele."""
+        if not self.blocks:
+            return False
+        merged = self.blocks[-1] + text
+        try:
+            tree = ast.parse(merged)
+        except SyntaxError:
+            return False
+        self._seen.discard(ast.dump(ast.parse(self.blocks[-1])))
+        self._seen.add(ast.dump(tree))
+        self.blocks[-1] = merged
+        self._prose = 0
+        return True
+
+class PathExcluder:
+    """Filtro de caminhos com a sintaxe básica do .gitignore."""
+    
+    def __init__(self, patterns: Iterable[str]):
+        """Compila as regras (suporta '#', '!', '/' inicial e '/' final)."""
+        self.rules = []
+        for raw_pattern in patterns:
+            pattern = raw_pattern.strip()
+            if not pattern or pattern.startswith('#'):
+                continue
+            negate = pattern.startswith('!')
+            pattern = pattern[1:] if negate else pattern
+            dir_only = pattern.endswith('/')
+            pattern = pattern.rstrip('/')
+            anchored = '/' in pattern
+            self.rules.append((pattern.lstrip('/'), negate, dir_only, anchored))
+    
+    @classmethod
+    def for_directory(cls, root: Path, extra_patterns: Iterable[str] = ()) -> 'PathExcluder':
+        """Combina padrões padrão, extras e o .gitignore da raiz."""
+        patterns = DEFAULT_EXCLUDE_PATTERNS + list(extra_patterns)
+        gitignore = Path(root) / '.gitignore'
+        if gitignore.is_file():
+            try:
+                patterns += gitignore.read_text(encoding='utf-8').splitlines()
+            except OSError as e:
+                logger.warning(f"Não foi possível ler {gitignore}: {e}")
+        return cls(patterns)
+    
+    def is_excluded(self, relative_path: str, is_dir: bool) -> bool:
+        """Indica se o caminho (relativo à raiz, com '/') deve ser ignorado."""
+        name = relative_path.rsplit('/', 1)[-1]
+        excluded = False
+        for pattern, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if fnmatch.fnmatchcase(relative_path if anchored else name, pattern):
+                excluded = not negate
+        return excluded
+
+def iter_python_files(root: Path, exclude_patterns: Iterable[str] = ()) -> Iterator[Path]:
+    """Descobre arquivos .py sob demanda, podando diretórios excluídos."""
+    root = Path(root)
+    excluder = PathExcluder.for_directory(root, exclude_patterns)
+    
+    for dir_path, dir_names, file_names in os.walk(root):
+        relative_dir = os.path.relpath(dir_path, root).replace(os.sep, '/')
+        prefix = '' if relative_dir == '.' else relative_dir + '/'
+        
+        dir_names[:] = sorted(name for name in dir_names
+                              if not excluder.is_excluded(prefix + name, True))
+        for file_name in sorted(file_names):
+            if file_name.endswith('.py') and not excluder.is_excluded(prefix + file_name, False):
+                yield Path(dir_path) / file_name
+
+def module_name_for(file_path: str) -> str:
+    """Nome de módulo importável para um arquivo (ou unidade 'arquivo::nome')."""
+    stem = Path(str(file_path).split('::')[0]).stem
+    name = re.sub(r'\W', '_', stem)
+    if not name or not name.isidentifier() or name.startswith('<'):
+        return 'modulo_testado'
+    return name
+
+def guess_module_name(test_code: str) -> str:
+    """Deduz o módulo testado a partir dos imports de um módulo de testes."""
+    ignored = set(getattr(sys, 'stdlib_module_names', ())) | {'pytest', '_pytest', 'mock'}
+    try:
+        tree = ast.parse(test_code)
+    except SyntaxError:
+        return 'modulo_testado'
+    for node in tree.body:
+        if isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            if node.module.split('.')[0] not in ignored:
+                return node.module.split('.')[0]
+    return 'modulo_testado'
+
+def iter_code_files(file_paths: Iterable[Path]) -> Iterator[tuple]:
+    """Lê arquivos sob demanda, produzindo (caminho, código)."""
+    for file_path in file_paths:
+        try:
+            yield str(file_path), Path(file_path).read_text(encoding='utf-8')
+        except Exception as e:
+            logger.warning(f"Erro ao ler {file_path}: {e}")
+
+def project_module_names(file_paths: List[str]) -> Dict[str, str]:
+    """Nomes pontuados (pkg.sub.mod) dos arquivos, relativos à raiz comum do lote."""
+    if not file_paths:
+        return {}
+    root = Path(os.path.commonpath([str(Path(path).resolve().parent) for path in file_paths]))
+    # Sobe até fora do pacote para que os nomes comecem pelo pacote de topo
+    while (root / '__init__.py').exists() and root.parent != root:
+        root = root.parent
+    names = {}
+    for path in file_paths:
+        parts = list(Path(path).resolve().relative_to(root).with_suffix('').parts)
+        if parts and parts[-1] == '__init__':
+            parts = parts[:-1]
+        names[path] = '.'.join(parts)
+    return names
+
+def build_import_graph(code_files: List[tuple], analyses: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """Grafo de imports internos do lote: arquivo → arquivos do lote que ele importa.
+    
+    Imports são resolvidos pelo nome pontuado completo ou por um sufixo único dele
+    (src/pkg/mod.py atende `pkg.mod` e `mod`), e também relativos ao pacote do arquivo.
+    """
+    names = project_module_names([file_path for file_path, *_ in code_files])
+    index = {}
+    for file_path, dotted in names.items():
+        parts = dotted.split('.')
+        for start in range(1, len(parts)):
+            suffix = '.'.join(parts[start:])
+            # Sufixos ambíguos não resolvem para nenhum arquivo
+            index[suffix] = file_path if index.get(suffix, file_path) == file_path else None
+    index.update({dotted: file_path for file_path, dotted in names.items()})
+
+    graph = {}
+    for file_path, *_ in code_files:
+        package = names[file_path].rpartition('.')[0]
+        if Path(file_path).name == '__init__.py':
+            package = names[file_path]
+        dependencies = []
+        for imported in analyses.get(file_path, {}).get('imports', []):
+            imported = imported.lstrip('.')
+            parts = imported.split('.')
+            candidates = ['.'.join(parts[:size]) for size in range(len(parts), 0, -1)]
+            if package:
+                candidates = [f"{package}.{name}" for name in candidates] + candidates
+            target = next((index[name] for name in candidates if index.get(name)), None)
+            if target and target != file_path and target not in dependencies:
+                dependencies.append(target)
+        graph[file_path] = dependencies
+    return graph
+
+def find_tested_modules(file_paths: List[str], exclude_patterns: Iterable[str] = ()) -> set:
+    """Módulos que já têm testes (test_<mod>.py ou <mod>_test.py) no projeto do lote."""
+    if not file_paths:
+        return set()
+    root = Path(os.path.commonpath([str(Path(path).resolve().parent) for path in file_paths]))
+    while (root / '__init__.py').exists() and root.parent != root:
+        root = root.parent
+    # Layout src/: os testes costumam ficar ao lado de src, não dentro
+    roots = [root.parent] if root.name == 'src' else [root]
+    tested = set()
+    for search_root in roots:
+        for path in iter_python_files(search_root, exclude_patterns):
+            match = re.fullmatch(r'test_(\w+)|(\w+)_test', path.stem)
+            if match:
+                tested.add(match.group(1) or match.group(2))
+    return tested
+
+def priority_score(file_path: str, analysis: Dict[str, Any], tested: set) -> float:
+    """Valor estimado de gerar testes para um arquivo: complexidade, nº de funções e lacuna de testes."""
+    stem = Path(file_path).stem
+    if 'error' in analysis or re.fullmatch(r'test_\w+|\w+_test|conftest', stem):
+        return 0.0
+    statistics = analysis.get('statistics', {})
+    units = statistics.get('total_functions', 0) + statistics.get('total_methods', 0)
+    score = float(statistics.get('complexity', 0) + units)
+    # Arquivos sem testes existentes valem o dobro
+    return score if stem in tested else score * 2
+
+def api_summary(source_code: str, max_lines: int = 40) -> str:
+    """Resumo compacto da API pública de um módulo: assinaturas e primeira linha das docstrings."""
+    try:
+        tree = ast.parse(source_code)
+    except SyntaxError:
+        return ''
+
+    def signature(node, indent: str = '') -> str:
+        prefix = 'async def' if isinstance(node, ast.AsyncFunctionDef) else 'def'
+        returns = f" -> {ast.unparse(node.returns)}" if node.returns else ''
+        doc = (ast.get_docstring(node) or '').strip().splitlines()
+        comment = f"  # {doc[0]}" if doc else ''
+        return f"{indent}{prefix} {node.name}({ast.unparse(node.args)}){returns}: ...{comment}"
+
+    lines = []
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and not node.name.startswith('_'):
+            lines.append(signature(node))
+        elif isinstance(node, ast.ClassDef) and not node.name.startswith('_'):
+            bases = f"({', '.join(ast.unparse(base) for base in node.bases)})" if node.bases else ''
+            lines.append(f"class {node.name}{bases}:")
+            methods = [child for child in node.body
+                       if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))
+                       and (not child.name.startswith('_') or child.name == '__init__')]
+            lines.extend(signature(method, '    ') for method in methods)
+            if not methods:
+                lines.append('    ...')
+    if len(lines) > max_lines:
+        lines = lines[:max_lines] + [f"# ... (+{len(lines) - max_lines} linhas omitidas)"]
+    return '\n'.join(lines)
+
+class IncrementalManifest:
+    """Manifesto de fingerprints por função/classe usado no modo incremental."""
+    
+    def __init__(self, manifest_path: Optional[str] = None):
+        """Carrega o manifesto da execução anterior, se existir (sem caminho, fica só em memória)."""
+        self.path = Path(manifest_path) if manifest_path else None
+        self.files = {}
+        
+        if self.path is not None and self.path.exists():
+            try:
+                self.files = json.loads(self.path.read_text(encoding='utf-8')).get('files', {})
+            except (OSError, ValueError) as e:
+                logger.warning(f"Manifesto incremental ignorado ({e})")
+    
+    def get(self, file_path: str) -> Dict[str, Any]:
+        """Retorna a entrada anterior de um arquivo (vazia se inexistente)."""
+        return self.files.get(file_path, {})
+    
+    def update(self, file_path: str, source_hash: str, units: Dict[str, Dict], test_code: str):
+        """Registra o estado atual de um arquivo."""
+        self.files[file_path] = {
+            'source_hash': source_hash,
+            'units': units,
+            'test_code': test_code
+        }
+    
+    def save(self):
+        """Grava o manifesto de forma atômica."""
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps({
+            'version': 1,
+            'updated_at': datetime.now().isoformat(),
+            'files': self.files
+        }, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+class BatchJournal:
+    """Diário de checkpoint (JSON lines, só acréscimo) dos arquivos concluídos num lote.
+    
+    Cada linha registra um arquivo gerado com sucesso: hash do código, testes e local
+    de saída. Com `resume`, arquivos já registrados com o mesmo hash são pulados sem
+    nova chamada ao LLM; sem ele, o diário recomeça vazio.
+    """
+    
+    def __init__(self, journal_path: str, resume: bool = False):
+        """Abre o diário; ao retomar, carrega as entradas válidas da execução anterior."""
+        self.path = Path(journal_path)
+        self.completed = {}
+        self._pending = {}
+        self._lock = threading.Lock()
+        
+        if resume and self.path.exists():
+            with open(self.path, encoding='utf-8') as journal:
+                for line in journal:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # última linha truncada por uma interrupção
+                    self.completed[entry['file_path']] = entry
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w', encoding='utf-8')
+    
+    @staticmethod
+    def source_hash(source_code: str) -> str:
+        return hashlib.sha256(source_code.encode('utf-8')).hexdigest()
+    
+    def lookup(self, file_path: str, source_code: str) -> Optional[Dict[str, Any]]:
+        """Entrada concluída de um arquivo inalterado; senão marca-o como pendente e retorna None."""
+        digest = self.source_hash(source_code)
+        entry = self.completed.get(file_path)
+        if entry is not None and entry['source_hash'] == digest:
+            return entry
+        self._pending[file_path] = digest
+        return None
+    
+    @staticmethod
+    def as_result(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Resultado de lote equivalente a uma entrada do diário (sem custo de tokens)."""
+        return {
+            'success': True,
+            'resumed': True,
+            'file_path': entry['file_path'],
+            'test_code': entry['test_code'],
+            'output_path': entry.get('output_path'),
+            'validation': {'test_count': entry.get('test_count', 0)},
+            'latency': 0.0
+        }
+    
+    def record(self, result: Dict[str, Any]):
+        """Acrescenta um arquivo concluído; falhas não são registradas e serão refeitas."""
+        digest = self._pending.pop(result['file_path'], None)
+        if not result['success'] or digest is None:
+            return
+        usage = {} if result.get('coalesced') else result.get('token_usage') or result
+        entry = {
+            'ts': datetime.now().isoformat(),
+            'file_path': result['file_path'],
+            'source_hash': digest,
+            'output_path': result.get('output_path'),
+            'test_count': result.get('validation', {}).get('test_count', 0),
+            'prompt_tokens': usage.get('prompt_tokens', 0),
+            'completion_tokens': usage.get('completion_tokens', 0),
+            'test_code': result['test_code']
+        }
+        with self._lock:
+            # Uma linha por write + flush: uma interrupção perde no máximo a linha corrente
+            self._file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            self._file.flush()
+        self.completed[entry['file_path']] = entry
+    
+    def close(self):
+        """Sincroniza o diário com o disco e o fecha."""
+        with self._lock:
+            if not self._file.closed:
+                os.fsync(self._file.fileno())
+                self._file.close()
+
+class TestWriter:
+    """Grava testes gerados em segundo plano, espelhando a árvore de código em `output_dir`.
+    
+    Cada arquivo é escrito num temporário e publicado com rename atômico; os fsyncs
+    são feitos por grupo (até `group_size` arquivos da fila) antes dos renames, de
+    modo que a escrita em disco se sobrepõe às chamadas ao LLM.
+    """
+    
+    def __init__(self, output_dir: str, source_root: Optional[str] = None, group_size: int = 32,
+                 metrics: Optional['MetricsRecorder'] = None):
+        """Inicia a thread de escrita."""
+        self.output_dir = Path(output_dir)
+        self.source_root = Path(source_root).resolve() if source_root else None
+        self.group_size = max(1, group_size)
+        self.metrics = metrics
+        self.stats = {'written': 0, 'bytes': 0, 'groups': 0}
+        self.errors = []
+        self._targets = {}
+        self._claimed = set()
+        self._targets_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='test-writer', daemon=True)
+        self._thread.start()
+    
+    def target(self, file_path: str) -> Path:
+        """Caminho do módulo de testes de um arquivo: mesma pasta relativa, nome test_<mod>.py.
+        
+        Fora da raiz o arquivo vai para `output_dir` pelo nome; se outro arquivo já
+        ocupa esse destino, recebe um sufixo (test_<mod>_2.py) em vez de sobrescrevê-lo.
+        """
+        path = Path(file_path).resolve()
+        with self._targets_lock:
+            if path in self._targets:
+                return self._targets[path]
+            relative = Path(path.name)
+            if self.source_root is not None and path.is_relative_to(self.source_root):
+                relative = path.relative_to(self.source_root)
+            target = self.output_dir / relative.parent / f"test_{path.stem}.py"
+            suffix = 2
+            while target in self._claimed:
+                target = target.with_name(f"test_{path.stem}_{suffix}.py")
+                suffix += 1
+            self._claim(path, target)
+            return target
+    
+    def reserve(self, file_path: str, target: str):
+        """Fixa um destino já usado (ex.: registrado no diário) para o arquivo."""
+        with self._targets_lock:
+            self._claim(Path(file_path).resolve(), Path(target))
+    
+    def _claim(self, path: Path, target: Path):
+        self._targets[path] = target
+        self._claimed.add(target)
+    
+    @staticmethod
+    def should_write(result: Dict[str, Any]) -> bool:
+        """Só há o que gravar se o código tem unidades e o módulo gerado tem testes."""
+        if not result.get('success') or not result.get('test_code'):
+            return False
+        analysis = result.get('code_analysis')
+        if analysis is not None and 'error' not in analysis and \
+                not (analysis.get('functions') or analysis.get('classes')):
+            return False
+        return result.get('validation', {}).get('test_count', 0) > 0
+    
+    def submit(self, file_path: str, test_code: str, on_written=None) -> Path:
+        """Enfileira a gravação; `on_written()` é chamado após o arquivo estar no disco."""
+        target = self.target(file_path)
+        self._queue.put((target, test_code, on_written))
+        return target
+    
+    def close(self):
+        """Aguarda a fila esvaziar e encerra a thread."""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+    
+    def _run(self):
+        stopping = False
+        while not stopping:
+            group = [self._queue.get()]
+            while len(group) < self.group_size:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if None in group:
+                group.remove(None)
+                stopping = True
+            if group:
+                self._write_group(group)
+    
+    def _write_group(self, group: List[tuple]):
+        """Escreve temporários, sincroniza o grupo, publica com rename e sincroniza as pastas."""
+        start = time.perf_counter()
+        staged = []
+        for target, test_code, on_written in group:
+            tmp_path = target.with_name(f".{target.name}.tmp")
+            try:
+                target.parent.mkdir(parents=True, exist_ok=True)
+                data = test_code.encode('utf-8')
+                tmp_file = open(tmp_path, 'wb')
+                try:
+                    tmp_file.write(data)
+                except OSError:
+                    tmp_file.close()
+                    raise
+                staged.append((target, tmp_path, tmp_file, len(data), on_written))
+            except OSError as e:
+                self._failed(target, tmp_path, e)
+        
+        # fsyncs em sequência, depois de todas as escritas do grupo
+        written = []
+        for target, tmp_path, tmp_file, length, on_written in staged:
+            try:
+                with tmp_file:
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+                os.replace(tmp_path, target)
+                written.append((target, length, on_written))
+            except OSError as e:
+                self._failed(target, tmp_path, e)
+        
+        for directory in {target.parent for target, _, _ in written}:
+            try:
+                dir_fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue  # plataformas sem fsync de diretório
+            try:
+                os.fsync(dir_fd)
+            except OSError:
+                pass
+            finally:
+                os.close(dir_fd)
+        
+        size = sum(length for _, length, _ in written)
+        self.stats['written'] += len(written)
+        self.stats['bytes'] += size
+        self.stats['groups'] += 1
+        if self.metrics is not None:
+            self.metrics.record('save', time.perf_counter() - start, bytes=size, files=len(written))
+        for _, _, on_written in written:
+            if on_written is not None:
+                on_written()
+    
+    def _failed(self, target: Path, tmp_path: Path, error: OSError):
+        logger.warning(f"Erro ao gravar {target}: {error}")
+        self.errors.append({'path': str(target), 'error': str(error)})
+        try:
+            tmp_path.unlink(missing_ok=True)
+        except OSError:
+            pass
+
 class TestValidator:
     """Validador de testes gerados."""
     
@@ -257,12 +1658,7 @@ class TestValidator:
     def validate_test_code(self, test_code: str) -> Dict[str, Any]:
         """Valida código de teste."""
         try:
-            tree = ast.parse(test_code)
-            
-            test_functions = []
-            for node in ast.walk(tree):
-                if isinstance(node, ast.FunctionDef) and node.name.startswith('test_'):
-                    test_functions.append(node.name)
+            test_functions = run_analysis(ast.parse(test_code)).test_functions
             
             return {
                 'is_valid': True,
@@ -279,125 +1675,2467 @@ class TestValidator:
                 'coverage_score': 0
             }
 
-class TestGeneratorAgent:
-    """Agente principal para geração de testes."""
-    
-    def __init__(self, config_manager: ConfigManager):
-        """Inicializa o agente."""
-        self.config = config_manager
-        self.analyzer = CodeAnalyzer()
-        self.validator = TestValidator()
-        
-        if self.config.simulate_mode:
-            self.llm = SimulatedLLM()
-            logger.info("Modo simulação ativado")
-        else:
+SANDBOX_RUNNER = r'''
+import json, sys
+config = json.loads(sys.argv[1])
+try:
+    import resource
+    limits = [(resource.RLIMIT_CPU, config['cpu_seconds']), (resource.RLIMIT_AS, config['memory_bytes']),
+              (resource.RLIMIT_FSIZE, config['file_bytes']), (resource.RLIMIT_CORE, 0)]
+    for limit, value in limits:
+        if value:
+            hard = value + 1 if limit == resource.RLIMIT_CPU else value
             try:
-                from langchain_openai import AzureChatOpenAI
-                self.llm = AzureChatOpenAI(**self.config.azure_config)
-                logger.info("Azure OpenAI configurado")
-            except ImportError:
-                logger.warning("LangChain não instalado, usando simulação")
-                self.llm = SimulatedLLM()
-                self.config.simulate_mode = True
-    
-    def generate_tests(self, source_code: str) -> Dict[str, Any]:
-        """Gera testes para código fornecido."""
-        try:
-            # Analisar código
+                resource.setrlimit(limit, (value, hard))
+            except (ValueError, OSError):
+                pass
+except ImportError:
+    pass
+sys.path.insert(0, config['workdir'])
+sys.argv = ['pytest']
+import pytest
+cov = None
+if config['coverage']:
+    try:
+        import coverage
+        cov = coverage.Coverage(branch=True, data_file=None, include=[config['module_path']])
+        cov.start()
+    except ImportError:
+        cov = None
+code = pytest.main(config['pytest_args'])
+if cov is not None:
+    cov.stop()
+    try:
+        cov.json_report(outfile=config['coverage_file'])
+    except Exception:
+        # Nenhum dado coletado: o módulo testado nem chegou a ser importado
+        with open(config['coverage_file'], 'w') as handle:
+            json.dump({'no_data': True}, handle)
+sys.exit(int(code))
+'''
+
+def _run_pytest_session(config: Dict[str, Any]) -> int:
+    """Roda pytest sob coverage no processo atual (usado pelos workers pré-aquecidos)."""
+    import pytest
+    cov = None
+    if config['coverage']:
+        try:
+            import coverage
+            cov = coverage.Coverage(branch=True, data_file=None, include=[config['module_path']])
+            cov.start()
+        except ImportError:
+            cov = None
+    try:
+        return int(pytest.main(config['pytest_args']))
+    finally:
+        if cov is not None:
+            cov.stop()
+            try:
+                cov.json_report(outfile=config['coverage_file'])
+            except Exception:
+                with open(config['coverage_file'], 'w') as handle:
+                    json.dump({'no_data': True}, handle)
+
+def _warm_worker_main(conn, preload: List[str], memory_bytes: int, env: Dict[str, str]):
+    """Laço de um worker de testes: importa pytest e dependências uma vez e atende execuções."""
+    # Nenhuma credencial do processo pai fica visível aos testes
+    os.environ.clear()
+    os.environ.update(env)
+    sys.dont_write_bytecode = True
+    try:
+        import resource
+        if memory_bytes:
+            resource.setrlimit(resource.RLIMIT_AS, (memory_bytes, memory_bytes))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    except (ImportError, ValueError, OSError):
+        pass
+    for name in ['pytest', 'coverage', *preload]:
+        try:
+            __import__(name)
+        except ImportError:
+            pass
+    
+    baseline_path = list(sys.path)
+    home = os.getcwd()
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        conn.send(_run_warm_task(task, baseline_path, home))
+
+def _run_warm_task(config: Dict[str, Any], baseline_path: List[str], home: str) -> Dict[str, Any]:
+    """Executa um módulo de testes e limpa os módulos importados a partir do diretório da execução."""
+    workdir = config['workdir']
+    try:
+        import resource
+        # RLIMIT_CPU é acumulativo: o limite desta execução parte do tempo já consumido pelo worker
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+        soft = int(usage.ru_utime + usage.ru_stime) + config['cpu_seconds']
+        if config['cpu_seconds'] and (hard == resource.RLIM_INFINITY or soft < hard):
+            resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+    except (ImportError, ValueError, OSError):
+        pass
+    
+    output_path = os.path.join(workdir, 'output.txt')
+    saved_fds = [os.dup(1), os.dup(2)]
+    with open(output_path, 'wb') as output:
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+    import tempfile
+    saved_env = dict(os.environ)
+    os.environ.update(HOME=workdir, TMPDIR=workdir)
+    tempfile.tempdir = workdir
+    os.chdir(workdir)
+    sys.path.insert(0, workdir)
+    try:
+        returncode = _run_pytest_session(config)
+    except BaseException as e:  # inclui SystemExit disparado pelo código testado
+        returncode = 3
+        print(f"{type(e).__name__}: {e}", file=sys.stderr)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved_fds[0], 1)
+        os.dup2(saved_fds[1], 2)
+        for fd in saved_fds:
+            os.close(fd)
+        os.chdir(home)
+        os.environ.clear()
+        os.environ.update(saved_env)
+        tempfile.tempdir = None
+        sys.path[:] = baseline_path
+        # Namespace limpo: remove o módulo testado, os testes e qualquer outro arquivo do diretório
+        for name, module in list(sys.modules.items()):
+            if (getattr(module, '__file__', None) or '').startswith(workdir):
+                del sys.modules[name]
+    
+    with open(output_path, encoding='utf-8', errors='replace') as output:
+        return {'returncode': returncode, 'output': output.read()}
+
+class WarmTestPool:
+    """Workers de teste de longa duração, criados por fork a partir de um servidor com pytest pré-importado."""
+
+    def __init__(self, workers: int, max_runs: int = 50, preload: Iterable[str] = (),
+                 memory_bytes: int = 0, env: Optional[Dict[str, str]] = None):
+        """Prepara os slots; os processos sobem sob demanda (ou via warm())."""
+        import multiprocessing
+        methods = multiprocessing.get_all_start_methods()
+        self._context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        self.preload = [name for name in preload if name]
+        if 'forkserver' in methods:
+            self._context.set_forkserver_preload(['pytest', 'coverage', *self.preload])
+        self.max_runs = max(1, max_runs)
+        self.memory_bytes = memory_bytes
+        self.env = env or {}
+        self.workers = workers
+        self.stats = {'spawned': 0, 'recycled': 0, 'killed': 0, 'runs': 0}
+        self._idle = queue.Queue()
+        for _ in range(workers):
+            self._idle.put(None)
+        atexit.register(self.close)
+
+    def warm(self):
+        """Sobe todos os workers de uma vez, antes das primeiras execuções."""
+        slots = [self._idle.get() for _ in range(self.workers)]
+        for slot in slots:
+            self._idle.put(slot if slot is not None else self._spawn())
+
+    def run(self, config: Dict[str, Any], timeout: float) -> tuple:
+        """Executa uma tarefa em um worker livre; retorna (saída, código de saída, tempo esgotado)."""
+        worker = self._idle.get()
+        try:
+            if worker is None or not worker['process'].is_alive():
+                worker = self._spawn()
+            reply = None
+            timed_out = False
+            try:
+                worker['conn'].send(config)
+                timed_out = not worker['conn'].poll(timeout)
+                if not timed_out:
+                    reply = worker['conn'].recv()
+            except (EOFError, OSError):
+                reply = None  # worker morreu (ex.: limite de CPU/memória, SIGKILL)
+            if reply is None:
+                returncode = self._kill(worker)
+                worker = None
+                return '', returncode, timed_out
+            
+            self.stats['runs'] += 1
+            worker['runs'] += 1
+            if worker['runs'] >= self.max_runs:
+                # Reciclagem periódica contra vazamentos de estado e memória
+                self._stop(worker)
+                self.stats['recycled'] += 1
+                worker = None
+            return reply['output'], reply['returncode'], False
+        finally:
+            self._idle.put(worker)
+
+    def close(self):
+        """Encerra todos os workers ociosos."""
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if worker is not None:
+                self._stop(worker)
+
+    def _spawn(self) -> Dict[str, Any]:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_warm_worker_main, daemon=True,
+                                        args=(child_conn, self.preload, self.memory_bytes, self.env))
+        process.start()
+        child_conn.close()
+        self.stats['spawned'] += 1
+        return {'process': process, 'conn': parent_conn, 'runs': 0}
+
+    def _stop(self, worker: Dict[str, Any]):
+        try:
+            worker['conn'].send(None)
+        except (OSError, ValueError):
+            pass
+        worker['process'].join(1)
+        if worker['process'].is_alive():
+            worker['process'].kill()
+            worker['process'].join()
+        worker['conn'].close()
+
+    def _kill(self, worker: Dict[str, Any]) -> int:
+        if worker['process'].is_alive():
+            worker['process'].kill()
+        worker['process'].join()
+        worker['conn'].close()
+        self.stats['killed'] += 1
+        return worker['process'].exitcode
+
+class TestExecutor:
+    """Executa testes gerados com pytest e coverage em subprocessos isolados e com limites de recursos."""
+
+    def __init__(self, config_manager):
+        """Inicializa o executor a partir das configurações de teste."""
+        test_config = config_manager.test_config
+        self.min_coverage = test_config['min_coverage']
+        self.measure_coverage = test_config['coverage_analysis']
+        self.timeout = test_config['execution_timeout']
+        self.cpu_seconds = test_config['execution_cpu_seconds']
+        self.memory_mb = test_config['execution_memory_mb']
+        self.workers = max(1, test_config['execution_workers'])
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self.pool = None
+        if test_config['execution_pool'] == 'warm':
+            self.pool = WarmTestPool(self.workers, test_config['pool_max_runs'],
+                                     test_config['pool_preload'],
+                                     self.memory_mb * 1024 * 1024 if self.memory_mb else 0,
+                                     self._base_env())
+            self.pool.warm()
+
+    @staticmethod
+    def _base_env() -> Dict[str, str]:
+        """Ambiente mínimo: nenhuma credencial do processo pai chega aos testes."""
+        env = {'PATH': os.environ.get('PATH', ''), 'PYTHONDONTWRITEBYTECODE': '1', 'PYTHONHASHSEED': '0'}
+        for name in ('PYTHONPATH', 'VIRTUAL_ENV'):  # dependências do projeto testado
+            if os.environ.get(name):
+                env[name] = os.environ[name]
+        return env
+
+    def run(self, source_code: str, test_code: str, module_name: str) -> Dict[str, Any]:
+        """Roda os testes contra o código em um diretório temporário e retorna contagens e cobertura."""
+        import tempfile
+        with self._slots, tempfile.TemporaryDirectory(prefix='testgen_') as workdir:
+            workdir = Path(workdir)
+            module_path = workdir / f"{module_name}.py"
+            test_path = workdir / f"test_{module_name}.py"
+            module_path.write_text(source_code, encoding='utf-8')
+            test_path.write_text(test_code, encoding='utf-8')
+
+            config = {
+                'workdir': str(workdir),
+                'module_path': str(module_path),
+                'coverage': self.measure_coverage,
+                'coverage_file': str(workdir / 'coverage.json'),
+                'cpu_seconds': self.cpu_seconds,
+                'memory_bytes': self.memory_mb * 1024 * 1024 if self.memory_mb else 0,
+                'file_bytes': 50 * 1024 * 1024,
+                'pytest_args': [str(test_path), '-q', '-p', 'no:cacheprovider', '-o', 'addopts=',
+                                '--rootdir', str(workdir), '--confcutdir', str(workdir),
+                                '--junitxml', str(workdir / 'report.xml')]
+            }
+            start = time.perf_counter()
+            if self.pool is not None:
+                output, returncode, timed_out = self.pool.run(config, self.timeout)
+            else:
+                env = dict(self._base_env(), HOME=str(workdir), TMPDIR=str(workdir))
+                output, returncode, timed_out = self._run_process(
+                    [sys.executable, '-c', SANDBOX_RUNNER, json.dumps(config)], workdir, env
+                )
+            result = self._parse_report(workdir / 'report.xml')
+            result.update(self._parse_coverage(workdir / 'coverage.json'))
+
+        result.update({
+            'executed': True,
+            'returncode': returncode,
+            'timed_out': timed_out,
+            'duration': time.perf_counter() - start,
+            'min_coverage': self.min_coverage
+        })
+        if result['total'] == 0 or timed_out or returncode not in (0, 1):
+            if returncode is not None and returncode < 0:
+                # Encerrado por sinal: SIGXCPU/SIGKILL indicam limite de CPU, memória ou tempo
+                output = f"processo encerrado pelo sinal {-returncode}\n{output}"
+            result['output'] = output[-2000:]
+        result['pass_rate'] = result['passed'] / result['total'] * 100 if result['total'] else 0.0
+        tests_passed = (not timed_out and result['total'] > 0 and
+                        result['failed'] == 0 and result['errors'] == 0)
+        if not tests_passed:
+            result['gate_reason'] = 'tests_failed'
+        elif result['line_coverage'] is None:
+            # Sem medição o mínimo não pode ser comprovado; só passa se a cobertura foi desativada
+            result['gate_reason'] = 'coverage_unavailable' if self.measure_coverage else None
+        elif result['line_coverage'] < self.min_coverage:
+            result['gate_reason'] = 'coverage_below_minimum'
+        else:
+            result['gate_reason'] = None
+        result['gate_passed'] = result['gate_reason'] is None
+        return result
+
+    def _run_process(self, command: List[str], workdir: Path, env: Dict[str, str]) -> tuple:
+        """Executa o subprocesso em sua própria sessão, encerrando o grupo inteiro no timeout."""
+        import subprocess
+        process = subprocess.Popen(command, cwd=str(workdir), env=env, stdin=subprocess.DEVNULL,
+                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                   start_new_session=os.name == 'posix')
+        try:
+            output, _ = process.communicate(timeout=self.timeout)
+            timed_out = False
+        except subprocess.TimeoutExpired:
+            if os.name == 'posix':
+                os.killpg(process.pid, 9)
+            else:
+                process.kill()
+            output, _ = process.communicate()
+            timed_out = True
+        return output.decode('utf-8', errors='replace'), process.returncode, timed_out
+
+    @staticmethod
+    def compact_traceback(text: str, max_lines: int = 12) -> str:
+        """Mantém apenas as últimas linhas relevantes de um traceback."""
+        lines = [line[:200] for line in (text or '').splitlines() if line.strip()]
+        return '\n'.join(lines[-max_lines:])
+
+    def _parse_report(self, report_path: Path) -> Dict[str, Any]:
+        """Conta resultados e coleta falhas a partir do relatório JUnit do pytest."""
+        counts = {'total': 0, 'passed': 0, 'failed': 0, 'errors': 0, 'skipped': 0, 'failures': []}
+        if not report_path.exists():
+            return counts
+
+        import xml.etree.ElementTree as ElementTree
+        try:
+            root = ElementTree.parse(report_path).getroot()
+        except ElementTree.ParseError:
+            return counts
+
+        for case in root.iter('testcase'):
+            counts['total'] += 1
+            outcome = next((child for child in case if child.tag in ('failure', 'error', 'skipped')), None)
+            if outcome is None:
+                counts['passed'] += 1
+                continue
+            if outcome.tag == 'skipped':
+                counts['skipped'] += 1
+                continue
+            counts['failed' if outcome.tag == 'failure' else 'errors'] += 1
+            counts['failures'].append({
+                'test': case.get('name', ''),
+                'class': case.get('classname', ''),
+                'kind': outcome.tag,
+                'message': (outcome.get('message') or '')[:300],
+                'traceback': self.compact_traceback(outcome.text)
+            })
+        return counts
+
+    @staticmethod
+    def _parse_coverage(coverage_path: Path) -> Dict[str, Any]:
+        """Extrai cobertura de linhas e ramos do relatório JSON do coverage."""
+        if not coverage_path.exists():
+            return {'line_coverage': None, 'branch_coverage': None, 'missing_lines': []}
+
+        data = json.loads(coverage_path.read_text(encoding='utf-8'))
+        if data.get('no_data'):
+            return {'line_coverage': 0.0, 'branch_coverage': None, 'missing_lines': []}
+        totals = data.get('totals', {})
+        statements = totals.get('num_statements', 0)
+        branches = totals.get('num_branches', 0)
+        missing = [line for file_data in data.get('files', {}).values()
+                   for line in file_data.get('missing_lines', [])]
+        return {
+            'line_coverage': totals.get('covered_lines', 0) / statements * 100 if statements else 100.0,
+            'branch_coverage': totals.get('covered_branches', 0) / branches * 100 if branches else None,
+            'missing_lines': missing
+        }
+
+class TestCache:
+    """Cache persistente de testes gerados, endereçado por conteúdo (LRU)."""
+
+    def __init__(self, cache_dir: str, max_entries: int = 5000, max_mb: float = 100):
+        """Inicializa o cache e carrega o índice LRU a partir do disco."""
+        self.cache_dir = Path(cache_dir)
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = OrderedDict()  # chave -> tamanho em bytes, do menos ao mais recente
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(source_code: str, prompt: str, deployment_name: str, temperature: float) -> str:
+        """Gera a chave do cache a partir do código, prompt e parâmetros do modelo."""
+        payload = json.dumps([
+            hashlib.sha256(source_code.encode('utf-8')).hexdigest(),
+            hashlib.sha256(prompt.encode('utf-8')).hexdigest(),
+            deployment_name,
+            temperature
+        ])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def _load_index(self):
+        if not self.cache_dir.exists():
+            return
+
+        entries = []
+        for path in self.cache_dir.glob('*/*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total_bytes += size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Retorna a entrada do cache ou None, contabilizando hit/miss."""
+        with self._lock:
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+            path = self._entry_path(key)
+            try:
+                entry = json.loads(path.read_text(encoding='utf-8'))
+                os.utime(path)  # marca como usado recentemente
+            except (OSError, ValueError):
+                self._discard(key)
+                self.misses += 1
+                return None
+
+            self._index.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, entry: Dict[str, Any]):
+        """Grava uma entrada no cache e aplica a política de remoção."""
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        path = self._entry_path(key)
+
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f'.{threading.get_ident()}.tmp')
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+            self._total_bytes += len(data) - self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._evict()
+
+    def _evict(self):
+        while self._index and (len(self._index) > self.max_entries or
+                               self._total_bytes > self.max_bytes):
+            oldest = next(iter(self._index))
+            self._discard(oldest)
+
+    def _discard(self, key: str):
+        self._total_bytes -= self._index.pop(key, 0)
+        try:
+            self._entry_path(key).unlink()
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Retorna estatísticas do cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._index),
+                'bytes': self._total_bytes
+            }
+
+class MetricsRecorder:
+    """Instrumentação por etapa (spans) exportada em JSON lines e, opcionalmente, no formato Prometheus."""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+    FLUSH_EVERY = 100
+
+    def __init__(self, metrics_file: Optional[str] = None, enabled: bool = False,
+                 export_format: str = 'json'):
+        """Inicializa o registrador (desativado apenas mede, sem gravar nada)."""
+        self.enabled = enabled and bool(metrics_file)
+        self.metrics_file = Path(metrics_file) if metrics_file else None
+        self.export_format = export_format
+        self._lock = threading.Lock()
+        self._pending = []
+        self._stages = {}
+        self._counters = {}
+        if self.enabled:
+            atexit.register(self.flush)
+
+    @contextmanager
+    def span(self, name: str, timings: Optional[Dict[str, float]] = None, **attributes):
+        """Mede um bloco; atributos podem ser completados dentro do `with` (tokens, bytes...)."""
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            duration = time.perf_counter() - start
+            if timings is not None:
+                timings[name] = duration
+            self.record(name, duration, **attributes)
+
+    def record(self, name: str, duration: float, **attributes):
+        """Registra um span já medido e atualiza os agregados."""
+        if not self.enabled:
+            return
+
+        event = {'ts': datetime.now().isoformat(), 'span': name, 'duration_ms': round(duration * 1000, 3)}
+        event.update({key: value for key, value in attributes.items() if value is not None})
+
+        with self._lock:
+            stage = self._stages.setdefault(name, {'count': 0, 'sum': 0.0, 'max': 0.0,
+                                                   'buckets': [0] * len(self.BUCKETS)})
+            stage['count'] += 1
+            stage['sum'] += duration
+            stage['max'] = max(stage['max'], duration)
+            for index, bound in enumerate(self.BUCKETS):
+                if duration <= bound:
+                    stage['buckets'][index] += 1
+
+            for key in ('prompt_tokens', 'completion_tokens', 'bytes'):
+                if attributes.get(key):
+                    counter = (name, key)
+                    self._counters[counter] = self._counters.get(counter, 0) + attributes[key]
+            if 'cache_hit' in attributes:
+                counter = (name, 'cache_hits' if attributes['cache_hit'] else 'cache_misses')
+                self._counters[counter] = self._counters.get(counter, 0) + 1
+
+            self._pending.append(event)
+            should_flush = len(self._pending) >= self.FLUSH_EVERY
+
+        if should_flush:
+            self.flush()
+
+    def flush(self):
+        """Anexa os eventos pendentes ao arquivo de métricas (e atualiza o .prom, se configurado)."""
+        if not self.enabled:
+            return
+
+        with self._lock:
+            pending, self._pending = self._pending, []
+        try:
+            self.metrics_file.parent.mkdir(parents=True, exist_ok=True)
+            if pending:
+                with open(self.metrics_file, 'a', encoding='utf-8') as handle:
+                    handle.write(''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in pending))
+            if self.export_format in ('prometheus', 'both'):
+                prom_path = self.metrics_file.with_suffix('.prom')
+                temp_path = prom_path.with_suffix('.prom.tmp')
+                temp_path.write_text(self.prometheus_text(), encoding='utf-8')
+                os.replace(temp_path, prom_path)
+        except OSError as e:
+            logger.warning(f"Falha ao gravar métricas: {e}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Contagem, média e máximo (em segundos) por etapa."""
+        with self._lock:
+            return {name: {'count': stage['count'],
+                           'mean': stage['sum'] / stage['count'] if stage['count'] else 0.0,
+                           'max': stage['max']}
+                    for name, stage in self._stages.items()}
+
+    def prometheus_text(self) -> str:
+        """Exposição em texto no formato Prometheus."""
+        lines = ['# HELP testgen_stage_duration_seconds Duração das etapas da geração de testes',
+                 '# TYPE testgen_stage_duration_seconds histogram']
+        with self._lock:
+            for name, stage in sorted(self._stages.items()):
+                for bound, count in zip(self.BUCKETS, stage['buckets']):
+                    lines.append(f'testgen_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {count}')
+                lines.append(f'testgen_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {stage["count"]}')
+                lines.append(f'testgen_stage_duration_seconds_sum{{stage="{name}"}} {stage["sum"]:.6f}')
+                lines.append(f'testgen_stage_duration_seconds_count{{stage="{name}"}} {stage["count"]}')
+
+            lines += ['# HELP testgen_stage_total Tokens, bytes e acessos ao cache por etapa',
+                      '# TYPE testgen_stage_total counter']
+            for (name, key), value in sorted(self._counters.items()):
+                lines.append(f'testgen_stage_total{{stage="{name}",kind="{key}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+# Janela de contexto por família de modelo (prefixo do nome do deployment)
+CONTEXT_WINDOWS = {
+    'gpt-4o': 128000,
+    'gpt-4-turbo': 128000,
+    'gpt-4-1106': 128000,
+    'gpt-4-0125': 128000,
+    'gpt-4-32k': 32768,
+    'gpt-4': 8192,
+    'gpt-35-turbo-16k': 16385,
+    'gpt-35-turbo': 16385,
+    'gpt-3.5-turbo': 16385
+}
+
+class TokenCounter:
+    """Contador de tokens com tiktoken (estimativa por caracteres se indisponível)."""
+    
+    def __init__(self, model_name: str):
+        """Carrega o encoding do modelo, com fallback para cl100k_base."""
+        self.model_name = model_name
+        self._encoding = None
+        try:
+            import tiktoken
+            try:
+                self._encoding = tiktoken.encoding_for_model(model_name)
+            except KeyError:
+                self._encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception as e:
+            logger.warning(f"tiktoken indisponível, usando estimativa de tokens ({e})")
+    
+    @property
+    def exact(self) -> bool:
+        return self._encoding is not None
+    
+    def count(self, text: str) -> int:
+        """Conta tokens de um texto."""
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        return max(1, len(text) // 4)
+    
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Corta o texto para no máximo max_tokens, terminando em fim de linha."""
+        if self._encoding is not None:
+            tokens = self._encoding.encode(text, disallowed_special=())
+            truncated = self._encoding.decode(tokens[:max(0, max_tokens)])
+        else:
+            truncated = text[:max(0, max_tokens) * 4]
+        return truncated.rsplit('\n', 1)[0] if '\n' in truncated else truncated
+
+class PromptBudget:
+    """Ajusta o código-fonte do prompt à janela de contexto do deployment."""
+    
+    def __init__(self, config_manager):
+        """Calcula o orçamento de tokens a partir das configurações."""
+        azure = config_manager.azure_config
+        perf = config_manager.performance_config
+        self.counter = TokenCounter(azure['deployment_name'])
+        self.context_window = perf['context_window'] or self.context_window_for(azure['deployment_name'])
+        # A resposta (max_tokens) e uma margem de segurança saem da janela de contexto
+        self.prompt_budget = max(256, self.context_window - azure['max_tokens'] -
+                                 perf['prompt_safety_margin'])
+    
+    @staticmethod
+    def context_window_for(deployment_name: str) -> int:
+        """Janela de contexto estimada pelo nome do deployment."""
+        name = deployment_name.lower()
+        for prefix in sorted(CONTEXT_WINDOWS, key=len, reverse=True):
+            if name.startswith(prefix):
+                return CONTEXT_WINDOWS[prefix]
+        return 8192
+    
+    def fit_source(self, source_code: str, available_tokens: int) -> Dict[str, Any]:
+        """Retorna o código que cabe no orçamento: completo, resumido ou truncado."""
+        source_tokens = self.counter.count(source_code)
+        fitted = {
+            'source': source_code,
+            'mode': 'full',
+            'original_tokens': source_tokens,
+            'tokens': source_tokens
+        }
+        if source_tokens <= available_tokens:
+            return fitted
+        
+        # 1) Resumir: substituir corpos das maiores funções por "..." (mantendo assinatura e docstring)
+        summarized, summarized_tokens = self._summarize(source_code, source_tokens, available_tokens)
+        fitted.update(source=summarized, mode='summarized', tokens=summarized_tokens)
+        if summarized_tokens <= available_tokens:
+            return fitted
+        
+        # 2) Truncar o que ainda exceder
+        marker = "\n# ... (código truncado para caber na janela de contexto)"
+        truncated = self.counter.truncate(summarized, available_tokens - self.counter.count(marker))
+        fitted.update(source=truncated + marker, mode='truncated',
+                      tokens=self.counter.count(truncated + marker))
+        return fitted
+    
+    def _summarize(self, source_code: str, source_tokens: int, available_tokens: int) -> tuple:
+        try:
+            tree = ast.parse(source_code)
+        except SyntaxError:
+            return source_code, source_tokens
+        
+        lines = source_code.splitlines()
+        candidates = []
+        self._collect_bodies(tree, candidates, inside_function=False)
+        # Maiores corpos primeiro: cada substituição economiza o máximo de tokens
+        candidates.sort(key=lambda item: item[1] - item[0], reverse=True)
+        
+        replacements = {}
+        tokens = source_tokens
+        for first, last, indent in candidates:
+            if tokens <= available_tokens:
+                break
+            removed = '\n'.join(lines[first - 1:last])
+            placeholder = f"{indent}...  # corpo omitido ({last - first + 1} linhas)"
+            replacements[first] = (last, placeholder)
+            tokens -= self.counter.count(removed) - self.counter.count(placeholder)
+        
+        output = []
+        line_number = 1
+        while line_number <= len(lines):
+            if line_number in replacements:
+                last, placeholder = replacements[line_number]
+                output.append(placeholder)
+                line_number = last + 1
+            else:
+                output.append(lines[line_number - 1])
+                line_number += 1
+        
+        summarized = '\n'.join(output)
+        return summarized, self.counter.count(summarized)
+    
+    def _collect_bodies(self, node, candidates: List[tuple], inside_function: bool):
+        """Coleta intervalos de corpo (sem docstring) de funções não aninhadas."""
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                if not inside_function:
+                    body = child.body
+                    if (isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant)
+                            and isinstance(body[0].value.value, str)):
+                        body = body[1:]
+                    if body and body[0].lineno > child.lineno:
+                        indent = ' ' * body[0].col_offset
+                        candidates.append((body[0].lineno, body[-1].end_lineno, indent))
+                self._collect_bodies(child, candidates, inside_function=True)
+            else:
+                self._collect_bodies(child, candidates, inside_function)
+
+class RateLimiter:
+    """Orçamento de requisições e tokens por minuto compartilhado entre workers (token bucket)."""
+    
+    _shared = {}
+    _shared_lock = threading.Lock()
+    
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0):
+        """Cria os baldes; valores 0 desativam o respectivo limite."""
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._lock = threading.Lock()
+        self._request_level = float(requests_per_minute)
+        self._token_level = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+    
+    @classmethod
+    def shared(cls, key: str, requests_per_minute: int, tokens_per_minute: int) -> 'RateLimiter':
+        """Retorna o limitador compartilhado de um deployment (um por processo)."""
+        with cls._shared_lock:
+            limiter = cls._shared.get(key)
+            if limiter is None or (limiter.rpm, limiter.tpm) != (requests_per_minute, tokens_per_minute):
+                limiter = cls._shared[key] = cls(requests_per_minute, tokens_per_minute)
+            return limiter
+    
+    def _reserve(self, tokens: int) -> float:
+        """Reserva capacidade e retorna quanto tempo esperar antes de enviar."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._updated
+            self._updated = now
+            wait = max(0.0, self._paused_until - now)
+            
+            if self.rpm:
+                self._request_level = min(self.rpm, self._request_level + elapsed * self.rpm / 60)
+                self._request_level -= 1
+                if self._request_level < 0:
+                    wait = max(wait, -self._request_level * 60 / self.rpm)
+            
+            if self.tpm:
+                tokens = min(tokens, self.tpm)
+                self._token_level = min(self.tpm, self._token_level + elapsed * self.tpm / 60)
+                self._token_level -= tokens
+                if self._token_level < 0:
+                    wait = max(wait, -self._token_level * 60 / self.tpm)
+            
+            return wait
+    
+    def acquire(self, tokens: int = 0):
+        """Aguarda (bloqueando) até haver orçamento para a requisição."""
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+    
+    async def aacquire(self, tokens: int = 0):
+        """Versão assíncrona de acquire."""
+        import asyncio
+        wait = self._reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Suspende todos os workers (ex.: após um 429 com Retry-After)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class ResilientLLMClient:
+    """Camada sobre o LLM com retentativas, backoff exponencial com jitter e limite de taxa."""
+    
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+    
+    def __init__(self, llm, max_retries: int = 3, base_delay: float = 1.0,
+                 max_delay: float = 60.0, rate_limiter: Optional[RateLimiter] = None):
+        """Inicializa o cliente."""
+        self.llm = llm
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.rate_limiter = rate_limiter
+        self._lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'throttled': 0, 'failures': 0}
+    
+    def invoke(self, prompt: str, tokens: int = 0):
+        """Invoca o LLM respeitando o limite de taxa e repetindo falhas transitórias."""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(tokens)
+            try:
+                self._count('requests')
+                return self.llm.invoke(prompt)
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+    
+    async def ainvoke(self, prompt: str, tokens: int = 0):
+        """Versão assíncrona de invoke."""
+        import asyncio
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                await self.rate_limiter.aacquire(tokens)
+            try:
+                self._count('requests')
+                if hasattr(self.llm, 'ainvoke'):
+                    return await self.llm.ainvoke(prompt)
+                return await asyncio.to_thread(self.llm.invoke, prompt)
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+    
+    def stream(self, prompt: str, tokens: int = 0):
+        """Streaming do LLM; falhas só são repetidas antes do primeiro pedaço recebido."""
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire(tokens)
+            try:
+                self._count('requests')
+                chunks = iter(self.llm.stream(prompt))
+                first = next(chunks, None)
+            except Exception as e:
+                delay = self._next_delay(e, attempt)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            
+            try:
+                if first is not None:
+                    yield first
+                yield from chunks
+            finally:
+                # Encerra a conexão quando o consumidor aborta a geração
+                close = getattr(chunks, 'close', None)
+                if close is not None:
+                    close()
+            return
+    
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+    
+    def _next_delay(self, error: Exception, attempt: int) -> Optional[float]:
+        """Espera antes da próxima tentativa, ou None se o erro deve ser propagado."""
+        status = self._status_code(error)
+        retryable = status in self.RETRYABLE_STATUS or (
+            status is None and any(word in type(error).__name__
+                                   for word in ('Timeout', 'Connection', 'RateLimit'))
+        )
+        if not retryable or attempt >= self.max_retries:
+            self._count('failures')
+            return None
+        
+        self._count('retries')
+        retry_after = self._retry_after(error)
+        if status == 429 or retry_after is not None:
+            self._count('throttled')
+        
+        if retry_after is not None:
+            if self.rate_limiter is not None:
+                self.rate_limiter.pause(retry_after)
+            delay = retry_after
+        else:
+            # Backoff exponencial com "full jitter"
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        
+        logger.warning(f"Falha transitória no LLM ({status or type(error).__name__}); "
+                       f"tentativa {attempt + 2}/{self.max_retries + 1} em {delay:.1f}s")
+        return delay
+    
+    @staticmethod
+    def _status_code(error: Exception) -> Optional[int]:
+        status = getattr(error, 'status_code', None)
+        if status is None:
+            status = getattr(getattr(error, 'response', None), 'status_code', None)
+        return status if isinstance(status, int) else None
+    
+    def _retry_after(self, error: Exception) -> Optional[float]:
+        """Lê Retry-After (ms, segundos ou data HTTP) dos headers ou da mensagem do Azure."""
+        headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+        try:
+            if headers.get('retry-after-ms'):
+                return min(self.max_delay, float(headers['retry-after-ms']) / 1000)
+            if headers.get('retry-after'):
+                value = headers['retry-after']
+                try:
+                    return min(self.max_delay, float(value))
+                except ValueError:
+                    from email.utils import parsedate_to_datetime
+                    moment = parsedate_to_datetime(value)
+                    return min(self.max_delay, max(0.0, moment.timestamp() - time.time()))
+        except (TypeError, ValueError):
+            pass
+        
+        match = re.search(r'retry after (\d+(?:\.\d+)?) second', str(error), re.IGNORECASE)
+        return min(self.max_delay, float(match.group(1))) if match else None
+
+class BatchCutoff:
+    """Limites de um lote (tokens e prazo): decide se novos arquivos ainda podem ser enviados.
+    
+    Chamadas em voo reservam uma estimativa de tokens (2x o código mais o custo fixo
+    do prompt, recalibrado pelos resultados reais) até o resultado chegar. Atingido
+    um limite, os arquivos restantes são apenas registrados como pulados.
+    """
+    
+    def __init__(self, budget_tokens: int = 0, deadline: float = 0, overhead: int = 0):
+        self.budget_tokens = budget_tokens
+        self.deadline = time.monotonic() + deadline if deadline else None
+        self.overhead = overhead
+        self.spent = 0
+        self.reason = None
+        self.skipped = []
+        self._reserved = {}
+        self._charged = 0
+    
+    @property
+    def enabled(self) -> bool:
+        return bool(self.budget_tokens or self.deadline)
+    
+    def admit(self, file_path: str, source_tokens: int = 0) -> bool:
+        """Reserva espaço para um arquivo; False se o orçamento ou o prazo acabou."""
+        estimate = 2 * source_tokens + self.overhead
+        if self.reason is None:
+            if self.deadline is not None and time.monotonic() >= self.deadline:
+                self.reason = 'deadline'
+            elif (self.budget_tokens and
+                  self.spent + sum(estimate for _, estimate in self._reserved.values()) + estimate
+                  > self.budget_tokens):
+                self.reason = 'budget_tokens'
+        if self.reason is not None:
+            self.skipped.append(file_path)
+            return False
+        self._reserved[file_path] = (source_tokens, estimate)
+        return True
+    
+    def charge(self, result: Dict[str, Any]):
+        """Troca a reserva de um arquivo pelos tokens efetivamente gastos."""
+        source_tokens, _ = self._reserved.pop(result.get('file_path'), (0, 0))
+        if result.get('coalesced') or result.get('cache_hit'):
+            return
+        usage = result.get('token_usage') or result
+        cost = usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0)
+        self.spent += cost
+        if cost:
+            # Média móvel do custo além do código, para as próximas estimativas
+            self._charged += 1
+            self.overhead += (max(0, cost - 2 * source_tokens) - self.overhead) / self._charged
+
+class SingleFlight:
+    """Coalesce chamadas idênticas em andamento: a primeira executa, as demais recebem o mesmo resultado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self.coalesced = 0
+
+    def _join(self, key: str) -> tuple:
+        """Registra a chamada; retorna (future, True) para quem deve executá-la."""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def _settle(self, key: str, future: Future, result=None, error: Optional[BaseException] = None):
+        with self._lock:
+            del self._calls[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def do(self, key: str, fn) -> tuple:
+        """Executa fn() ou aguarda a execução idêntica em andamento; retorna (resultado, compartilhado)."""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result, False
+
+    async def ado(self, key: str, coroutine_fn) -> tuple:
+        """Versão assíncrona de do (chamadas síncronas e assíncronas compartilham as mesmas chaves)."""
+        import asyncio
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future), True
+        try:
+            result = await coroutine_fn()
+        except BaseException as e:
+            self._settle(key, future, error=e)
+            raise
+        self._settle(key, future, result)
+        return result, False
+
+class LLMDispatcher:
+    """Despacha gerações concorrentes: asyncio para Azure, threads para simulação."""
+
+    _shared_loop = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, max_workers: int, use_async: bool = False):
+        """Inicializa o despachante."""
+        self.max_workers = max(1, max_workers)
+        self.use_async = use_async
+        self._executor = None
+        self._loop = None
+        self._semaphore = None
+
+    @classmethod
+    def event_loop(cls):
+        """Event loop do processo, em thread própria, reutilizado por todos os lotes.
+
+        As conexões do cliente HTTP assíncrono compartilhado pertencem a este loop,
+        então ele não é fechado entre lotes.
+        """
+        import asyncio
+        with cls._shared_lock:
+            if cls._shared_loop is None:
+                cls._shared_loop = asyncio.new_event_loop()
+                threading.Thread(target=cls._shared_loop.run_forever,
+                                 name='llm-dispatch-loop', daemon=True).start()
+            return cls._shared_loop
+
+    def __enter__(self):
+        if self.use_async:
+            import asyncio
+            # Loop em thread própria para aceitar submissões síncronas
+            self._loop = self.event_loop()
+            self._semaphore = asyncio.run_coroutine_threadsafe(
+                self._create_semaphore(), self._loop
+            ).result()
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix='llm-dispatch'
+            )
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+        self._loop = None
+        return False
+
+    async def _create_semaphore(self):
+        import asyncio
+        return asyncio.Semaphore(self.max_workers)
+
+    async def _guarded(self, async_fn, item):
+        async with self._semaphore:
+            return await async_fn(item)
+
+    def submit(self, sync_fn, async_fn, item) -> Future:
+        """Submete um item e retorna um Future concorrente."""
+        if self.use_async:
+            import asyncio
+            return asyncio.run_coroutine_threadsafe(self._guarded(async_fn, item), self._loop)
+        return self._executor.submit(sync_fn, item)
+
+    def map_ordered(self, sync_fn, async_fn, items, max_in_flight: Optional[int] = None):
+        """Processa itens concorrentemente, entregando resultados na ordem de entrada."""
+        limit = max_in_flight or self.max_workers * 2
+        pending = deque()
+
+        for item in items:
+            pending.append(self.submit(sync_fn, async_fn, item))
+            if len(pending) >= limit:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+def _analyze_file_job(code_file: tuple) -> tuple:
+    """Tarefa do pool de processos: analisa um arquivo e devolve só o resumo (sem AST)."""
+    file_path, source_code = code_file
+    return file_path, CodeAnalyzer().analyze_code(source_code)
+
+class TestGeneratorAgent:
+    """Agente principal para geração de testes."""
+    
+    def __init__(self, config_manager: ConfigManager):
+        """Inicializa o agente."""
+        self.config = config_manager
+        self.analyzer = CodeAnalyzer()
+        self.validator = TestValidator()
+        
+        perf = self.config.performance_config
+        system = self.config.system_config
+        self._prompt_budget = None
+        self._executor = None
+        self._lazy_lock = threading.Lock()
+        self.metrics = MetricsRecorder(system['metrics_file'], system['enable_metrics'],
+                                       system['metrics_format'])
+        self.cache = None
+        if perf['cache_enabled']:
+            self.cache = TestCache(perf['cache_directory'], perf['cache_max_entries'],
+                                   perf['cache_max_mb'])
+        
+        self.single_flight = SingleFlight()
+        self.rate_limiter = RateLimiter.shared(
+            self.config.azure_config['deployment_name'],
+            perf['rate_limit_rpm'], perf['rate_limit_tpm']
+        )
+        
+        if self.config.simulate_mode:
+            self.llm = SimulatedLLM()
+            logger.info("Modo simulação ativado")
+        else:
+            try:
+                from langchain_openai import AzureChatOpenAI
+                self.llm = AzureChatOpenAI(**self.config.get_llm_kwargs())
+                logger.info("Azure OpenAI configurado")
+            except ImportError:
+                logger.warning("LangChain não instalado, usando simulação")
+                self.llm = SimulatedLLM()
+                self.config.simulate_mode = True
+    
+    @property
+    def llm(self):
+        """Modelo de linguagem em uso."""
+        return self._llm
+    
+    @llm.setter
+    def llm(self, llm):
+        perf = self.config.performance_config
+        self._llm = llm
+        self.client = ResilientLLMClient(llm, perf['max_retries'], perf['retry_delay'],
+                                         perf['max_retry_delay'], self.rate_limiter)
+    
+    def generate_tests(self, source_code: str, code_analysis: Optional[Dict[str, Any]] = None,
+                       focus: Optional[List[str]] = None,
+                       module_name: Optional[str] = None,
+                       dependencies: Optional[str] = None) -> Dict[str, Any]:
+        """Gera testes para código fornecido (a análise pode vir pré-calculada)."""
+        start = time.perf_counter()
+        trace_id = os.urandom(6).hex()
+        try:
+            prepared = self._prepare_generation(source_code, code_analysis, focus, trace_id, module_name,
+                                                dependencies)
+            if 'prompt' not in prepared:
+                if not focus:
+                    self._execute_generated(prepared, source_code, module_name, trace_id)
+                return self._record_generation(prepared, start, trace_id)
+
+            # Gerar testes
+            with self.metrics.span('invoke', prepared['stage_timings'], trace=trace_id) as span:
+                # Prompts idênticos em voo (ex.: arquivos duplicados no lote) compartilham uma chamada
+                (response, leader_module), coalesced = self.single_flight.do(
+                    self._prompt_key(prepared['prompt'], prepared['prompt_info']['module_section']),
+                    lambda: (self._call_llm(prepared['prompt'], prepared['prompt_info']['prompt_tokens']),
+                             module_name)
+                )
+                span.update({key: value for key, value in self._reported_usage(response).items() if value},
+                            coalesced=coalesced)
+
+            result = self._finalize_generation(prepared, response,
+                                               self._coalesced_test_code(response, leader_module, module_name))
+            result['coalesced'] = coalesced
+            # Unidades (focus) são executadas após a união, no nível do arquivo
+            if not focus:
+                self._execute_generated(result, source_code, module_name, trace_id)
+            return self._record_generation(result, start, trace_id)
+
+        except Exception as e:
+            logger.error(f"Erro na geração de testes: {e}")
+            return self._record_generation({
+                'success': False,
+                'error': str(e)
+            }, start, trace_id)
+
+    async def agenerate_tests(self, source_code: str, code_analysis: Optional[Dict[str, Any]] = None,
+                              focus: Optional[List[str]] = None,
+                              module_name: Optional[str] = None,
+                              dependencies: Optional[str] = None) -> Dict[str, Any]:
+        """Versão assíncrona de generate_tests (usa ainvoke quando disponível)."""
+        import asyncio
+        start = time.perf_counter()
+        trace_id = os.urandom(6).hex()
+        try:
+            prepared = self._prepare_generation(source_code, code_analysis, focus, trace_id, module_name,
+                                                dependencies)
+            if 'prompt' not in prepared:
+                if not focus:
+                    await asyncio.to_thread(self._execute_generated, prepared, source_code,
+                                            module_name, trace_id)
+                return self._record_generation(prepared, start, trace_id)
+
+            with self.metrics.span('invoke', prepared['stage_timings'], trace=trace_id) as span:
+                async def call():
+                    return (await self._acall_llm(prepared['prompt'], prepared['prompt_info']['prompt_tokens']),
+                            module_name)
+
+                (response, leader_module), coalesced = await self.single_flight.ado(
+                    self._prompt_key(prepared['prompt'], prepared['prompt_info']['module_section']), call
+                )
+                span.update({key: value for key, value in self._reported_usage(response).items() if value},
+                            coalesced=coalesced)
+
+            result = self._finalize_generation(prepared, response,
+                                               self._coalesced_test_code(response, leader_module, module_name))
+            result['coalesced'] = coalesced
+            if not focus:
+                # Subprocesso bloqueante fora do event loop
+                await asyncio.to_thread(self._execute_generated, result, source_code,
+                                        module_name, trace_id)
+            return self._record_generation(result, start, trace_id)
+
+        except Exception as e:
+            logger.error(f"Erro na geração de testes: {e}")
+            return self._record_generation({
+                'success': False,
+                'error': str(e)
+            }, start, trace_id)
+
+    def generate_tests_streaming(self, source_code: str, on_token=None,
+                                 module_name: Optional[str] = None) -> Dict[str, Any]:
+        """Gera testes via `.stream()`, validando blocos à medida que chegam e abortando saídas degeneradas."""
+        start = time.perf_counter()
+        trace_id = os.urandom(6).hex()
+        try:
+            prepared = self._prepare_generation(source_code, trace_id=trace_id, module_name=module_name)
+            if 'prompt' not in prepared:
+                if on_token is not None and prepared.get('test_code'):
+                    on_token(prepared['test_code'])
+                self._execute_generated(prepared, source_code, module_name, trace_id)
+                return self._record_generation(prepared, start, trace_id)
+
+            parser = StreamingTestParser()
+            usage_chunk = None
+            timings = prepared['stage_timings']
+            with self.metrics.span('invoke', timings, trace=trace_id, streamed=True) as span:
+                chunks = self.client.stream(prepared['prompt'],
+                                            self._reserved_tokens(prepared['prompt'],
+                                                                  prepared['prompt_info']['prompt_tokens']))
+                try:
+                    for chunk in chunks:
+                        timings.setdefault('first_token', time.perf_counter() - start)
+                        if getattr(chunk, 'usage_metadata', None):
+                            usage_chunk = chunk
+                        text = self._response_text(chunk)
+                        if on_token is not None and text:
+                            on_token(text)
+                        if not parser.feed(text):
+                            break
+                finally:
+                    chunks.close()
+                parser.finish()
+                span.update(first_token_ms=round(timings.get('first_token', 0) * 1000, 3),
+                            abort_reason=parser.abort_reason)
+
+            if parser.abort_reason:
+                # Saída parcial não deve ser reaproveitada pelo cache
+                prepared['cache_key'] = None
+                logger.warning(f"Geração abortada: {parser.abort_reason}")
+
+            response = usage_chunk if usage_chunk is not None else parser.raw_text
+            result = self._finalize_generation(prepared, response, test_code=parser.code)
+            result.update(streamed=True, aborted=parser.abort_reason is not None,
+                          abort_reason=parser.abort_reason)
+            self._execute_generated(result, source_code, module_name, trace_id)
+            return self._record_generation(result, start, trace_id)
+
+        except Exception as e:
+            logger.error(f"Erro na geração de testes: {e}")
+            return self._record_generation({
+                'success': False,
+                'error': str(e)
+            }, start, trace_id)
+
+    def _record_generation(self, result: Dict[str, Any], start: float, trace_id: str) -> Dict[str, Any]:
+        """Registra o span agregado da geração (duração total, tokens, cache e bytes)."""
+        usage = result.get('token_usage') or {}
+        self.metrics.record(
+            'generate', time.perf_counter() - start, trace=trace_id,
+            success=result.get('success', False),
+            cache_hit=result.get('cache_hit', False),
+            prompt_tokens=usage.get('prompt_tokens'),
+            completion_tokens=usage.get('completion_tokens'),
+            bytes=len(result['test_code'].encode('utf-8')) if result.get('test_code') else None
+        )
+        return result
+
+    def _prepare_generation(self, source_code: str, code_analysis: Optional[Dict[str, Any]] = None,
+                            focus: Optional[List[str]] = None,
+                            trace_id: Optional[str] = None,
+                            module_name: Optional[str] = None,
+                            dependencies: Optional[str] = None) -> Dict[str, Any]:
+        """Analisa o código e monta o prompt (etapas anteriores à chamada ao LLM)."""
+        stage_timings = {}
+        
+        # Analisar código (a menos que já tenha sido analisado em paralelo)
+        if code_analysis is None:
+            with self.metrics.span('analyze', stage_timings, trace=trace_id,
+                                   bytes=len(source_code.encode('utf-8'))):
+                code_analysis = self.analyzer.analyze_code(source_code)
+
+        if 'error' in code_analysis:
+            return {
+                'success': False,
+                'error': code_analysis['error']
+            }
+
+        # Gerar prompt dentro do orçamento de tokens e consultar o cache
+        cached = None
+        with self.metrics.span('prompt', stage_timings, trace=trace_id) as span:
+            prompt, prompt_info = self._build_prompt(source_code, code_analysis, focus, module_name,
+                                                     dependencies)
+            span.update(prompt_tokens=prompt_info['prompt_tokens'],
+                        source_mode=prompt_info['source_mode'])
+
+            prepared = {
+                'code_analysis': code_analysis,
+                'prompt': prompt,
+                'prompt_info': prompt_info,
+                'cache_key': None,
+                'semantic_key': None,
+                'module_name': module_name,
+                'stage_timings': stage_timings,
+                'trace_id': trace_id
+            }
+
+            # Consultar cache: um acerto dispensa a chamada ao LLM
+            if self.cache is not None:
+                prepared['cache_key'] = TestCache.make_key(
+                    source_code, prompt,
+                    self.config.azure_config['deployment_name'],
+                    self.config.azure_config['temperature']
+                )
+                cached = self.cache.get(prepared['cache_key'])
+                # Unidades (focus) já passaram pelo cache semântico por unidade
+                if not focus and self.config.performance_config['semantic_cache']:
+                    prepared['semantic_key'] = self._module_semantic_key(source_code, prompt_info)
+                    if cached is None:
+                        cached = self._semantic_module_entry(prepared['semantic_key'], module_name)
+                span['cache_hit'] = cached is not None
+                span['semantic_hit'] = bool(cached and cached.get('semantic_hit'))
+
+        if cached is not None:
+            return {
+                'success': True,
+                'test_code': cached['test_code'],
+                'code_analysis': code_analysis,
+                'validation': cached['validation'],
+                'simulate_mode': self.config.simulate_mode,
+                'cache_hit': True,
+                'semantic_hit': cached.get('semantic_hit', False),
+                'token_usage': self._token_usage(prompt_info, None, None, cache_hit=True),
+                'stage_timings': stage_timings
+            }
+
+        return prepared
+
+    def _module_semantic_key(self, source_code: str, prompt_info: Dict[str, Any]) -> str:
+        """Chave do cache semântico de um módulo inteiro (fingerprint normalizado + template do prompt)."""
+        azure = self.config.azure_config
+        payload = json.dumps(['semantic-module', CodeAnalyzer.module_semantic_fingerprint(source_code),
+                              prompt_info['template_key'], azure['deployment_name'], azure['temperature']])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _semantic_module_entry(self, key: str, module_name: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Testes de um módulo equivalente, com o import trocado para o módulo atual."""
+        entry = self.cache.get(key)
+        if entry is None:
+            return None
+        test_code = rename_identifiers(entry['test_code'], {entry.get('module_name'): module_name})
+        return {
+            'test_code': test_code,
+            'validation': self.validator.validate_test_code(test_code),
+            'semantic_hit': True
+        }
+
+    def _finalize_generation(self, prepared: Dict[str, Any], response,
+                             test_code: Optional[str] = None) -> Dict[str, Any]:
+        """Valida os testes gerados, alimenta o cache e monta o resultado."""
+        raw_text = self._response_text(response)
+        if test_code is None:
+            test_code = strip_code_fences(raw_text)
+        with self.metrics.span('validate', prepared['stage_timings'], trace=prepared.get('trace_id'),
+                               bytes=len(test_code.encode('utf-8'))) as span:
+            validation = self.validator.validate_test_code(test_code)
+            span.update(tests=validation['test_count'], valid=validation['is_valid'])
+
+        # Somente testes válidos entram no cache para não perpetuar respostas ruins
+        if prepared['cache_key'] and validation['is_valid']:
+            self.cache.put(prepared['cache_key'], {
+                'test_code': test_code,
+                'validation': validation,
+                'created_at': datetime.now().isoformat()
+            })
+            if prepared.get('semantic_key'):
+                self.cache.put(prepared['semantic_key'], {
+                    'test_code': test_code,
+                    'validation': validation,
+                    'module_name': prepared.get('module_name'),
+                    'created_at': datetime.now().isoformat()
+                })
+
+        return {
+            'success': True,
+            'test_code': test_code,
+            'code_analysis': prepared['code_analysis'],
+            'validation': validation,
+            'simulate_mode': self.config.simulate_mode,
+            'cache_hit': False,
+            'token_usage': self._token_usage(prepared['prompt_info'], response, raw_text),
+            'stage_timings': prepared['stage_timings']
+        }
+
+    def _call_llm(self, prompt: str, prompt_tokens: Optional[int] = None):
+        """Chamada síncrona ao LLM (com retentativas e limite de taxa), retornando a resposta bruta."""
+        return self.client.invoke(prompt, self._reserved_tokens(prompt, prompt_tokens))
+
+    async def _acall_llm(self, prompt: str, prompt_tokens: Optional[int] = None):
+        """Chamada assíncrona ao LLM, retornando a resposta bruta."""
+        return await self.client.ainvoke(prompt, self._reserved_tokens(prompt, prompt_tokens))
+
+    @staticmethod
+    def _prompt_key(prompt: str, module_section: str = '') -> str:
+        """Chave de coalescência de um prompt, sem a linha do módulo.
+        
+        Código idêntico em arquivos de nomes diferentes compartilha a chamada; o
+        import do módulo é trocado depois, em _coalesced_test_code.
+        """
+        if module_section:
+            prompt = prompt.replace(module_section, '')
+        return hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+
+    def _coalesced_test_code(self, response, leader_module: Optional[str],
+                             module_name: Optional[str]) -> Optional[str]:
+        """Testes de uma resposta compartilhada, com o módulo do líder trocado pelo deste arquivo."""
+        if not leader_module or not module_name or leader_module == module_name:
+            return None
+        return rename_identifiers(strip_code_fences(self._response_text(response)),
+                                  {leader_module: module_name})
+
+    def _reserved_tokens(self, prompt: str, prompt_tokens: Optional[int]) -> int:
+        """Tokens descontados da cota TPM: prompt + max_tokens da resposta (critério do Azure)."""
+        if not self.rate_limiter.tpm:
+            return 0
+        if prompt_tokens is None:
+            prompt_tokens = self.prompt_budget.counter.count(prompt)
+        return prompt_tokens + self.config.azure_config['max_tokens']
+
+    def _invoke_llm(self, prompt: str) -> str:
+        """Invoca o LLM de forma síncrona e retorna o texto gerado."""
+        return self._response_text(self._call_llm(prompt))
+
+    @property
+    def executor(self) -> Optional[TestExecutor]:
+        """Executor de testes em sandbox (None quando EXECUTE_TESTS está desativado)."""
+        if not self.config.test_config['execute_tests']:
+            return None
+        if self._executor is None:
+            with self._lazy_lock:
+                if self._executor is None:
+                    self._executor = TestExecutor(self.config)
+        return self._executor
+
+    def _execute_generated(self, result: Dict[str, Any], source_code: str, module_name: Optional[str],
+                           trace_id: Optional[str] = None) -> Dict[str, Any]:
+        """Roda os testes gerados em sandbox e troca a cobertura estimada pela medida."""
+        if self.executor is None or not result.get('success') or not result.get('test_code'):
+            return result
+
+        timings = result.setdefault('stage_timings', {})
+        with self.metrics.span('execute', timings, trace=trace_id) as span:
+            execution = self.executor.run(source_code, result['test_code'],
+                                          module_name or 'modulo_testado')
+            span.update(passed=execution['passed'], failed=execution['failed'] + execution['errors'],
+                        line_coverage=execution['line_coverage'], gate_passed=execution['gate_passed'])
+        self._attach_execution(result, execution)
+
+        if self.config.test_config['auto_repair'] and not execution['gate_passed']:
+            with self.metrics.span('repair', timings, trace=trace_id) as span:
+                self.repair_tests(result, source_code, module_name or 'modulo_testado')
+                span.update(iterations=result['repair']['iterations'], gate_passed=result['gate_passed'])
+        return result
+
+    def repair_tests(self, result: Dict[str, Any], source_code: str, module_name: str) -> Dict[str, Any]:
+        """Ciclo gerar → executar → reparar: reenvia só os testes que falharam, até atingir o gate ou MAX_ITERATIONS."""
+        max_iterations = self.config.test_config['max_iterations']
+        best_code, best = result['test_code'], result['execution']
+        history = []
+        stalls = 0
+        stopped = 'gate atingido' if best['gate_passed'] else 'limite de iterações'
+        analysis = result.get('code_analysis') or self.analyzer.analyze_code(source_code)
+        units = self.analyzer.extract_units(source_code, analysis) if 'error' not in analysis else []
+        usage = dict(result.get('token_usage') or {})
+
+        for iteration in range(1, max_iterations + 1):
+            if best['gate_passed']:
+                break
+            if best['gate_reason'] == 'coverage_unavailable':
+                # O LLM não tem como corrigir a falta de medição de cobertura
+                stopped = 'cobertura indisponível'
+                break
+            prompt = self._build_repair_prompt(best_code, best, source_code, units, module_name)
+            prompt_tokens = self.prompt_budget.counter.count(prompt)
+            response = self._call_llm(prompt, prompt_tokens)
+            reply = strip_code_fences(self._response_text(response))
+            reported = self._reported_usage(response)
+            usage['prompt_tokens'] = usage.get('prompt_tokens', 0) + (reported['prompt_tokens'] or prompt_tokens)
+            usage['completion_tokens'] = usage.get('completion_tokens', 0) + (
+                reported['completion_tokens'] or self.prompt_budget.counter.count(reply))
+
+            try:
+                # Falha de coleta (ex.: import errado): a resposta é o módulo inteiro
+                candidate = reply if best['total'] == 0 else splice_test_functions(best_code, reply)
+                ast.parse(candidate)
+            except SyntaxError:
+                history.append({'iteration': iteration, 'prompt_tokens': prompt_tokens, 'applied': False})
+                stalls += 1
+                if stalls >= 2:
+                    stopped = 'sem progresso'
+                    break
+                continue
+
+            execution = self.executor.run(source_code, candidate, module_name)
+            history.append({'iteration': iteration, 'prompt_tokens': prompt_tokens, 'applied': True,
+                            'passed': execution['passed'],
+                            'failed': execution['failed'] + execution['errors'],
+                            'line_coverage': execution['line_coverage']})
+            if self._execution_score(execution) > self._execution_score(best):
+                best_code, best = candidate, execution
+                stalls = 0
+            else:
+                stalls += 1
+                if stalls >= 2:
+                    stopped = 'sem progresso'
+                    break
+            if best['gate_passed']:
+                stopped = 'gate atingido'
+
+        usage['total_tokens'] = usage.get('prompt_tokens', 0) + usage.get('completion_tokens', 0)
+        result['token_usage'] = usage
+        result['test_code'] = best_code
+        result['validation'] = self.validator.validate_test_code(best_code)
+        result['repair'] = {'iterations': len(history), 'history': history, 'stopped': stopped}
+        return self._attach_execution(result, best)
+
+    @staticmethod
+    def _execution_score(execution: Dict[str, Any]) -> tuple:
+        """Ordena execuções: gate, menos falhas, mais cobertura, mais testes aprovados."""
+        return (execution['gate_passed'], -(execution['failed'] + execution['errors']),
+                execution['line_coverage'] or 0.0, execution['passed'])
+
+    def _build_repair_prompt(self, test_code: str, execution: Dict[str, Any], source_code: str,
+                             units: List[Dict[str, Any]], module_name: str) -> str:
+        """Prompt mínimo de reparo: testes que falharam, tracebacks resumidos e o código relevante."""
+        if execution['total'] == 0:
+            # Nada foi coletado: o problema está no módulo de testes como um todo
+            return f"""
+Os testes abaixo para o módulo `{module_name}` não puderam ser coletados pelo pytest.
+
+CÓDIGO ({module_name}.py):
+{source_code}
+
+TESTES:
+{test_code}
+
+SAÍDA DO PYTEST (resumida):
+{TestExecutor.compact_traceback(execution.get('output', ''), 20)}
+
+Responda apenas com o módulo de testes corrigido, completo, em Python (importe com `from {module_name} import ...`).
+"""
+
+        failing_source = extract_failing_tests(test_code, execution['failures']) if execution['failures'] else ''
+        referenced = CodeAnalyzer._referenced_names(ast.parse(failing_source)) if failing_source else set()
+        missing = set(execution.get('missing_lines') or [])
+        below_target = (execution['line_coverage'] is not None and
+                        execution['line_coverage'] < execution['min_coverage'])
+        uncovered = [unit for unit in units if below_target and
+                     any(unit['start_line'] <= line <= unit['end_line'] for line in missing)]
+        relevant = [unit for unit in units if unit['name'] in referenced or unit in uncovered]
+        code_section = '\n\n'.join(unit['source'] for unit in relevant) or source_code
+
+        sections = [f"""
+Você é um especialista em testes unitários Python. Os testes do módulo `{module_name}` foram executados com pytest.
+
+CÓDIGO RELEVANTE ({module_name}.py):
+{code_section}
+"""]
+        if failing_source:
+            errors = '\n'.join(f"- {failure['test']}: {failure['message']}\n{failure['traceback']}"
+                               for failure in execution['failures'][:10])
+            sections.append(f"""
+TESTES QUE FALHARAM:
+{failing_source}
+
+ERROS (resumidos):
+{errors}
+""")
+        if uncovered:
+            lines = ', '.join(str(line) for line in sorted(missing)[:40])
+            sections.append(f"""
+COBERTURA: {execution['line_coverage']:.0f}% (mínimo {execution['min_coverage']}%). Linhas não cobertas: {lines}.
+Gere testes adicionais, com nomes novos, para {', '.join(unit['name'] for unit in uncovered)}.
+""")
+        sections.append(f"""
+RESPONDA APENAS COM CÓDIGO PYTHON:
+1. As versões corrigidas dos testes que falharam, com os mesmos nomes (métodos dentro da mesma classe)
+2. Os novos testes pedidos, se houver
+3. Os imports necessários (`from {module_name} import ...`)
+Não repita testes que já passam. Se a expectativa do teste estiver errada, ajuste-a ao comportamento do código.
+""")
+        return ''.join(sections)
+
+    @staticmethod
+    def _attach_execution(result: Dict[str, Any], execution: Dict[str, Any]) -> Dict[str, Any]:
+        result['execution'] = execution
+        result['gate_passed'] = execution['gate_passed']
+        if execution['line_coverage'] is not None:
+            result['validation'] = dict(result['validation'], coverage_score=execution['line_coverage'],
+                                        coverage_measured=True)
+        return result
+
+    @property
+    def prompt_budget(self) -> PromptBudget:
+        """Orçamento de tokens do prompt (tiktoken carregado sob demanda)."""
+        if self._prompt_budget is None:
+            # Chamado em paralelo pelos workers do lote: cria uma única instância
+            with self._lazy_lock:
+                if self._prompt_budget is None:
+                    self._prompt_budget = PromptBudget(self.config)
+        return self._prompt_budget
+
+    def _token_usage(self, prompt_info: Dict[str, Any], response, test_code: Optional[str],
+                     cache_hit: bool = False) -> Dict[str, Any]:
+        """Consumo de tokens da requisição (reportado pela API ou contado localmente)."""
+        prompt_tokens = completion_tokens = 0
+        if not cache_hit:
+            reported = self._reported_usage(response)
+            prompt_tokens = reported.get('prompt_tokens') or prompt_info['prompt_tokens']
+            completion_tokens = (reported.get('completion_tokens') or
+                                 self.prompt_budget.counter.count(test_code))
+
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'estimated_prompt_tokens': prompt_info['prompt_tokens'],
+            'context_window': prompt_info['context_window'],
+            'source_mode': prompt_info['source_mode'],
+            'source_tokens': prompt_info['source_tokens'],
+            'original_source_tokens': prompt_info['original_source_tokens']
+        }
+
+    @staticmethod
+    def _reported_usage(response) -> Dict[str, int]:
+        """Extrai o uso de tokens informado pelo LangChain/Azure, se houver."""
+        usage = getattr(response, 'usage_metadata', None)
+        if usage:
+            return {'prompt_tokens': usage.get('input_tokens', 0),
+                    'completion_tokens': usage.get('output_tokens', 0)}
+        metadata = getattr(response, 'response_metadata', None) or {}
+        token_usage = metadata.get('token_usage') or {}
+        return {'prompt_tokens': token_usage.get('prompt_tokens', 0),
+                'completion_tokens': token_usage.get('completion_tokens', 0)}
+
+    @staticmethod
+    def _response_text(response) -> str:
+        """Extrai o texto da resposta (AIMessage do LangChain ou string simulada)."""
+        content = getattr(response, 'content', response)
+        return content if isinstance(content, str) else str(content)
+
+    def _supports_async(self) -> bool:
+        """Indica se o LLM atual deve ser despachado via asyncio."""
+        return not isinstance(self.llm, SimulatedLLM) and hasattr(self.llm, 'ainvoke')
+    
+    def _create_generation_prompt(self, source_code: str, analysis: Dict) -> str:
+        """Cria prompt para geração de testes."""
+        return self._build_prompt(source_code, analysis)[0]
+
+    def _build_prompt(self, source_code: str, analysis: Dict,
+                      focus: Optional[List[str]] = None,
+                      module_name: Optional[str] = None,
+                      dependencies: Optional[str] = None) -> tuple:
+        """Monta o prompt ajustando o código à janela de contexto; retorna (prompt, info)."""
+        stats = analysis['statistics']
+        focus_section = ''
+        if focus:
+            focus_section = (f"\nFOCO: gere testes apenas para {', '.join(focus)}. "
+                             f"As demais definições são contexto (imports e auxiliares).\n")
+        module_section = ''
+        if module_name:
+            module_section = (f"\nMÓDULO: o código está em `{module_name}.py`; importe-o com "
+                              f"`from {module_name} import ...`.\n")
+            focus_section += module_section
+        if dependencies:
+            focus_section += (f"\nDEPENDÊNCIAS DO PROJETO (API resumida; use mocks quando necessário):\n"
+                              f"{dependencies}\n")
+        
+        template = f"""
+Você é um especialista em testes unitários Python. Analise o código fornecido e gere testes completos usando {self.config.test_config['framework']}.
+
+CÓDIGO A TESTAR:
+{{source_code}}
+{focus_section}
+ESTATÍSTICAS:
+- Funções: {stats['total_functions']}
+- Classes: {stats['total_classes']}
+- Complexidade: {stats['complexity']}
+
+REQUISITOS:
+1. Use {self.config.test_config['framework']} como framework
+2. Inclua testes para casos normais e extremos
+3. Teste tratamento de exceções
+4. Adicione fixtures se necessário
+5. Use parametrização quando apropriado
+6. Cobertura mínima: {self.config.test_config['min_coverage']}%
+
+GERE TESTES COMPLETOS E FUNCIONAIS:
+"""
+        budget = self.prompt_budget
+        template_tokens = budget.counter.count(template.replace('{source_code}', ''))
+        fitted = budget.fit_source(source_code, budget.prompt_budget - template_tokens)
+        if fitted['mode'] != 'full':
+            logger.warning(f"Código {('resumido' if fitted['mode'] == 'summarized' else 'truncado')} "
+                           f"para caber no contexto ({fitted['original_tokens']} → {fitted['tokens']} tokens)")
+        
+        prompt = template.replace('{source_code}', fitted['source'])
+        template_key = hashlib.sha256(template.replace(module_section, '').encode('utf-8')).hexdigest()
+        return prompt, {
+            'prompt_tokens': template_tokens + fitted['tokens'],
+            'context_window': budget.context_window,
+            'source_mode': fitted['mode'],
+            'source_tokens': fitted['tokens'],
+            'original_source_tokens': fitted['original_tokens'],
+            'module_section': module_section,
+            'template_key': template_key
+        }
+    
+    def batch_generate_tests(self, code_files: Iterable[tuple],
+                             max_workers: Optional[int] = None,
+                             on_result=None, keep_results: bool = True,
+                             schedule: Optional[str] = None,
+                             journal: Optional[BatchJournal] = None,
+                             writer: Optional[TestWriter] = None) -> Dict[str, Any]:
+        """Gera testes para múltiplos arquivos de forma concorrente (ordem conforme `schedule`).
+        
+        Com `journal`, cada arquivo concluído é registrado assim que fica pronto e os
+        já registrados (código inalterado) entram no resultado sem chamar o LLM.
+        Com `writer`, os testes são gravados em segundo plano e o registro no diário
+        só acontece depois que o arquivo está no disco.
+        """
+        workers = max_workers or self.config.performance_config['max_workers']
+        use_async = self._supports_async()
+        start_time = time.perf_counter()
+        client_before = dict(self.client.stats)
+        stats = {}
+        results = []
+        records = []
+        resumed = []
+
+        def collect(result):
+            if result.get('resumed') and writer is not None and TestWriter.should_write(result):
+                target = writer.target(result['file_path'])
+                if not target.exists():
+                    writer.submit(result['file_path'], result['test_code'])
+                result['output_path'] = str(target)
+            if on_result is not None:
+                on_result(result)
+            records.append(self._summary_record(result))
+            if keep_results:
+                results.append(result)
+
+        def unfinished():
+            for code_file in code_files:
+                entry = journal.lookup(*code_file[:2]) if journal is not None else None
+                if entry is None:
+                    yield code_file
+                else:
+                    resumed.append(journal.as_result(entry))
+
+        for result in self.stream_generate_tests(unfinished(), workers, stats=stats, schedule=schedule):
+            while resumed:
+                collect(resumed.pop(0))
+            if writer is not None and TestWriter.should_write(result):
+                on_written = (lambda result=result: journal.record(result)) if journal is not None else None
+                result['output_path'] = str(writer.submit(result['file_path'], result['test_code'],
+                                                          on_written))
+            elif journal is not None:
+                journal.record(result)
+            collect(result)
+        while resumed:
+            collect(resumed.pop(0))
+
+        total_time = time.perf_counter() - start_time
+        self.metrics.flush()
+        summary = self._build_batch_summary(records, total_time, workers, use_async)
+        summary['analysis_time'] = stats.get('analysis_time', 0.0)
+        summary['analysis_jobs'] = self.config.performance_config['analysis_jobs']
+        summary['retries'] = self.client.stats['retries'] - client_before['retries']
+        summary['throttled'] = self.client.stats['throttled'] - client_before['throttled']
+        summary['resumed'] = sum(1 for record in records if record.get('resumed'))
+        summary['schedule'] = stats.get('schedule', 'glob')
+        for key in ('dependency_edges', 'cycles_broken', 'untested_files'):
+            if key in stats:
+                summary[key] = stats[key]
+        cutoff = stats.get('cutoff')
+        if cutoff is not None and cutoff.enabled:
+            summary['budget_spent'] = cutoff.spent
+            summary['cutoff_reason'] = cutoff.reason
+            summary['skipped_files'] = cutoff.skipped
+
+        return {
+            'results': results,
+            'summary': summary
+        }
+
+    def stream_generate_tests(self, code_files: Iterable[tuple], max_workers: Optional[int] = None,
+                              stats: Optional[Dict[str, Any]] = None,
+                              schedule: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Pipeline leitura → análise → geração, com itens em voo limitados e saída em ordem.
+        
+        `schedule` define a ordem: glob (descoberta), deps (grafo de imports) ou
+        priority (maior valor primeiro). BATCH_BUDGET_TOKENS/BATCH_DEADLINE interrompem
+        o envio de novos arquivos; os pulados ficam em stats['cutoff'].skipped.
+        """
+        perf = self.config.performance_config
+        workers = max_workers or perf['max_workers']
+        stats = stats if stats is not None else {}
+        stats['schedule'] = schedule or perf['schedule']
+        cutoff = stats['cutoff'] = BatchCutoff(perf['budget_tokens'], perf['deadline'],
+                                               self._prompt_overhead() if perf['budget_tokens'] else 0)
+        if stats['schedule'] == 'deps':
+            generated = self._dependency_ordered_generate(list(code_files), workers, stats)
+        else:
+            if stats['schedule'] == 'priority':
+                analyzed = self._prioritized(list(code_files), stats)
+            else:
+                analyzed = self._iter_pre_analyzed(iter(code_files), stats)
+            generated = self._dispatch_ordered(self._admitted(analyzed, cutoff), workers,
+                                               perf['max_in_flight'] or None)
+
+        for result in generated:
+            cutoff.charge(result)
+            yield result
+
+    def _dispatch_ordered(self, items: Iterator[tuple], workers: int,
+                          max_in_flight: Optional[int]) -> Iterator[Dict[str, Any]]:
+        """Gera os itens concorrentemente, entregando na ordem em que foram fornecidos."""
+        with LLMDispatcher(workers, use_async=self._supports_async()) as dispatcher:
+            yield from dispatcher.map_ordered(self._timed_generate, self._atimed_generate,
+                                              items, max_in_flight)
+
+    def _admitted(self, items: Iterator[tuple], cutoff: BatchCutoff) -> Iterator[tuple]:
+        """Repassa itens enquanto couberem no orçamento/prazo; o resto é registrado como pulado."""
+        for item in items:
+            if not cutoff.enabled or cutoff.admit(item[0], self.prompt_budget.counter.count(item[1])):
+                yield item
+
+    def _prompt_overhead(self) -> int:
+        """Tokens do prompt sem código: custo fixo de cada arquivo gerado."""
+        empty = {'statistics': {'total_functions': 0, 'total_classes': 0, 'complexity': 0}}
+        return self.prompt_budget.counter.count(self._build_prompt('', empty)[0])
+
+    def _analyze_all(self, code_files: List[tuple], stats: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Análise de todos os arquivos do lote (paralela com --jobs), antes de ordená-los."""
+        analyses, stats['analysis_time'] = self._pre_analyze(code_files)
+        for file_path, source_code in code_files:
+            if file_path not in analyses:
+                analyses[file_path] = self.analyzer.analyze_code(source_code)
+        return analyses
+
+    def _prioritized(self, code_files: List[tuple], stats: Dict[str, Any]) -> Iterator[tuple]:
+        """Ordena o lote por priority_score decrescente (empates mantêm a ordem de descoberta)."""
+        analyses = self._analyze_all(code_files, stats)
+        tested = find_tested_modules([file_path for file_path, _ in code_files],
+                                     self.config.system_config['exclude_patterns'])
+        scores = {file_path: priority_score(file_path, analyses[file_path], tested)
+                  for file_path, _ in code_files}
+        stats['untested_files'] = sum(1 for file_path, _ in code_files
+                                      if scores[file_path] and Path(file_path).stem not in tested)
+        for file_path, source_code in sorted(code_files, key=lambda item: -scores[item[0]]):
+            yield file_path, source_code, analyses[file_path]
+
+    def _dependency_ordered_generate(self, code_files: List[tuple], workers: int,
+                                     stats: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Gera em ordem de dependência: módulos folha primeiro, independentes em paralelo.
+        
+        Cada arquivo é liberado quando todas as dependências do lote terminaram e
+        recebe no prompt o resumo da API delas (não o código completo). Ciclos são
+        quebrados pelo arquivo com menos dependências pendentes.
+        """
+        from concurrent.futures import FIRST_COMPLETED, wait
+        analyses = self._analyze_all(code_files, stats)
+        graph = build_import_graph(code_files, analyses)
+        sources = dict(code_files)
+        waiting = {file_path: set(dependencies) for file_path, dependencies in graph.items()}
+        dependents = {file_path: [] for file_path in graph}
+        for file_path, dependencies in graph.items():
+            for dependency in dependencies:
+                dependents[dependency].append(file_path)
+        stats['dependency_edges'] = sum(len(dependencies) for dependencies in graph.values())
+        stats['cycles_broken'] = 0
+        summaries = {}
+        cutoff = stats['cutoff']
+
+        with LLMDispatcher(workers, use_async=self._supports_async()) as dispatcher:
+            running = {}
+            while waiting or running:
+                ready = [file_path for file_path, pending in waiting.items() if not pending]
+                if not ready and not running:
+                    ready = [min(waiting, key=lambda file_path: len(waiting[file_path]))]
+                    stats['cycles_broken'] += 1
+                for file_path in ready:
+                    del waiting[file_path]
+                    source_tokens = self.prompt_budget.counter.count(sources[file_path])
+                    if cutoff.enabled and not cutoff.admit(file_path, source_tokens):
+                        # Sem orçamento, nenhum dependente poderá ser enviado
+                        for remaining in waiting:
+                            cutoff.admit(remaining)
+                        waiting.clear()
+                        break
+                    context = self._dependency_context(graph[file_path], sources, summaries)
+                    item = (file_path, sources[file_path], analyses[file_path], None, context)
+                    future = dispatcher.submit(self._timed_generate, self._atimed_generate, item)
+                    running[future] = file_path
+
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_path = running.pop(future)
+                    for dependent in dependents[file_path]:
+                        if dependent in waiting:
+                            waiting[dependent].discard(file_path)
+                    result = future.result()
+                    result['dependencies'] = graph[file_path]
+                    yield result
+
+    def _dependency_context(self, dependencies: List[str], sources: Dict[str, str],
+                            summaries: Dict[str, str]) -> Optional[str]:
+        """Resumos de API das dependências de um arquivo, para o prompt."""
+        sections = []
+        for dependency in dependencies:
+            if dependency not in summaries:
+                summaries[dependency] = api_summary(sources[dependency])
+            if summaries[dependency]:
+                sections.append(f"# módulo {module_name_for(dependency)} ({dependency})\n"
+                                f"{summaries[dependency]}")
+        return '\n\n'.join(sections) or None
+
+    @staticmethod
+    def _summary_record(result: Dict[str, Any]) -> Dict[str, Any]:
+        """Versão compacta de um resultado, suficiente para o resumo do lote."""
+        record = {key: result.get(key) for key in ('file_path', 'success', 'latency', 'cache_hit',
+                                                   'coalesced', 'resumed', 'gate_passed', 'semantic_hit')}
+        # Respostas coalescidas não consumiram tokens próprios
+        usage = {} if result.get('coalesced') else result.get('token_usage') or result
+        record['prompt_tokens'] = usage.get('prompt_tokens', 0)
+        record['completion_tokens'] = usage.get('completion_tokens', 0)
+        return record
+
+    def analyze_files(self, code_files: List[tuple], jobs: int) -> Dict[str, Dict[str, Any]]:
+        """Analisa arquivos em um pool de processos, retornando apenas resumos serializáveis."""
+        if jobs <= 1 or len(code_files) < 2:
+            return {file_path: self.analyzer.analyze_code(source_code)
+                    for file_path, source_code in code_files}
+
+        from concurrent.futures import ProcessPoolExecutor
+        chunksize = max(1, len(code_files) // (jobs * 4))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            return dict(executor.map(_analyze_file_job, code_files, chunksize=chunksize))
+
+    def _iter_pre_analyzed(self, code_files: Iterator[tuple],
+                           stats: Dict[str, Any]) -> Iterator[tuple]:
+        """Analisa arquivos em processos à medida que são lidos (quando --jobs > 1)."""
+        jobs = self.config.performance_config['analysis_jobs']
+        stats.setdefault('analysis_time', 0.0)
+        if jobs <= 1:
+            yield from code_files
+            return
+
+        from concurrent.futures import ProcessPoolExecutor
+        pending = deque()
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            for code_file in code_files:
+                pending.append((code_file, executor.submit(_analyze_file_job, code_file)))
+                if len(pending) >= jobs * 4:
+                    yield self._collect_analysis(pending.popleft(), stats)
+            while pending:
+                yield self._collect_analysis(pending.popleft(), stats)
+
+    @staticmethod
+    def _collect_analysis(item: tuple, stats: Dict[str, Any]) -> tuple:
+        (file_path, source_code), future = item
+        start = time.perf_counter()
+        _, code_analysis = future.result()
+        stats['analysis_time'] += time.perf_counter() - start
+        return file_path, source_code, code_analysis
+
+    def _pre_analyze(self, code_files: List[tuple]) -> tuple:
+        """Executa a análise paralela quando --jobs > 1."""
+        jobs = self.config.performance_config['analysis_jobs']
+        if jobs <= 1:
+            return {}, 0.0
+
+        start = time.perf_counter()
+        analyses = self.analyze_files(code_files, jobs)
+        return analyses, time.perf_counter() - start
+
+    def _build_batch_summary(self, results: List[Dict[str, Any]], total_time: float,
+                             workers: int, use_async: bool) -> Dict[str, Any]:
+        """Monta o resumo de um processamento em lote."""
+        successful = sum(1 for result in results if result['success'])
+        summed_latency = sum(result['latency'] for result in results)
+        cache_hits = sum(1 for result in results if result.get('cache_hit'))
+        cache_misses = sum(1 for result in results
+                           if result['success'] and not result.get('cache_hit') and not result.get('resumed'))
+
+        return {
+            'total_files': len(results),
+            'successful': successful,
+            'failed': len(results) - successful,
+            'total_execution_time': total_time,
+            'max_workers': workers,
+            'concurrency_mode': 'asyncio' if use_async else 'threads',
+            'per_file_latency': [
+                {'file_path': result['file_path'], 'latency': result['latency']}
+                for result in results
+            ],
+            'summed_latency': summed_latency,
+            'speedup': summed_latency / total_time if total_time > 0 else 1.0,
+            'cache_hits': cache_hits,
+            'cache_misses': cache_misses,
+            'coalesced': sum(1 for result in results if result.get('coalesced')),
+            'semantic_hits': sum(1 for result in results if result.get('semantic_hit')),
+            'executed_files': sum(1 for result in results if result.get('gate_passed') is not None),
+            'gate_failures': sum(1 for result in results if result.get('gate_passed') is False),
+            'prompt_tokens': sum(self._summary_record(result)['prompt_tokens'] for result in results),
+            'completion_tokens': sum(self._summary_record(result)['completion_tokens']
+                                     for result in results)
+        }
+
+    def incremental_generate_tests(self, code_files: Iterable[tuple], manifest: IncrementalManifest,
+                                   max_workers: Optional[int] = None, on_result=None) -> Dict[str, Any]:
+        """Gera testes apenas para funções e classes novas ou alteradas desde a última execução.
+        
+        Cada arquivo é unido (e executado, se ativo) assim que suas unidades ficam
+        prontas; `on_result(result)` recebe o arquivo nesse momento.
+        """
+        code_files = list(code_files)  # o plano precisa comparar todos os arquivos com o manifesto
+        workers = max_workers or self.config.performance_config['max_workers']
+        use_async = self._supports_async()
+        start_time = time.perf_counter()
+
+        # Só arquivos cujo conteúdo mudou precisam de análise (paralela com --jobs)
+        changed_files = [(file_path, source_code) for file_path, source_code in code_files
+                         if manifest.get(file_path).get('source_hash') !=
+                         hashlib.sha256(source_code.encode('utf-8')).hexdigest()]
+        analyses, analysis_time = self._pre_analyze(changed_files)
+
+        plans = [self._plan_incremental_file(file_path, source_code, manifest.get(file_path),
+                                             analyses.get(file_path))
+                 for file_path, source_code in code_files]
+        pending = [item for plan in plans for item in plan['pending']]
+
+        generated = {}
+        to_generate, semantic = self._resolve_semantic_units(plans, pending, generated)
+        leaders = {item_path: key for key, item_path in semantic['leaders'].items()}
+        followers = {}
+        for item_path, leader_path in semantic['followers'].items():
+            followers.setdefault(leader_path, []).append(item_path)
+
+        plans_by_path = {plan['file_path']: plan for plan in plans}
+        waiting = {plan['file_path']: {item[0] for item in plan['pending']} - set(generated)
+                   for plan in plans}
+        finished = {}
+        executions = []
+        execution_pool = (ThreadPoolExecutor(max_workers=self.executor.workers)
+                          if self.executor is not None else None)
+
+        def emit(result):
+            if result.get('repair') and result['file_path'] in manifest.files:
+                # Execuções seguintes sobre o arquivo inalterado reaproveitam a versão reparada
+                manifest.files[result['file_path']]['test_code'] = result['test_code']
+            if on_result is not None:
+                on_result(result)
+
+        def finish(plan):
+            result = finished[plan['file_path']] = self._assemble_incremental_result(plan, generated, manifest)
+            if execution_pool is not None and result['success'] and result['incremental']['regenerated']:
+                executions.append((result, execution_pool.submit(
+                    self._execute_generated, result, plan['source_code'], module_name_for(plan['file_path'])
+                )))
+            else:
+                emit(result)
+
+        def drain(wait: bool = False):
+            while executions and (wait or executions[0][1].done()):
+                result, future = executions.pop(0)
+                future.result()
+                emit(result)
+
+        try:
+            for plan in plans:
+                if not waiting[plan['file_path']]:
+                    finish(plan)
+            with LLMDispatcher(workers, use_async=use_async) as dispatcher:
+                for unit_result in dispatcher.map_ordered(self._timed_generate,
+                                                          self._atimed_generate, to_generate):
+                    item_path = unit_result['file_path']
+                    generated[item_path] = unit_result
+                    ready = [item_path]
+                    if item_path in leaders:
+                        self._store_semantic_unit(leaders[item_path], item_path,
+                                                  followers.get(item_path, []), generated)
+                        ready += followers.get(item_path, [])
+                    for path in ready:
+                        file_path = path.rsplit('::', 1)[0]
+                        waiting[file_path].discard(path)
+                        if not waiting[file_path] and file_path not in finished:
+                            finish(plans_by_path[file_path])
+                    drain()
+            drain(wait=True)
+        finally:
+            if execution_pool is not None:
+                execution_pool.shutdown(wait=True)
+
+        results = [finished[plan['file_path']] for plan in plans]
+        manifest.save()
+        self.metrics.flush()
+
+        total_time = time.perf_counter() - start_time
+        summary = self._build_batch_summary(results, total_time, workers, use_async)
+        # No modo incremental o cache é contabilizado por unidade enviada ao LLM
+        summary['cache_hits'] = sum(1 for r in generated.values() if r.get('cache_hit'))
+        summary['cache_misses'] = sum(1 for r in generated.values()
+                                      if r['success'] and not r.get('cache_hit'))
+        summary['prompt_tokens'] = sum(self._summary_record(r)['prompt_tokens']
+                                       for r in generated.values())
+        summary['completion_tokens'] = sum(self._summary_record(r)['completion_tokens']
+                                           for r in generated.values())
+        summary['regenerated_units'] = len(pending)
+        summary['semantic_hits'] = sum(1 for r in generated.values() if r.get('semantic_hit'))
+        summary['reused_units'] = sum(len(r['incremental']['reused']) for r in results
+                                      if 'incremental' in r)
+        summary['unchanged_files'] = sum(1 for plan in plans if plan['unchanged'])
+        summary['analysis_time'] = analysis_time
+        summary['analysis_jobs'] = self.config.performance_config['analysis_jobs']
+
+        return {
+            'results': results,
+            'summary': summary
+        }
+
+    def _semantic_key(self, unit: Dict[str, Any]) -> str:
+        """Chave do cache semântico de uma unidade (fingerprint normalizado + parâmetros do modelo)."""
+        azure = self.config.azure_config
+        payload = json.dumps(['semantic', unit['semantic_fingerprint'],
+                              azure['deployment_name'], azure['temperature']])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _resolve_semantic_units(self, plans: List[Dict[str, Any]], pending: List[tuple],
+                                generated: Dict[str, Dict]) -> tuple:
+        """Atende unidades quase idênticas pelo cache semântico.
+        
+        Acertos vão direto para `generated`; duplicatas dentro do lote aguardam a
+        primeira ocorrência. Retorna os itens que ainda precisam do LLM.
+        """
+        semantic = {'leaders': {}, 'followers': {}}
+        if self.cache is None or not self.config.performance_config['semantic_cache']:
+            return pending, semantic
+
+        units = {f"{plan['file_path']}::{unit['name']}": unit
+                 for plan in plans for unit in plan['units']}
+        remaining = []
+        for item in pending:
+            unit = units[item[0]]
+            key = self._semantic_key(unit)
+            if key in semantic['leaders']:
+                semantic['followers'][item[0]] = semantic['leaders'][key]
+                continue
+            entry = self.cache.get(key)
+            if entry is not None:
+                generated[item[0]] = self._semantic_result(entry, item[0], unit['name'])
+            else:
+                semantic['leaders'][key] = item[0]
+                remaining.append(item)
+        return remaining, semantic
+
+    def _store_semantic_unit(self, key: str, item_path: str, follower_paths: List[str],
+                             generated: Dict[str, Dict]):
+        """Grava no cache semântico uma unidade gerada e distribui o resultado às duplicatas."""
+        result = generated[item_path]
+        entry = None
+        if result['success'] and result['validation']['is_valid']:
+            entry = {
+                'test_code': result['test_code'],
+                'validation': result['validation'],
+                'unit_name': item_path.split('::', 1)[1],
+                'module_name': module_name_for(item_path),
+                'created_at': datetime.now().isoformat()
+            }
+            self.cache.put(key, entry)
+
+        for follower_path in follower_paths:
+            if entry is not None:
+                generated[follower_path] = self._semantic_result(entry, follower_path,
+                                                                 follower_path.split('::', 1)[1])
+            else:
+                generated[follower_path] = dict(result, file_path=follower_path)
+
+    def _semantic_result(self, entry: Dict[str, Any], item_path: str, unit_name: str) -> Dict[str, Any]:
+        """Reaproveita testes de uma unidade equivalente, trocando os nomes da unidade e do módulo."""
+        test_code = rename_identifiers(entry['test_code'], {
+            entry['unit_name']: unit_name,
+            entry['module_name']: module_name_for(item_path)
+        })
+        return {
+            'success': True,
+            'file_path': item_path,
+            'test_code': test_code,
+            'validation': self.validator.validate_test_code(test_code),
+            'latency': 0.0,
+            'cache_hit': True,
+            'semantic_hit': True,
+            'simulate_mode': self.config.simulate_mode,
+            'token_usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }
+
+    def _aggregate_token_usage(self, unit_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Soma o consumo de tokens das unidades geradas para um arquivo."""
+        prompt_tokens = sum(self._summary_record(r)['prompt_tokens'] for r in unit_results)
+        completion_tokens = sum(self._summary_record(r)['completion_tokens'] for r in unit_results)
+        return {
+            'prompt_tokens': prompt_tokens,
+            'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'context_window': self.prompt_budget.context_window,
+            'source_mode': 'chunked'
+        }
+
+    def generate_tests_chunked(self, source_code: str, max_workers: Optional[int] = None,
+                               module_name: Optional[str] = None) -> Dict[str, Any]:
+        """Gera testes por função/classe em paralelo e une os módulos resultantes."""
+        label = f"{module_name}.py" if module_name else '<código>'
+        batch = self.incremental_generate_tests([(label, source_code)], IncrementalManifest(),
+                                                max_workers)
+        result = batch['results'][0]
+        result.pop('file_path', None)
+        return result
+
+    def _plan_incremental_file(self, file_path: str, source_code: str, previous: Dict[str, Any],
+                               code_analysis: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Compara as unidades do arquivo com o manifesto anterior."""
+        plan = {
+            'file_path': file_path,
+            'source_code': source_code,
+            'source_hash': hashlib.sha256(source_code.encode('utf-8')).hexdigest(),
+            'previous': previous,
+            'unchanged': False,
+            'units': [],
+            'reused': [],
+            'pending': []
+        }
+
+        if previous.get('source_hash') == plan['source_hash']:
+            plan['unchanged'] = True
+            return plan
+
+        if code_analysis is None:
             code_analysis = self.analyzer.analyze_code(source_code)
-            
-            if 'error' in code_analysis:
-                return {
-                    'success': False,
-                    'error': code_analysis['error']
-                }
-            
-            # Gerar prompt
-            prompt = self._create_generation_prompt(source_code, code_analysis)
-            
-            # Gerar testes
-            test_code = self.llm.invoke(prompt)
-            
-            # Validar testes
-            validation = self.validator.validate_test_code(test_code)
-            
+        if 'error' in code_analysis:
+            plan['error'] = code_analysis['error']
+            return plan
+
+        plan['code_analysis'] = code_analysis
+        try:
+            plan['units'] = self.analyzer.extract_units(source_code, code_analysis)
+        except SyntaxError as e:
+            plan['error'] = f'Erro de sintaxe: {e}'
+            return plan
+        previous_units = previous.get('units', {})
+
+        for unit in plan['units']:
+            previous_unit = previous_units.get(unit['name'], {})
+            if previous_unit.get('fingerprint') == unit['fingerprint'] and previous_unit.get('test_code'):
+                plan['reused'].append(unit['name'])
+            else:
+                unit_source = f"{unit['context']}\n\n\n{unit['source']}" if unit['context'] else unit['source']
+                plan['pending'].append((f"{file_path}::{unit['name']}", unit_source, None, [unit['name']]))
+
+        return plan
+
+    def _assemble_incremental_result(self, plan: Dict[str, Any], generated: Dict[str, Dict],
+                                     manifest: IncrementalManifest) -> Dict[str, Any]:
+        """Combina testes reaproveitados e regenerados de um arquivo e atualiza o manifesto."""
+        file_path = plan['file_path']
+        previous = plan['previous']
+
+        if plan['unchanged']:
+            test_code = previous.get('test_code', '')
             return {
                 'success': True,
+                'file_path': file_path,
                 'test_code': test_code,
-                'code_analysis': code_analysis,
-                'validation': validation,
-                'simulate_mode': self.config.simulate_mode
+                'validation': self.validator.validate_test_code(test_code),
+                'latency': 0.0,
+                'cache_hit': False,
+                'incremental': {'reused': list(previous.get('units', {})), 'regenerated': []}
             }
-            
-        except Exception as e:
-            logger.error(f"Erro na geração de testes: {e}")
+
+        if 'error' in plan:
             return {
                 'success': False,
-                'error': str(e)
+                'file_path': file_path,
+                'error': plan['error'],
+                'latency': 0.0
             }
-    
-    def _create_generation_prompt(self, source_code: str, analysis: Dict) -> str:
-        """Cria prompt para geração de testes."""
-        stats = analysis['statistics']
-        
-        prompt = f"""
-Você é um especialista em testes unitários Python. Analise o código fornecido e gere testes completos usando {self.config.test_config['framework']}.
 
-CÓDIGO A TESTAR:
-{source_code}
+        previous_units = previous.get('units', {})
+        unit_entries = {}
+        regenerated = []
+        errors = []
+        latency = 0.0
+        unit_results = []
 
-ESTATÍSTICAS:
-- Funções: {stats['total_functions']}
-- Classes: {stats['total_classes']}
-- Complexidade: {stats['complexity']}
+        for unit in plan['units']:
+            name = unit['name']
+            if name in plan['reused']:
+                unit_test_code = previous_units[name]['test_code']
+            else:
+                unit_result = generated[f"{file_path}::{name}"]
+                unit_results.append(unit_result)
+                latency += unit_result['latency']
+                regenerated.append(name)
+                if not unit_result['success']:
+                    errors.append(f"{name}: {unit_result['error']}")
+                    continue
+                unit_test_code = unit_result['test_code']
+            unit_entries[name] = {'fingerprint': unit['fingerprint'], 'test_code': unit_test_code}
 
-REQUISITOS:
-1. Use {self.config.test_config['framework']} como framework
-2. Inclua testes para casos normais e extremos
-3. Teste tratamento de exceções
-4. Adicione fixtures se necessário
-5. Use parametrização quando apropriado
-6. Cobertura mínima: {self.config.test_config['min_coverage']}%
+        test_code = merge_test_modules([entry['test_code'] for entry in unit_entries.values()])
+        # Com falhas, o hash do arquivo não é gravado para forçar nova tentativa
+        manifest.update(file_path, '' if errors else plan['source_hash'], unit_entries, test_code)
 
-GERE TESTES COMPLETOS E FUNCIONAIS:
-"""
-        return prompt
-    
-    def batch_generate_tests(self, code_files: List[tuple]) -> Dict[str, Any]:
-        """Gera testes para múltiplos arquivos."""
-        results = []
-        successful = 0
-        failed = 0
-        start_time = datetime.now()
-        
-        for file_path, source_code in code_files:
-            logger.info(f"Processando: {file_path}")
-            
-            result = self.generate_tests(source_code)
-            result['file_path'] = file_path
-            results.append(result)
-            
-            if result['success']:
-                successful += 1
-            else:
-                failed += 1
-        
-        total_time = (datetime.now() - start_time).total_seconds()
-        
-        return {
-            'results': results,
-            'summary': {
-                'total_files': len(code_files),
-                'successful': successful,
-                'failed': failed,
-                'total_execution_time': total_time
-            }
+        result = {
+            'success': not errors,
+            'file_path': file_path,
+            'test_code': test_code,
+            'code_analysis': plan['code_analysis'],
+            'validation': self.validator.validate_test_code(test_code),
+            'latency': latency,
+            'cache_hit': bool(unit_results) and all(r.get('cache_hit') for r in unit_results),
+            'simulate_mode': self.config.simulate_mode,
+            'token_usage': self._aggregate_token_usage(unit_results),
+            'chunks': len(plan['units']),
+            'incremental': {'reused': plan['reused'], 'regenerated': regenerated}
         }
+        if errors:
+            result['error'] = '; '.join(errors)
+        return result
+
+    def _timed_generate(self, code_file: tuple) -> Dict[str, Any]:
+        """Gera testes para um arquivo medindo a latência."""
+        file_path, source_code, *extra = code_file
+        logger.info(f"Processando: {file_path}")
+
+        start = time.perf_counter()
+        options = dict(zip(('code_analysis', 'focus', 'dependencies'), extra))
+        result = self.generate_tests(source_code, module_name=module_name_for(file_path), **options)
+        result['file_path'] = file_path
+        result['latency'] = time.perf_counter() - start
+        return result
+
+    async def _atimed_generate(self, code_file: tuple) -> Dict[str, Any]:
+        """Versão assíncrona de _timed_generate."""
+        file_path, source_code, *extra = code_file
+        logger.info(f"Processando: {file_path}")
+
+        start = time.perf_counter()
+        options = dict(zip(('code_analysis', 'focus', 'dependencies'), extra))
+        result = await self.agenerate_tests(source_code, module_name=module_name_for(file_path), **options)
+        result['file_path'] = file_path
+        result['latency'] = time.perf_counter() - start
+        return result
     
-    def improve_existing_tests(self, test_code: str, original_code: str) -> Dict[str, Any]:
+    def improve_existing_tests(self, test_code: str, original_code: str,
+                               module_name: Optional[str] = None) -> Dict[str, Any]:
         """Melhora testes existentes."""
         try:
+            if self.executor is not None:
+                return self._improve_by_execution(test_code, original_code,
+                                                  module_name or guess_module_name(test_code))
+            
             # Analisar código original e testes atuais
             code_analysis = self.analyzer.analyze_code(original_code)
             test_validation = self.validator.validate_test_code(test_code)
@@ -419,7 +4157,7 @@ TESTES ATUAIS:
 GERE VERSÃO MELHORADA DOS TESTES:
 """
             
-            improved_tests = self.llm.invoke(prompt)
+            improved_tests = self._invoke_llm(prompt)
             new_validation = self.validator.validate_test_code(improved_tests)
             
             return {
@@ -438,13 +4176,41 @@ GERE VERSÃO MELHORADA DOS TESTES:
                 'error': str(e)
             }
 
+    def _improve_by_execution(self, test_code: str, original_code: str, module_name: str) -> Dict[str, Any]:
+        """Melhora testes executando-os e reparando apenas os que falham ou a cobertura que falta."""
+        before = self.executor.run(original_code, test_code, module_name)
+        result = {
+            'success': True,
+            'test_code': test_code,
+            'code_analysis': self.analyzer.analyze_code(original_code),
+            'validation': self.validator.validate_test_code(test_code)
+        }
+        self._attach_execution(result, before)
+        if not before['gate_passed']:
+            self.repair_tests(result, original_code, module_name)
+        
+        after = result['execution']
+        return {
+            'success': True,
+            'improved_tests': result['test_code'],
+            'execution': after,
+            'repair': result.get('repair'),
+            'token_usage': result.get('token_usage'),
+            'improvements': {
+                'coverage_improvement': (after['line_coverage'] or 0) - (before['line_coverage'] or 0),
+                'new_test_count': after['total'] - before['total'],
+                'issues_resolved': max(0, (before['failed'] + before['errors']) -
+                                       (after['failed'] + after['errors']))
+            }
+        }
+
 class TestGeneratorCLI:
     """Interface de linha de comando principal."""
     
     def __init__(self):
         """Inicializa a CLI."""
         self.config_manager = ConfigManager()
-        self.agent = TestGeneratorAgent(self.config_manager)
+        self._agent = None
         self.statistics = {
             'total_generations': 0,
             'successful_generations': 0,
@@ -455,6 +4221,13 @@ class TestGeneratorCLI:
         # Criar diretórios
         self.config_manager.create_directories()
     
+    @property
+    def agent(self) -> 'TestGeneratorAgent':
+        """Agente de geração, criado no primeiro uso (o LangChain só é importado se necessário)."""
+        if self._agent is None:
+            self._agent = TestGeneratorAgent(self.config_manager)
+        return self._agent
+    
     def display_banner(self):
         """Exibe banner do sistema."""
         banner = """
@@ -508,6 +4281,7 @@ class TestGeneratorCLI:
     
     def run(self):
         """Executa o loop principal da CLI."""
+        self.agent  # cria o agente antes do banner: sem LangChain, ativa a simulação
         self.display_banner()
         
         while True:
@@ -637,8 +4411,8 @@ class TestGeneratorCLI:
             print(f"❌ Diretório não encontrado: {dir_path}")
             return
         
-        # Encontrar arquivos Python
-        py_files = list(path.glob("**/*.py"))
+        # Encontrar arquivos Python (apenas caminhos; o conteúdo é lido sob demanda)
+        py_files = list(iter_python_files(path, self.config_manager.system_config['exclude_patterns']))
         
         if not py_files:
             print("❌ Nenhum arquivo Python encontrado")
@@ -655,30 +4429,34 @@ class TestGeneratorCLI:
         if confirm in ['n', 'no', 'não']:
             return
         
-        # Processar em lote
-        code_files = []
-        for file_path in py_files:
-            try:
-                source_code = file_path.read_text(encoding='utf-8')
-                code_files.append((str(file_path), source_code))
-            except Exception as e:
-                print(f"⚠️  Erro ao ler {file_path.name}: {e}")
-        
-        if code_files:
-            print(f"\n🔄 Processando {len(code_files)} arquivo(s)...")
-            self._process_batch_generation(code_files)
+        print(f"\n🔄 Processando {len(py_files)} arquivo(s)...")
+        self._process_batch_generation(iter_code_files(py_files), source_root=path)
     
-    def _process_code_generation(self, source_code: str, filename: Optional[str] = None):
+    def _process_code_generation(self, source_code: str,
+                                 filename: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Processa geração de testes para código."""
         start_time = datetime.now()
+        module_name = module_name_for(filename) if filename else None
         
         try:
-            result = self.agent.generate_tests(source_code)
+            if self.config_manager.performance_config['chunked']:
+                result = self.agent.generate_tests_chunked(source_code, module_name=module_name)
+            elif self.config_manager.performance_config['streaming']:
+                result = self._stream_generated_tests(source_code, module_name)
+            else:
+                result = self.agent.generate_tests(source_code, module_name=module_name)
             
             execution_time = (datetime.now() - start_time).total_seconds()
             
             print(f"\n{'✅' if result['success'] else '❌'} Geração {'concluída' if result['success'] else 'falhou'}")
             print(f"⏱️  Tempo de execução: {execution_time:.2f}s")
+            if result.get('cache_hit'):
+                print("♻️  Testes reaproveitados do cache (sem chamada ao LLM)")
+            if result.get('aborted'):
+                print(f"🛑 Geração interrompida ({result['abort_reason']}); "
+                      f"mantidos apenas os blocos válidos")
+            if 'first_token' in result.get('stage_timings', {}):
+                print(f"⚡ Primeiro token em {result['stage_timings']['first_token']:.2f}s")
             
             if result['success']:
                 # Mostrar estatísticas
@@ -689,10 +4467,21 @@ class TestGeneratorCLI:
                 print(f"   Funções: {stats.get('total_functions', 0)}")
                 print(f"   Classes: {stats.get('total_classes', 0)}")
                 print(f"   Testes gerados: {validation.get('test_count', 0)}")
-                print(f"   Cobertura estimada: {validation.get('coverage_score', 0):.1f}%")
+                if 'execution' in result:
+                    self._display_execution(result['execution'])
+                    if result.get('repair'):
+                        self._display_repair(result['repair'])
+                else:
+                    print(f"   Cobertura estimada: {validation.get('coverage_score', 0):.1f}%")
+                usage = result.get('token_usage', {})
+                if usage:
+                    print(f"   Tokens: {usage['prompt_tokens']} prompt / "
+                          f"{usage['completion_tokens']} resposta "
+                          f"(janela {usage['context_window']}, código {usage['source_mode']})")
                 
-                # Mostrar código dos testes
-                self._display_generated_tests(result['test_code'])
+                # Mostrar código dos testes (no streaming já foi exibido)
+                if not result.get('streamed'):
+                    self._display_generated_tests(result['test_code'])
                 
                 # Opção de salvar
                 self._offer_save_tests(result['test_code'], filename)
@@ -703,32 +4492,213 @@ class TestGeneratorCLI:
                 self.statistics['failed_generations'] += 1
                 
             self.statistics['total_generations'] += 1
+            return result
             
         except Exception as e:
             print(f"❌ Erro inesperado: {e}")
             self.statistics['failed_generations'] += 1
             self.statistics['total_generations'] += 1
+            return None
+    
+    def _display_repair(self, repair: Dict[str, Any]):
+        """Mostra o resumo do ciclo de reparo."""
+        print(f"   🔧 Reparo: {repair['iterations']} iteração(ões), encerrado por {repair['stopped']}")
+        for step in repair['history']:
+            if step['applied']:
+                coverage = step['line_coverage']
+                print(f"      #{step['iteration']}: {step['passed']} passaram, {step['failed']} falharam"
+                      f"{f', cobertura {coverage:.0f}%' if coverage is not None else ''} "
+                      f"({step['prompt_tokens']} tokens de prompt)")
+            else:
+                print(f"      #{step['iteration']}: resposta inválida descartada")
+    
+    def _display_execution(self, execution: Dict[str, Any]):
+        """Mostra o resultado da execução real dos testes (pytest + coverage)."""
+        print(f"   Execução: {execution['passed']} passaram, {execution['failed']} falharam, "
+              f"{execution['errors']} erro(s) em {execution['duration']:.1f}s"
+              f"{' (tempo esgotado)' if execution['timed_out'] else ''}")
+        if execution['line_coverage'] is not None:
+            branch = execution['branch_coverage']
+            print(f"   Cobertura real: {execution['line_coverage']:.1f}% das linhas"
+                  f"{f', {branch:.1f}% dos ramos' if branch is not None else ''}")
+        else:
+            print("   Cobertura real: indisponível (instale pytest-cov/coverage)")
+        if execution['gate_passed']:
+            print(f"   🚦 Gate aprovado (mínimo {execution['min_coverage']}%)")
+        elif execution.get('gate_reason') == 'coverage_unavailable':
+            print(f"   🚦 Gate reprovado: cobertura não medida (mínimo {execution['min_coverage']}%)")
+        else:
+            print(f"   🚦 Gate reprovado (mínimo {execution['min_coverage']}% e todos os testes passando)")
+        for failure in execution['failures'][:5]:
+            print(f"      ✗ {failure['test']}: {failure['message'][:120]}")
     
-    def _process_batch_generation(self, code_files: List[tuple]):
-        """Processa geração em lote."""
+    def _process_batch_generation(self, code_files: Iterable[tuple], incremental: bool = False,
+                                  chunked: bool = False,
+                                  source_root: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """Processa geração em lote, exibindo cada resultado assim que fica pronto."""
+        system = self.config_manager.system_config
+        writer = None
+        if system['batch_output_dir']:
+            writer = TestWriter(system['batch_output_dir'], source_root, system['fsync_group'],
+                                self.agent.metrics)
         try:
-            batch_result = self.agent.batch_generate_tests(code_files)
+            if incremental or chunked:
+                # O modo incremental já gera por unidade; sem manifesto persistido é o modo chunked
+                manifest = IncrementalManifest(
+                    self.config_manager.performance_config['incremental_manifest'] if incremental else None
+                )
+                self._warn_unit_mode_options(incremental)
+
+                def on_result(result):
+                    # Grava cada arquivo assim que fica pronto, em paralelo às unidades restantes
+                    if writer is not None and TestWriter.should_write(result):
+                        result['output_path'] = str(writer.submit(result['file_path'], result['test_code']))
+                    self._report_batch_result(result)
+
+                batch_result = self.agent.incremental_generate_tests(code_files, manifest,
+                                                                     on_result=on_result)
+            else:
+                perf = self.config_manager.performance_config
+                journal = BatchJournal(perf['journal_file'], perf['resume']) if perf['journal_file'] else None
+                try:
+                    if journal is not None and writer is not None:
+                        # Destinos do diário ficam reservados antes de mapear os arquivos novos
+                        for entry in journal.completed.values():
+                            if entry.get('output_path'):
+                                writer.reserve(entry['file_path'], entry['output_path'])
+                    if journal is not None and journal.completed:
+                        print(f"⏯️  Retomando lote: {len(journal.completed)} arquivo(s) concluído(s) "
+                              f"em {journal.path}")
+                    batch_result = self.agent.batch_generate_tests(
+                        code_files, on_result=self._report_batch_result, keep_results=False,
+                        schedule=perf['schedule'], journal=journal, writer=writer
+                    )
+                except KeyboardInterrupt:
+                    if journal is not None:
+                        print(f"\n⏸️  Lote interrompido; o progresso está em {journal.path} "
+                              f"(continue com --resume)")
+                    raise
+                finally:
+                    # O diário recebe as últimas entradas quando a fila de escrita esvazia
+                    if writer is not None:
+                        writer.close()
+                    if journal is not None:
+                        journal.close()
             
+            if writer is not None:
+                writer.close()
             summary = batch_result['summary']
+            if summary['total_files'] == 0:
+                print("❌ Nenhum arquivo Python encontrado")
+                return summary
+            
             print(f"\n📊 RESULTADO DO PROCESSAMENTO EM LOTE")
             print(f"=" * 50)
             print(f"Total de arquivos: {summary['total_files']}")
             print(f"Sucessos: {summary['successful']}")
             print(f"Falhas: {summary['failed']}")
             print(f"Tempo total: {summary['total_execution_time']:.2f}s")
+            if summary['analysis_jobs'] > 1:
+                print(f"Análise paralela: {summary['analysis_time']:.2f}s "
+                      f"({summary['analysis_jobs']} processos)")
+            print(f"Latência somada: {summary['summed_latency']:.2f}s "
+                  f"({summary['max_workers']} workers, {summary['concurrency_mode']})")
+            print(f"Speedup: {summary['speedup']:.2f}x")
+            if summary.get('schedule') == 'deps':
+                print(f"Ordem por dependências: {summary['dependency_edges']} import(s) interno(s), "
+                      f"{summary['cycles_broken']} ciclo(s) quebrado(s)")
+            if summary.get('schedule') == 'priority':
+                print(f"Ordem por prioridade: {summary['untested_files']} arquivo(s) sem testes existentes")
+            if summary.get('cutoff_reason'):
+                reason = 'prazo esgotado' if summary['cutoff_reason'] == 'deadline' else 'orçamento de tokens esgotado'
+                skipped = summary['skipped_files']
+                print(f"⏹️  Lote interrompido ({reason}, {summary['budget_spent']} tokens gastos): "
+                      f"{len(skipped)} arquivo(s) não processado(s)")
+                for file_path in skipped[:10]:
+                    print(f"   - {file_path}")
+                if len(skipped) > 10:
+                    print(f"   ... e mais {len(skipped) - 10} arquivo(s)")
+            print(f"Cache: {summary['cache_hits']} acerto(s), {summary['cache_misses']} falha(s)")
+            if writer is not None:
+                summary['written_files'] = writer.stats['written']
+                summary['write_errors'] = writer.errors
+                print(f"Testes gravados: {writer.stats['written']} arquivo(s) em {writer.output_dir} "
+                      f"({writer.stats['groups']} grupo(s) de fsync)")
+                for error in writer.errors[:10]:
+                    print(f"   ❌ {error['path']}: {error['error']}")
+            if summary.get('resumed'):
+                print(f"Retomados do diário: {summary['resumed']} arquivo(s) sem nova chamada ao LLM")
+            if summary.get('coalesced'):
+                print(f"Chamadas coalescidas: {summary['coalesced']} (prompts idênticos em andamento)")
+            print(f"Tokens: {summary['prompt_tokens']} de prompt, "
+                  f"{summary['completion_tokens']} de resposta")
+            if summary.get('retries'):
+                print(f"Retentativas: {summary['retries']} ({summary['throttled']} por limite de taxa)")
+            if summary.get('executed_files'):
+                print(f"Gate de cobertura (mín. {self.config_manager.test_config['min_coverage']}%): "
+                      f"{summary['executed_files'] - summary['gate_failures']} aprovado(s), "
+                      f"{summary['gate_failures']} reprovado(s)")
+            if chunked and not incremental:
+                print(f"Unidades geradas: {summary['regenerated_units']}")
+            if incremental:
+                print(f"Incremental: {summary['regenerated_units']} unidade(s) regenerada(s), "
+                      f"{summary['reused_units']} reaproveitada(s), "
+                      f"{summary['unchanged_files']} arquivo(s) inalterado(s)")
+            if summary.get('semantic_hits'):
+                kind = 'unidade(s)' if incremental or chunked else 'arquivo(s)'
+                print(f"Cache semântico: {summary['semantic_hits']} {kind} equivalente(s) "
+                      f"reaproveitado(s) sem chamar o LLM")
             
             # Atualizar estatísticas
             self.statistics['successful_generations'] += summary['successful']
             self.statistics['failed_generations'] += summary['failed']
             self.statistics['total_generations'] += summary['total_files']
+            return summary
             
         except Exception as e:
             print(f"❌ Erro no processamento em lote: {e}")
+            return None
+        finally:
+            if writer is not None:
+                writer.close()
+    
+    def _warn_unit_mode_options(self, incremental: bool):
+        """Avisa sobre opções do lote por arquivo que não se aplicam à geração por unidade."""
+        perf = self.config_manager.performance_config
+        ignored = []
+        if perf['schedule'] != 'glob':
+            ignored.append(f"--schedule {perf['schedule']}")
+        if perf['resume']:
+            ignored.append('--resume')
+        if perf['budget_tokens']:
+            ignored.append('--budget-tokens')
+        if perf['deadline']:
+            ignored.append('--deadline')
+        if ignored:
+            mode = '--incremental' if incremental else '--chunked'
+            print(f"⚠️  Ignorado(s) com {mode}: {', '.join(ignored)} "
+                  f"(a geração por unidade não usa agendamento, diário nem corte do lote)")
+
+    def _report_batch_result(self, result: Dict[str, Any]):
+        """Exibe o progresso de um arquivo do lote."""
+        if result.get('resumed'):
+            print(f"  ⏭️  {result['file_path']}: concluído em execução anterior "
+                  f"({result['validation']['test_count']} teste(s))")
+        elif result['success']:
+            test_count = result.get('validation', {}).get('test_count', 0)
+            origin = ' (cache)' if result.get('cache_hit') else ''
+            execution = result.get('execution')
+            if execution is not None:
+                coverage = execution['line_coverage']
+                repairs = result.get('repair', {}).get('iterations', 0)
+                origin += (f" | {execution['passed']}/{execution['total']} passaram"
+                           f"{f', cobertura {coverage:.0f}%' if coverage is not None else ''}"
+                           f"{f' após {repairs} reparo(s)' if repairs else ''}"
+                           f"{'' if execution['gate_passed'] else ' ⚠️ gate reprovado'}"
+                           f"{' (cobertura não medida)' if execution.get('gate_reason') == 'coverage_unavailable' else ''}")
+            print(f"  ✅ {result['file_path']}: {test_count} teste(s) em {result['latency']:.2f}s{origin}")
+        else:
+            print(f"  ❌ {result['file_path']}: {result.get('error', 'erro desconhecido')}")
     
     def analyze_code_only(self):
         """Analisa código sem gerar testes."""
@@ -830,6 +4800,10 @@ class TestGeneratorCLI:
                 print(f"  Cobertura: +{improvements['coverage_improvement']:.1f}%")
                 print(f"  Problemas resolvidos: {improvements['issues_resolved']}")
                 print(f"  Novos testes: {improvements['new_test_count']}")
+                if 'execution' in result:
+                    self._display_execution(result['execution'])
+                    if result.get('repair'):
+                        self._display_repair(result['repair'])
                 
                 # Mostrar testes melhorados
                 self._display_generated_tests(result['improved_tests'])
@@ -876,6 +4850,14 @@ class TestGeneratorCLI:
         print(f"   Gerações bem-sucedidas: {self.statistics['successful_generations']}")
         print(f"   Gerações falharam: {self.statistics['failed_generations']}")
         print(f"   Taxa de sucesso: {success_rate:.1f}%")
+        
+        stage_summary = self.agent.metrics.summary()
+        if stage_summary:
+            print(f"\n⏱️  TEMPO POR ETAPA:")
+            for stage, values in stage_summary.items():
+                print(f"   {stage:<9} {values['count']:>5}x  média {values['mean'] * 1000:8.1f} ms  "
+                      f"máx {values['max'] * 1000:8.1f} ms")
+            print(f"   Métricas gravadas em: {self.agent.metrics.metrics_file}")
     
     def run_demonstration(self):
         """Executa exemplo de demonstração."""
@@ -976,6 +4958,16 @@ SUPORTE:
         
         print(help_text)
     
+    def _stream_generated_tests(self, source_code: str, module_name: Optional[str] = None) -> Dict[str, Any]:
+        """Gera testes exibindo os tokens à medida que chegam."""
+        print(f"\n🧪 CÓDIGO DOS TESTES GERADOS (streaming):")
+        print("─" * 60)
+        result = self.agent.generate_tests_streaming(
+            source_code, on_token=lambda text: print(text, end='', flush=True), module_name=module_name
+        )
+        print("\n" + "─" * 60)
+        return result
+    
     def _display_generated_tests(self, test_code: str):
         """Mostra código dos testes gerados."""
         print(f"\n🧪 CÓDIGO DOS TESTES GERADOS:")
@@ -1061,7 +5053,9 @@ SUPORTE:
                 test_dir.mkdir(parents=True, exist_ok=True)
                 
                 file_path = test_dir / filename
-                file_path.write_text(test_code, encoding='utf-8')
+                with self.agent.metrics.span('save', bytes=len(test_code.encode('utf-8')),
+                                             file=str(file_path)):
+                    file_path.write_text(test_code, encoding='utf-8')
                 print(f"✅ Testes salvos em: {file_path}")
                     
             except Exception as e:
@@ -1070,6 +5064,8 @@ SUPORTE:
     def _safe_exit(self):
         """Sai do programa de forma segura."""
         print("\n👋 Finalizando sistema...")
+        if self._agent is not None:
+            self._agent.metrics.flush()
         
         # Mostrar estatísticas finais
         if self.statistics['total_generations'] > 0:
@@ -1092,6 +5088,21 @@ def create_argument_parser():
         epilog='Desenvolvido por Marcelo José Vieira Filho - Bootcamp DIO + BairesDev'
     )
     
+    parser.add_argument(
+        'command',
+        nargs='?',
+        choices=['bench', 'serve', 'client'],
+        help='bench: benchmark do pipeline completo com corpus sintético e LLM simulado; '
+             'serve: servidor local com o agente aquecido; client: envia arquivos ao servidor'
+    )
+    
+    parser.add_argument(
+        'targets',
+        nargs='*',
+        metavar='ALVO',
+        help='bench: pipeline (padrão) ou startup; client: arquivos .py a enviar ao servidor'
+    )
+    
     parser.add_argument(
         '--file', '-f',
         type=str,
@@ -1104,6 +5115,132 @@ def create_argument_parser():
         help='Diretório com arquivos Python para processar'
     )
     
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        help='Número de chamadas concorrentes ao LLM no processamento em lote'
+    )
+    
+    parser.add_argument(
+        '--jobs', '-j',
+        type=int,
+        help='Número de processos para a análise de código antes da geração'
+    )
+    
+    parser.add_argument(
+        '--exclude',
+        action='append',
+        metavar='PADRÃO',
+        help='Padrão estilo .gitignore a ignorar no modo diretório (pode repetir)'
+    )
+    
+    parser.add_argument(
+        '--incremental', '-i',
+        action='store_true',
+        help='Com --directory, regenera testes apenas de funções/classes alteradas'
+    )
+    
+    parser.add_argument(
+        '--chunked',
+        action='store_true',
+        help='Gera testes por função/classe em paralelo e une os resultados'
+    )
+    
+    parser.add_argument(
+        '--schedule',
+        choices=['glob', 'deps', 'priority'],
+        help='Ordem do lote: glob (descoberta, padrão), deps (folhas do grafo de imports primeiro) '
+             'ou priority (complexidade, nº de funções e ausência de testes)'
+    )
+    
+    parser.add_argument(
+        '--output-dir',
+        metavar='DIR',
+        help='No modo diretório, grava os testes em DIR espelhando a árvore de código (sem perguntas)'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Retoma o lote anterior pelo diário (BATCH_JOURNAL), pulando arquivos já concluídos'
+    )
+    
+    parser.add_argument(
+        '--budget-tokens',
+        type=int,
+        metavar='N',
+        help='Para de enviar arquivos do lote ao atingir N tokens (prompt + resposta)'
+    )
+    
+    parser.add_argument(
+        '--deadline',
+        type=float,
+        metavar='SEGUNDOS',
+        help='Para de enviar arquivos do lote após SEGUNDOS (as chamadas em andamento terminam)'
+    )
+    
+    parser.add_argument(
+        '--execute',
+        action='store_true',
+        help='Executa os testes gerados em sandbox (pytest + coverage) e aplica MIN_COVERAGE como gate'
+    )
+    
+    parser.add_argument(
+        '--repair',
+        action='store_true',
+        help='Com --execute, reenvia ao LLM apenas os testes que falharam (até MAX_ITERATIONS vezes)'
+    )
+    
+    parser.add_argument(
+        '--warm-pool',
+        action='store_true',
+        help='Executa os testes em workers pré-aquecidos (pytest já importado) em vez de um processo por arquivo'
+    )
+    
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Exibe os testes à medida que são gerados, abortando saídas degeneradas'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Desativa o cache persistente de testes gerados'
+    )
+    
+    parser.add_argument(
+        '--benchmark-analyzer',
+        nargs='*',
+        metavar='ARQUIVO',
+        help='Mede nós/s da análise AST (antes/depois); sem arquivos usa um módulo sintético grande'
+    )
+    
+    bench = parser.add_argument_group('benchmark do pipeline (bench)')
+    bench.add_argument('--bench-files', type=int, default=100,
+                       help='Número de arquivos do corpus sintético')
+    bench.add_argument('--bench-functions', type=int, default=20,
+                       help='Média de funções por arquivo')
+    bench.add_argument('--bench-classes', type=int, default=2,
+                       help='Média de classes por arquivo')
+    bench.add_argument('--bench-latency', type=float, default=0.05,
+                       help='Latência injetada no LLM simulado (segundos)')
+    bench.add_argument('--bench-jitter', type=float, default=0.02,
+                       help='Variação aleatória adicional da latência (segundos)')
+    bench.add_argument('--bench-seed', type=int, default=42,
+                       help='Semente do corpus sintético')
+    bench.add_argument('--startup-budget', type=float,
+                       default=float(os.getenv('STARTUP_BUDGET_MS', '100')),
+                       help='bench startup: tempo máximo de importação de main_cli (ms)')
+    bench.add_argument('--startup-runs', type=int, default=5,
+                       help='bench startup: número de medições (usa a mediana)')
+    
+    server = parser.add_argument_group('servidor local (serve/client)')
+    server.add_argument('--host', type=str,
+                        help='Endereço do servidor (padrão: SERVE_HOST ou 127.0.0.1)')
+    server.add_argument('--port', type=int,
+                        help='Porta do servidor (padrão: SERVE_PORT ou 8765)')
+    
     parser.add_argument(
         '--simulate',
         action='store_true',
@@ -1119,16 +5256,473 @@ def create_argument_parser():
     return parser
 
 
+def run_analyzer_benchmark(file_paths: List[str]) -> int:
+    """Executa o micro-benchmark do analisador e imprime o resultado."""
+    if file_paths:
+        sources = [Path(file_path).read_text(encoding='utf-8') for file_path in file_paths]
+    else:
+        sources = [generate_synthetic_module(2000, 200)]
+    
+    result = benchmark_analyzer(sources)
+    
+    print(f"\n📊 BENCHMARK DO ANALISADOR")
+    print(f"=" * 50)
+    print(f"Arquivos: {result['files']} | Nós: {result['nodes']} | Repetições: {result['repeat']}")
+    print(f"Antes (ast.walk múltiplo): {result['before']['nodes_per_sec']:,.0f} nós/s "
+          f"({result['before']['seconds']:.3f}s)")
+    print(f"Depois (passada única):    {result['after']['nodes_per_sec']:,.0f} nós/s "
+          f"({result['after']['seconds']:.3f}s)")
+    print(f"Speedup: {result['speedup']:.2f}x")
+    return 0
+
+
+def run_pipeline_benchmark(args) -> int:
+    """Executa o benchmark ponta a ponta e grava o resultado em JSON em metrics/."""
+    config_manager = ConfigManager()
+    perf = config_manager.performance_config
+    # Cache desativado: cada execução deve medir o pipeline inteiro
+    perf['cache_enabled'] = False
+    config_manager.system_config['enable_metrics'] = False
+    if args.workers:
+        perf['max_workers'] = max(1, args.workers)
+    if args.jobs:
+        perf['analysis_jobs'] = max(1, args.jobs)
+    config_manager.simulate_mode = True
+    
+    agent = TestGeneratorAgent(config_manager)
+    agent.llm = SimulatedLLM(args.bench_latency, args.bench_jitter)
+    corpus = generate_synthetic_corpus(args.bench_files, args.bench_functions,
+                                       args.bench_classes, args.bench_seed)
+    
+    print(f"\n📊 BENCHMARK DO PIPELINE")
+    print(f"=" * 50)
+    print(f"Corpus: {len(corpus)} arquivos (~{args.bench_functions} funções, "
+          f"~{args.bench_classes} classes) | Workers: {perf['max_workers']} | "
+          f"Jobs: {perf['analysis_jobs']} | Latência: {args.bench_latency}s ±{args.bench_jitter}s")
+    
+    result = benchmark_pipeline(agent, corpus, perf['max_workers'])
+    
+    print(f"\n{'Etapa':<10} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} {'máx (ms)':>10}")
+    for stage, timings in result['stages'].items():
+        if timings['count']:
+            print(f"{stage:<10} {timings['p50'] * 1000:>10.2f} {timings['p95'] * 1000:>10.2f} "
+                  f"{timings['p99'] * 1000:>10.2f} {timings['max'] * 1000:>10.2f}")
+    if result['parallel_analysis_time']:
+        print(f"🔬 Análise em processos (--jobs): {result['parallel_analysis_time'] * 1000:.1f} ms de espera")
+    print(f"\n⚡ {result['files_per_sec']:.1f} arquivos/s ({result['files']} em {result['wall_time']:.2f}s, "
+          f"{result['failed']} falhas)")
+    if result['peak_rss_mb'] is not None:
+        print(f"💾 Pico de memória (RSS): {result['peak_rss_mb']:.1f} MB")
+    
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'parameters': {
+            'files': args.bench_files,
+            'functions_per_file': args.bench_functions,
+            'classes_per_file': args.bench_classes,
+            'latency': args.bench_latency,
+            'jitter': args.bench_jitter,
+            'seed': args.bench_seed,
+            'max_workers': perf['max_workers'],
+            'analysis_jobs': perf['analysis_jobs']
+        },
+        'results': result
+    }
+    Path('metrics').mkdir(exist_ok=True)
+    output_path = Path('metrics') / f"bench_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"📝 Resultado salvo em: {output_path}")
+    return 0 if result['failed'] == 0 else 1
+
+
+# Dependências pesadas que só podem ser importadas no caminho que as usa
+STARTUP_HEAVY_MODULES = ('langchain', 'langchain_core', 'langchain_openai', 'openai', 'httpx',
+                         'tiktoken', 'dotenv', 'pytest', 'coverage', 'asyncio', 'multiprocessing')
+
+def measure_startup(runs: int = 5) -> Dict[str, Any]:
+    """Mede a importação de main_cli com -X importtime e o tempo de `--version` em subprocessos."""
+    import subprocess
+    cwd = str(Path(__file__).resolve().parent)
+
+    def timed(command: List[str]) -> tuple:
+        start = time.perf_counter()
+        completed = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+        return time.perf_counter() - start, completed
+
+    import_times, cli_times, baseline_times = [], [], []
+    modules = {}
+    timed([sys.executable, '-c', 'import main_cli'])  # aquece o cache de bytecode
+    for _ in range(max(1, runs)):
+        _, completed = timed([sys.executable, '-X', 'importtime', '-c', 'import main_cli'])
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+        direct = {}
+        for line in completed.stderr.splitlines():
+            match = re.match(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)', line)
+            if not match:
+                continue
+            name, cumulative = match.group(4), int(match.group(2)) / 1e6
+            if len(match.group(3)) == 3:  # filhos diretos do próximo módulo de nível superior
+                direct[name] = cumulative
+            elif len(match.group(3)) == 1:
+                if name == 'main_cli':
+                    import_times.append(cumulative)
+                    for child, seconds in direct.items():
+                        modules[child] = max(modules.get(child, 0.0), seconds)
+                direct = {}
+        cli_times.append(timed([sys.executable, '-m', 'main_cli', '--version'])[0])
+        baseline_times.append(timed([sys.executable, '-c', 'pass'])[0])
+
+    loaded = [name for name in modules if name.split('.')[0] in STARTUP_HEAVY_MODULES]
+    return {
+        'runs': len(import_times),
+        'import_time': percentile(import_times, 50),
+        'cli_time': percentile(cli_times, 50),
+        'interpreter_time': percentile(baseline_times, 50),
+        'slowest_imports': sorted(modules.items(), key=lambda item: item[1], reverse=True)[:10],
+        'heavy_modules': sorted(loaded)
+    }
+
+def run_startup_benchmark(args) -> int:
+    """Verifica o orçamento de inicialização da CLI (importação de main_cli sem dependências pesadas)."""
+    budget = args.startup_budget / 1000
+    result = measure_startup(args.startup_runs)
+    
+    print(f"\n🚀 BENCHMARK DE INICIALIZAÇÃO")
+    print(f"=" * 50)
+    print(f"Importação de main_cli (mediana de {result['runs']}): {result['import_time'] * 1000:.1f} ms "
+          f"(orçamento: {args.startup_budget:.0f} ms)")
+    print(f"`python -m main_cli --version`: {result['cli_time'] * 1000:.1f} ms "
+          f"(interpretador vazio: {result['interpreter_time'] * 1000:.1f} ms)")
+    print(f"\n{'Importação':<28} {'ms':>8}")
+    for name, seconds in result['slowest_imports']:
+        print(f"{name:<28} {seconds * 1000:>8.2f}")
+    
+    failures = []
+    if result['import_time'] > budget:
+        failures.append(f"importação acima do orçamento ({result['import_time'] * 1000:.1f} ms)")
+    if result['heavy_modules']:
+        failures.append(f"dependências pesadas importadas no início: {', '.join(result['heavy_modules'])}")
+    for failure in failures:
+        print(f"❌ {failure}")
+    if not failures:
+        print(f"\n✅ Inicialização dentro do orçamento")
+    
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'budget_ms': args.startup_budget,
+        'passed': not failures,
+        'results': result
+    }
+    Path('metrics').mkdir(exist_ok=True)
+    output_path = Path('metrics') / f"bench_startup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    output_path.write_text(json.dumps(report, indent=2), encoding='utf-8')
+    print(f"📝 Resultado salvo em: {output_path}")
+    return 0 if not failures else 1
+
+
+class AgentService:
+    """Estado do modo `serve`: agente aquecido compartilhado entre requisições e contadores."""
+
+    def __init__(self, agent: 'TestGeneratorAgent', token: str = ''):
+        self.agent = agent
+        self.token = token
+        self.started = time.time()
+        self.stats = {'requests': 0, 'in_flight': 0, 'errors': 0}
+        self._lock = threading.Lock()
+        self.shutdown_requested = threading.Event()
+
+    def count(self, key: str, delta: int = 1):
+        with self._lock:
+            self.stats[key] += delta
+
+    def authorized(self, header: Optional[str]) -> bool:
+        """Valida o token Bearer (sem token configurado, só há clientes em loopback)."""
+        if not self.token:
+            return True
+        import hmac
+        return hmac.compare_digest(header or '', f"Bearer {self.token}")
+
+    def health(self) -> Dict[str, Any]:
+        return {'status': 'ok', 'pid': os.getpid(), 'uptime': time.time() - self.started,
+                'simulate_mode': self.agent.config.simulate_mode, **self.stats}
+
+    def generate(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """Gera testes para o código enviado (campos: source_code, file_path, chunked)."""
+        file_path = body.get('file_path')
+        module_name = module_name_for(file_path) if file_path else None
+        start = time.perf_counter()
+        if body.get('chunked', self.agent.config.performance_config['chunked']):
+            result = self.agent.generate_tests_chunked(body['source_code'], module_name=module_name)
+        else:
+            result = self.agent.generate_tests(body['source_code'], module_name=module_name)
+        result['file_path'] = file_path
+        result['server_time'] = time.perf_counter() - start
+        return result
+
+    def analyze(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        return self.agent.analyzer.analyze_code(body['source_code'])
+
+def is_loopback_host(host: str) -> bool:
+    """Indica se o host resolve apenas para endereços de loopback."""
+    import ipaddress
+    import socket
+    if not host:
+        return False
+    try:
+        infos = socket.getaddrinfo(host, None)
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback for info in infos)
+
+def create_agent_server(service: AgentService, host: str, port: int):
+    """Cria o servidor HTTP local do modo `serve` (porta 0 escolhe uma porta livre).
+    
+    Sem token, só aceita escutar em loopback.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    if not service.token and not is_loopback_host(host):
+        raise ValueError(f"o host {host or '0.0.0.0'} não é loopback; defina SERVE_TOKEN para expô-lo")
+
+    class AgentRequestHandler(BaseHTTPRequestHandler):
+        """Handler HTTP/1.1 (keep-alive) da API local: /generate, /analyze, /health, /stats."""
+
+        protocol_version = 'HTTP/1.1'
+        server_version = 'TestGeneratorServer/1.0'
+        routes = {'/generate': service.generate, '/analyze': service.analyze}
+
+        def log_message(self, format, *args):
+            logger.debug(f"{self.address_string()} - {format % args}")
+
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path == '/health':
+                self._send_json(200, service.health())
+            elif path == '/stats':
+                self._send_json(200, {**service.health(), 'stages': service.agent.metrics.summary()})
+            else:
+                self._send_json(404, {'error': f"rota desconhecida: {path}"})
+
+        def do_POST(self):
+            path = self.path.split('?')[0]
+            try:
+                length = int(self.headers.get('Content-Length') or 0)
+            except ValueError:
+                self.close_connection = True
+                self._send_json(400, {'error': 'Content-Length inválido'})
+                return
+            raw_body = self.rfile.read(length) if length > 0 else b''
+            if not service.authorized(self.headers.get('Authorization')):
+                self._send_json(401, {'error': 'token inválido'})
+                return
+            if path == '/shutdown':
+                self._send_json(200, {'status': 'encerrando'})
+                service.shutdown_requested.set()
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+            if path not in self.routes:
+                self._send_json(404, {'error': f"rota desconhecida: {path}"})
+                return
+            try:
+                body = json.loads(raw_body or b'{}')
+                if not isinstance(body, dict):
+                    raise ValueError('o corpo deve ser um objeto JSON')
+                if not isinstance(body.get('source_code'), str):
+                    raise ValueError('campo source_code ausente')
+                if not isinstance(body.get('file_path', ''), (str, type(None))):
+                    raise ValueError('campo file_path deve ser texto')
+            except ValueError as e:
+                self._send_json(400, {'error': f"requisição inválida: {e}"})
+                return
+
+            service.count('requests')
+            service.count('in_flight')
+            try:
+                self._send_json(200, self.routes[path](body))
+            except Exception as e:
+                service.count('errors')
+                logger.error(f"Erro no servidor ({path}): {e}", exc_info=True)
+                self._send_json(500, {'error': str(e)})
+            finally:
+                service.count('in_flight', -1)
+
+        def _send_json(self, status: int, payload: Dict[str, Any]):
+            data = json.dumps(payload, default=str).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer((host, port), AgentRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def run_server(cli: 'TestGeneratorCLI', args) -> int:
+    """Modo `serve`: mantém o agente (cliente HTTP, cache, pool de testes) aquecido entre requisições."""
+    system = cli.config_manager.system_config
+    host = args.host or system['serve_host']
+    port = system['serve_port'] if args.port is None else args.port
+    token = system['serve_token']
+    generated_token = not token and cli.config_manager.test_config['execute_tests']
+    if generated_token:
+        # Com execução de testes, /generate roda código gerado: nunca fica sem autenticação
+        import secrets
+        token = secrets.token_urlsafe(24)
+    service = AgentService(cli.agent, token)
+    try:
+        server = create_agent_server(service, host, port)
+    except (ValueError, OSError) as e:
+        print(f"❌ Não foi possível iniciar o servidor: {e}")
+        return 1
+    cli.agent.executor  # cria o executor (e o pool pré-aquecido) antes da primeira requisição
+    
+    print(f"🛰️  Servidor de geração em http://{server.server_address[0]}:{server.server_address[1]} "
+          f"(pid {os.getpid()}{', token exigido' if service.token else ''})")
+    if generated_token:
+        print(f"🔑 EXECUTE_TESTS ativo sem SERVE_TOKEN; token gerado para esta sessão:\n"
+              f"   export SERVE_TOKEN={token}")
+    if cli.config_manager.simulate_mode:
+        print("⚠️  MODO SIMULAÇÃO ATIVO")
+    print("   Ctrl+C para encerrar")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        cli.agent.metrics.flush()
+    print(f"\n👋 Servidor encerrado ({service.stats['requests']} requisições, "
+          f"{service.stats['errors']} erros)")
+    return 0
+
+def run_client(args) -> int:
+    """Modo `client`: envia arquivos ao servidor `serve`; testes no stdout, resumo no stderr."""
+    import http.client
+    system = ConfigManager().system_config
+    host = args.host or system['serve_host']
+    port = system['serve_port'] if args.port is None else args.port
+    file_paths = [Path(path) for path in ([args.file] if args.file else []) + args.targets]
+    if not file_paths:
+        print("❌ Informe os arquivos (client arquivo.py ... ou --file)", file=sys.stderr)
+        return 1
+    
+    headers = {'Content-Type': 'application/json'}
+    if system['serve_token']:
+        headers['Authorization'] = f"Bearer {system['serve_token']}"
+    # Uma única conexão keep-alive para todos os arquivos
+    connection = http.client.HTTPConnection(host, port, timeout=system['serve_timeout'])
+    exit_code = 0
+    try:
+        for file_path in file_paths:
+            if not (file_path.exists() and file_path.suffix == '.py'):
+                print(f"❌ Arquivo não encontrado ou inválido: {file_path}", file=sys.stderr)
+                exit_code = 1
+                continue
+            body = {'source_code': file_path.read_text(encoding='utf-8'), 'file_path': str(file_path)}
+            if args.chunked:
+                body['chunked'] = True
+            try:
+                connection.request('POST', '/generate', json.dumps(body), headers)
+                response = connection.getresponse()
+                result = json.loads(response.read() or b'{}')
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                print(f"❌ Servidor indisponível em {host}:{port} ({e}); "
+                      f"inicie-o com: python main_cli.py serve", file=sys.stderr)
+                return 1
+            
+            if response.status != 200 or not result.get('success'):
+                print(f"❌ {file_path}: {result.get('error', f'HTTP {response.status}')}", file=sys.stderr)
+                exit_code = 1
+                continue
+            if len(file_paths) > 1:
+                print(f"# ==== {file_path} ====")
+            print(result['test_code'])
+            gate = result.get('gate_passed')
+            print(f"{'✅' if gate is not False else '❌'} {file_path}: "
+                  f"{result['validation'].get('test_count', 0)} testes em {result['server_time']:.2f}s"
+                  f"{' (cache)' if result.get('cache_hit') else ''}"
+                  f"{'' if gate is None else ', gate ' + ('ok' if gate else 'reprovado')}",
+                  file=sys.stderr)
+            if gate is False:
+                exit_code = 1
+    finally:
+        connection.close()
+    return exit_code
+
+
 def process_command_line_args(args):
     """Processa argumentos de linha de comando."""
+    if args.benchmark_analyzer is not None:
+        return run_analyzer_benchmark(args.benchmark_analyzer)
+    
+    if args.command == 'bench':
+        target = args.targets[0] if args.targets else 'pipeline'
+        if target == 'startup':
+            return run_startup_benchmark(args)
+        if target != 'pipeline':
+            print(f"❌ Alvo de benchmark inválido: {target} (use pipeline ou startup)")
+            return 1
+        return run_pipeline_benchmark(args)
+    
+    if args.command == 'client':
+        return run_client(args)
+    
     cli = TestGeneratorCLI()
     
+    if args.workers:
+        cli.config_manager.performance_config['max_workers'] = max(1, args.workers)
+    
+    if args.jobs:
+        cli.config_manager.performance_config['analysis_jobs'] = max(1, args.jobs)
+    
+    if args.chunked:
+        cli.config_manager.performance_config['chunked'] = True
+    
+    if args.stream:
+        cli.config_manager.performance_config['streaming'] = True
+    
+    if args.schedule:
+        cli.config_manager.performance_config['schedule'] = args.schedule
+    
+    if args.resume:
+        cli.config_manager.performance_config['resume'] = True
+    
+    if args.output_dir:
+        cli.config_manager.system_config['batch_output_dir'] = args.output_dir
+    
+    if args.budget_tokens:
+        cli.config_manager.performance_config['budget_tokens'] = args.budget_tokens
+    
+    if args.deadline:
+        cli.config_manager.performance_config['deadline'] = args.deadline
+    
+    if args.execute or args.repair:
+        cli.config_manager.test_config['execute_tests'] = True
+    
+    if args.repair:
+        cli.config_manager.test_config['auto_repair'] = True
+    
+    if args.warm_pool:
+        cli.config_manager.test_config['execution_pool'] = 'warm'
+    
+    if args.no_cache:
+        cli.config_manager.performance_config['cache_enabled'] = False
+    
+    if args.command == 'serve':
+        return run_server(cli, args)
+    
     if args.file:
         # Processar arquivo único
         file_path = Path(args.file)
         if file_path.exists() and file_path.suffix == '.py':
             source_code = file_path.read_text(encoding='utf-8')
-            cli._process_code_generation(source_code, file_path.stem)
+            result = cli._process_code_generation(source_code, file_path.stem)
+            if result is None or result.get('gate_passed') is False:
+                return 1
         else:
             print(f"❌ Arquivo não encontrado ou inválido: {args.file}")
             return 1
@@ -1137,20 +5731,14 @@ def process_command_line_args(args):
         # Processar diretório
         dir_path = Path(args.directory)
         if dir_path.exists() and dir_path.is_dir():
-            py_files = list(dir_path.glob("**/*.py"))
-            if py_files:
-                code_files = []
-                for file_path in py_files:
-                    try:
-                        source_code = file_path.read_text(encoding='utf-8')
-                        code_files.append((str(file_path), source_code))
-                    except Exception as e:
-                        print(f"⚠️  Erro ao ler {file_path}: {e}")
-                
-                if code_files:
-                    cli._process_batch_generation(code_files)
-            else:
-                print(f"❌ Nenhum arquivo Python encontrado em: {args.directory}")
+            exclude_patterns = cli.config_manager.system_config['exclude_patterns'] + (args.exclude or [])
+            code_files = iter_code_files(iter_python_files(dir_path, exclude_patterns))
+            summary = cli._process_batch_generation(
+                code_files, incremental=args.incremental,
+                chunked=cli.config_manager.performance_config['chunked'],
+                source_root=dir_path
+            )
+            if summary is None or summary['total_files'] == 0 or summary.get('gate_failures'):
                 return 1
         else:
             print(f"❌ Diretório não encontrado: {args.directory}")
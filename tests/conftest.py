@@ -0,0 +1,28 @@
+"""Configuração comum dos testes: importa main_cli da raiz e isola o ambiente."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture
+def isolated_env(tmp_path, monkeypatch):
+    """Modo simulação com cache, métricas, manifesto e diário em diretório temporário."""
+    for name in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_ENDPOINT', 'EXECUTE_TESTS', 'AUTO_REPAIR',
+                 'BATCH_OUTPUT_DIR', 'BATCH_RESUME', 'BATCH_SCHEDULE'):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('CACHE_DIRECTORY', str(tmp_path / 'cache'))
+    monkeypatch.setenv('ENABLE_METRICS', 'false')
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def agent(isolated_env):
+    """Agente em modo simulação."""
+    import main_cli
+
+    return main_cli.TestGeneratorAgent(main_cli.ConfigManager())
@@ -0,0 +1,68 @@
+"""Testes da coalescência de prompts idênticos em andamento (SingleFlight)."""
+
+import threading
+import time
+
+import main_cli
+
+SOURCE = 'def soma(a, b):\n    return a + b\n'
+
+
+def test_single_flight_shares_one_call():
+    flight = main_cli.SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def slow():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return 'resposta'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('k', slow)))
+    leader.start()
+    started.wait()
+    results.append(flight.do('k', slow))
+    leader.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True]
+    assert flight.coalesced == 1
+
+
+def test_prompt_key_ignores_module_line():
+    section = '\nMÓDULO: o código está em `a.py`; importe-o com `from a import ...`.\n'
+    other = section.replace('a.py', 'b.py').replace('from a', 'from b')
+    prompt = 'CÓDIGO\n{}\nREQUISITOS'
+    key = main_cli.TestGeneratorAgent._prompt_key
+    assert key(prompt.format(section), section) == key(prompt.format(other), other)
+
+
+def test_same_source_in_differently_named_files_is_coalesced(agent, monkeypatch):
+    monkeypatch.setattr(agent, 'cache', None)
+    calls = []
+    started = threading.Event()
+
+    def slow_llm(prompt, *args):
+        calls.append(prompt)
+        started.set()
+        time.sleep(0.2)
+        module = 'calc_a' if 'calc_a' in prompt else 'calc_b'
+        return (f'from {module} import soma\n\n\n'
+                f'def test_{module}_soma():\n    assert soma(1, 2) == 3\n')
+
+    monkeypatch.setattr(agent, '_call_llm', slow_llm)
+    results = {}
+    leader = threading.Thread(target=lambda: results.update(
+        calc_a=agent.generate_tests(SOURCE, module_name='calc_a')))
+    leader.start()
+    started.wait()
+    results['calc_b'] = agent.generate_tests(SOURCE, module_name='calc_b')
+    leader.join()
+
+    assert len(calls) == 1
+    assert results['calc_b']['coalesced']
+    assert 'from calc_b import soma' in results['calc_b']['test_code']
+    assert 'def test_calc_b_soma' in results['calc_b']['test_code']
+    assert 'from calc_a import soma' in results['calc_a']['test_code']
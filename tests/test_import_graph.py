@@ -0,0 +1,74 @@
+"""Testes do grafo de imports internos e do agendamento por dependências."""
+
+import main_cli
+
+
+def make_project(root, files):
+    code_files = []
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+        code_files.append((str(path), content))
+    return code_files
+
+
+def graph_for(code_files):
+    analyzer = main_cli.CodeAnalyzer()
+    analyses = {file_path: analyzer.analyze_code(source) for file_path, source in code_files}
+    return main_cli.build_import_graph(code_files, analyses)
+
+
+def test_module_names_start_at_top_level_package(tmp_path):
+    code_files = make_project(tmp_path, {'pkg/__init__.py': '', 'pkg/sub/__init__.py': '',
+                                         'pkg/sub/mod.py': 'x = 1\n'})
+    names = main_cli.project_module_names([file_path for file_path, _ in code_files])
+    assert sorted(names.values()) == ['pkg', 'pkg.sub', 'pkg.sub.mod']
+
+
+def test_absolute_relative_and_suffix_imports_are_resolved(tmp_path):
+    code_files = make_project(tmp_path, {
+        'pkg/__init__.py': '',
+        'pkg/base.py': 'def f():\n    return 1\n',
+        'pkg/rel.py': 'from .base import f\n',
+        'pkg/absolute.py': 'import pkg.base\n',
+        'pkg/external.py': 'import os\nimport requests\n',
+    })
+    graph = graph_for(code_files)
+    path = {name: str(tmp_path / 'pkg' / f'{name}.py') for name in ('base', 'rel', 'absolute', 'external')}
+
+    assert graph[path['rel']] == [path['base']]
+    assert graph[path['absolute']] == [path['base']]
+    assert graph[path['external']] == []
+    assert graph[path['base']] == []
+
+
+def test_ambiguous_suffix_does_not_resolve(tmp_path):
+    code_files = make_project(tmp_path, {
+        'a/util.py': 'x = 1\n',
+        'b/util.py': 'x = 2\n',
+        'c/main.py': 'import util\n',
+    })
+    assert graph_for(code_files)[str(tmp_path / 'c' / 'main.py')] == []
+
+
+def test_deps_schedule_generates_dependencies_first(agent, tmp_path):
+    code_files = make_project(tmp_path / 'proj', {
+        'app.py': 'from service import run\n\n\ndef main():\n    return run()\n',
+        'service.py': 'from models import Item\n\n\ndef run():\n    return Item()\n',
+        'models.py': 'class Item:\n    pass\n',
+    })
+    order = []
+    timed_generate = agent._timed_generate
+
+    def spy(code_file):
+        order.append(code_file[0].rsplit('/', 1)[-1])
+        return timed_generate(code_file)
+
+    agent._timed_generate = spy
+    agent._supports_async = lambda: False
+    batch = agent.batch_generate_tests(code_files, max_workers=1, schedule='deps')
+
+    assert order == ['models.py', 'service.py', 'app.py']
+    assert batch['summary']['dependency_edges'] == 2
+    assert batch['summary']['cycles_broken'] == 0
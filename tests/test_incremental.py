@@ -0,0 +1,73 @@
+"""Testes do fingerprint por unidade e do modo incremental."""
+
+import main_cli
+
+SOURCE = '''import math
+
+LIMIT = 10
+
+
+def dobro(x):
+    return x * 2
+
+
+def soma(a, b):
+    return dobro(a) + b + LIMIT
+
+
+def circulo(r):
+    return math.pi * r ** 2
+'''
+
+
+def fingerprints(source):
+    analyzer = main_cli.CodeAnalyzer()
+    units = analyzer.extract_units(source, analyzer.analyze_code(source))
+    return {unit['name']: unit['fingerprint'] for unit in units}
+
+
+def changed(before, after):
+    return {name for name in before if before[name] != after[name]}
+
+
+def test_fingerprint_ignores_formatting_and_comments():
+    reformatted = SOURCE.replace('    return x * 2', '    # dobra o valor\n    return x*2')
+    assert changed(fingerprints(SOURCE), fingerprints(reformatted)) == set()
+
+
+def test_helper_change_invalidates_callers():
+    after = fingerprints(SOURCE.replace('x * 2', 'x * 3'))
+    assert changed(fingerprints(SOURCE), after) == {'dobro', 'soma'}
+
+
+def test_global_change_invalidates_readers():
+    after = fingerprints(SOURCE.replace('LIMIT = 10', 'LIMIT = 11'))
+    assert changed(fingerprints(SOURCE), after) == {'soma'}
+
+
+def test_import_change_invalidates_users():
+    after = fingerprints(SOURCE.replace('import math', 'import cmath as math'))
+    assert changed(fingerprints(SOURCE), after) == {'circulo'}
+
+
+def test_transitive_helpers_are_included():
+    source = SOURCE + '\n\ndef total(a):\n    return soma(a, 1)\n'
+    after = fingerprints(source.replace('LIMIT = 10', 'LIMIT = 11'))
+    assert changed(fingerprints(source), after) == {'soma', 'total'}
+
+
+def test_nested_module_level_definitions_are_units():
+    source = ('try:\n    import ujson as json\nexcept ImportError:\n    import json\n'
+              '    def fallback(x):\n        return json.dumps(x)\n')
+    assert set(fingerprints(source)) == {'fallback'}
+
+
+def test_incremental_regenerates_units_affected_by_helper_change(agent):
+    manifest = main_cli.IncrementalManifest()
+    first = agent.incremental_generate_tests([('calc.py', SOURCE)], manifest)
+    assert first['results'][0]['success']
+
+    second = agent.incremental_generate_tests([('calc.py', SOURCE.replace('x * 2', 'x * 3'))], manifest)
+    incremental = second['results'][0]['incremental']
+    assert sorted(incremental['regenerated']) == ['dobro', 'soma']
+    assert incremental['reused'] == ['circulo']
@@ -0,0 +1,78 @@
+"""Testes do diário de checkpoint do lote (--resume)."""
+
+import json
+
+import main_cli
+
+CALC = 'def soma(a, b):\n    return a + b\n'
+
+
+def result_for(file_path, test_code='def test_soma():\n    pass\n', success=True):
+    return {'success': success, 'file_path': file_path, 'test_code': test_code,
+            'validation': {'test_count': 1}, 'token_usage': {'prompt_tokens': 10, 'completion_tokens': 5}}
+
+
+def test_resume_skips_unchanged_files_only(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = main_cli.BatchJournal(str(path))
+    assert journal.lookup('calc.py', CALC) is None
+    journal.record(result_for('calc.py'))
+    journal.close()
+
+    resumed = main_cli.BatchJournal(str(path), resume=True)
+    entry = resumed.lookup('calc.py', CALC)
+    assert entry is not None and entry['test_count'] == 1
+    assert main_cli.BatchJournal.as_result(entry)['resumed']
+    assert resumed.lookup('calc.py', CALC + '\n# alterado\n') is None
+    resumed.close()
+
+
+def test_failures_are_not_recorded(tmp_path):
+    journal = main_cli.BatchJournal(str(tmp_path / 'journal.jsonl'))
+    journal.lookup('calc.py', CALC)
+    journal.record(result_for('calc.py', success=False))
+    journal.close()
+    assert main_cli.BatchJournal(str(tmp_path / 'journal.jsonl'), resume=True).completed == {}
+
+
+def test_truncated_last_line_is_ignored(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = main_cli.BatchJournal(str(path))
+    journal.lookup('calc.py', CALC)
+    journal.record(result_for('calc.py'))
+    journal.close()
+    with open(path, 'a', encoding='utf-8') as handle:
+        handle.write(json.dumps({'file_path': 'outro.py'})[:10])
+
+    assert list(main_cli.BatchJournal(str(path), resume=True).completed) == ['calc.py']
+
+
+def test_without_resume_the_journal_starts_empty(tmp_path):
+    path = tmp_path / 'journal.jsonl'
+    journal = main_cli.BatchJournal(str(path))
+    journal.lookup('calc.py', CALC)
+    journal.record(result_for('calc.py'))
+    journal.close()
+
+    main_cli.BatchJournal(str(path)).close()
+    assert path.read_text(encoding='utf-8') == ''
+
+
+def test_batch_resume_does_not_call_the_llm_again(agent, tmp_path, monkeypatch):
+    calls = []
+    call_llm = agent._call_llm
+    monkeypatch.setattr(agent, '_call_llm', lambda prompt, *args: calls.append(prompt) or
+                        call_llm(prompt, *args))
+    monkeypatch.setattr(agent, 'cache', None)
+    code_files = [('calc.py', CALC), ('sub.py', CALC.replace('soma', 'sub').replace('+', '-'))]
+
+    journal = main_cli.BatchJournal(str(tmp_path / 'journal.jsonl'))
+    agent.batch_generate_tests(code_files, journal=journal)
+    journal.close()
+    assert len(calls) == 2
+
+    journal = main_cli.BatchJournal(str(tmp_path / 'journal.jsonl'), resume=True)
+    batch = agent.batch_generate_tests(code_files, journal=journal)
+    journal.close()
+    assert len(calls) == 2
+    assert all(result['resumed'] for result in batch['results'])
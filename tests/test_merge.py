@@ -0,0 +1,60 @@
+"""Testes da geração por unidade (--chunked) e da união dos módulos de teste."""
+
+import ast
+
+import main_cli
+
+
+def test_merge_deduplicates_imports_and_fixtures():
+    first = ('import pytest\nfrom calc import soma\n\n\n@pytest.fixture\ndef valores():\n'
+             '    return [1, 2]\n\n\ndef test_soma(valores):\n    assert soma(*valores) == 3\n')
+    second = ('import pytest\nfrom calc import dobro\n\n\n@pytest.fixture\ndef valores():\n'
+              '    return [1, 2]\n\n\ndef test_dobro():\n    assert dobro(2) == 4\n')
+    merged = main_cli.merge_test_modules([first, second])
+
+    tree = ast.parse(merged)
+    names = [node.name for node in tree.body if isinstance(node, ast.FunctionDef)]
+    assert names == ['valores', 'test_soma', 'test_dobro']
+    assert merged.count('import pytest') == 1
+    assert 'from calc import soma' in merged and 'from calc import dobro' in merged
+
+
+def test_merge_renames_repeated_test_names():
+    module = 'def test_caso():\n    assert True\n'
+    merged = main_cli.merge_test_modules([module, module.replace('True', '1')])
+    names = [node.name for node in ast.parse(merged).body]
+    assert names == ['test_caso', 'test_caso_2']
+
+
+def test_merge_keeps_single_main_guard_at_end():
+    module = "def test_a():\n    pass\n\n\nif __name__ == '__main__':\n    pass\n"
+    merged = main_cli.merge_test_modules([module, module.replace('test_a', 'test_b')])
+    assert merged.count("if __name__ == '__main__'") == 1
+    assert merged.rstrip().endswith('pass')
+    assert main_cli._is_main_guard(ast.parse(merged).body[-1])
+
+
+def test_merge_keeps_invalid_modules_verbatim():
+    merged = main_cli.merge_test_modules(['def test_ok():\n    pass\n', 'def quebrado(:\n'])
+    assert 'def quebrado(:' in merged
+
+
+def test_chunked_regenerates_callers_after_helper_change(agent, monkeypatch):
+    source = ('def dobro(x):\n    return x * 2\n\n\n'
+              'def soma(a, b):\n    return dobro(a) + b\n\n\n'
+              'def negativo(x):\n    return -x\n')
+    prompts = []
+    call_llm = agent._call_llm
+    monkeypatch.setattr(agent, '_call_llm', lambda prompt, *args: prompts.append(prompt) or
+                        call_llm(prompt, *args))
+
+    assert agent.generate_tests_chunked(source, module_name='calc')['success']
+    assert len(prompts) == 3
+
+    prompts.clear()
+    result = agent.generate_tests_chunked(source.replace('x * 2', 'x * 3'), module_name='calc')
+    assert result['success']
+    # negativo não depende de dobro: vem do cache; soma é gerada de novo com o auxiliar alterado
+    assert len(prompts) == 2
+    assert all('x * 3' in prompt for prompt in prompts)
+    assert ast.parse(result['test_code'])
@@ -0,0 +1,53 @@
+"""Testes do ajuste do prompt à janela de contexto."""
+
+import ast
+import threading
+
+import main_cli
+
+BIG_FUNCTION = 'def grande(x):\n    """Docstring."""\n' + ''.join(
+    f'    x = x + {index}  # passo {index}\n' for index in range(400)) + '    return x\n'
+
+
+def budget_for(agent):
+    return main_cli.PromptBudget(agent.config)
+
+
+def test_context_window_by_deployment_prefix():
+    assert main_cli.PromptBudget.context_window_for('gpt-4o-mini') == main_cli.CONTEXT_WINDOWS['gpt-4o']
+    assert main_cli.PromptBudget.context_window_for('modelo-desconhecido') == 8192
+
+
+def test_source_that_fits_is_sent_in_full(agent):
+    fitted = budget_for(agent).fit_source('def f():\n    return 1\n', 1000)
+    assert fitted['mode'] == 'full'
+    assert fitted['tokens'] == fitted['original_tokens']
+
+
+def test_large_bodies_are_summarized_keeping_signatures(agent):
+    source = BIG_FUNCTION + '\n\ndef pequena(y):\n    return y\n'
+    budget = budget_for(agent)
+    fitted = budget.fit_source(source, budget.counter.count(source) // 4)
+
+    assert fitted['mode'] == 'summarized'
+    assert fitted['tokens'] <= budget.counter.count(source) // 4
+    assert 'def grande(x):' in fitted['source'] and 'def pequena(y):' in fitted['source']
+    assert 'corpo omitido' in fitted['source']
+    ast.parse(fitted['source'])
+
+
+def test_source_is_truncated_when_summary_is_not_enough(agent):
+    budget = budget_for(agent)
+    fitted = budget.fit_source(BIG_FUNCTION * 3, 20)
+    assert fitted['mode'] == 'truncated'
+    assert fitted['source'].endswith('(código truncado para caber na janela de contexto)')
+
+
+def test_prompt_budget_is_created_once_under_concurrency(agent):
+    budgets = []
+    threads = [threading.Thread(target=lambda: budgets.append(agent.prompt_budget)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(budget) for budget in budgets}) == 1
@@ -0,0 +1,60 @@
+"""Testes da aplicação de testes corrigidos no ciclo de reparo."""
+
+import ast
+
+import main_cli
+
+MODULE = '''import pytest
+from calc import soma
+
+
+class TestSoma:
+    def test_positivos(self):
+        assert soma(1, 2) == 4
+
+    def test_zero(self):
+        assert soma(0, 0) == 0
+
+
+def test_negativos():
+    assert soma(-1, -1) == -3
+
+
+if __name__ == '__main__':
+    pytest.main()
+'''
+
+
+def test_splice_replaces_methods_and_functions_by_name():
+    fixed = ('class TestSoma:\n    def test_positivos(self):\n        assert soma(1, 2) == 3\n\n\n'
+             'def test_negativos():\n    assert soma(-1, -1) == -2\n')
+    spliced = main_cli.splice_test_functions(MODULE, fixed)
+
+    assert 'soma(1, 2) == 3' in spliced and 'soma(1, 2) == 4' not in spliced
+    assert 'soma(-1, -1) == -2' in spliced and '== -3' not in spliced
+    assert 'def test_zero' in spliced
+    ast.parse(spliced)
+
+
+def test_splice_appends_new_tests_before_main_guard_and_adds_imports():
+    new = ('from calc import sub\n\n\nclass TestSoma:\n    def test_grandes(self):\n'
+           '        assert soma(10, 20) == 30\n\n\ndef test_sub():\n    assert sub(2, 1) == 1\n')
+    spliced = main_cli.splice_test_functions(MODULE, new)
+    tree = ast.parse(spliced)
+
+    assert 'from calc import sub' in spliced
+    test_class = next(node for node in tree.body if isinstance(node, ast.ClassDef))
+    assert [member.name for member in test_class.body] == ['test_positivos', 'test_zero', 'test_grandes']
+    assert [getattr(node, 'name', None) for node in tree.body][-2] == 'test_sub'
+    assert main_cli._is_main_guard(tree.body[-1])
+
+
+def test_extract_failing_tests_keeps_class_header():
+    failures = [{'test': 'test_zero', 'class': 'test_calc.TestSoma', 'message': '', 'traceback': ''},
+                {'test': 'test_negativos', 'class': 'test_calc', 'message': '', 'traceback': ''}]
+    extracted = main_cli.extract_failing_tests(MODULE, failures)
+
+    assert extracted.startswith('class TestSoma:\n    def test_zero')
+    assert 'test_positivos' not in extracted
+    assert 'def test_negativos' in extracted
+    ast.parse(extracted)
@@ -0,0 +1,76 @@
+"""Testes do cache semântico (fingerprints normalizados) por unidade e por módulo."""
+
+import re
+
+import main_cli
+
+ORIGINAL = '''def media(valores):
+    """Média aritmética."""
+    total = sum(valores)
+    return total / len(valores)
+'''
+
+EQUIVALENT = '''def media(valores):
+    # soma e divide
+    acumulado = sum(valores)
+    return acumulado / len(valores)
+'''
+
+
+def test_unit_fingerprint_ignores_docstrings_locals_and_unit_name():
+    renamed = EQUIVALENT.replace('def media', 'def mean')
+    assert (main_cli.CodeAnalyzer.semantic_fingerprint(ORIGINAL, 'media') ==
+            main_cli.CodeAnalyzer.semantic_fingerprint(renamed, 'mean'))
+
+
+def test_unit_fingerprint_keeps_parameters_and_context():
+    fingerprint = main_cli.CodeAnalyzer.semantic_fingerprint
+    assert fingerprint(ORIGINAL, 'media') != fingerprint(ORIGINAL.replace('valores', 'xs'), 'media')
+    assert fingerprint(ORIGINAL, 'media', 'import math') != fingerprint(ORIGINAL, 'media')
+
+
+def test_module_fingerprint_keeps_top_level_names():
+    fingerprint = main_cli.CodeAnalyzer.module_semantic_fingerprint
+    assert fingerprint(ORIGINAL) == fingerprint(EQUIVALENT)
+    assert fingerprint(ORIGINAL) != fingerprint(EQUIVALENT.replace('def media', 'def mean'))
+
+
+def test_rename_identifiers_updates_imports_and_derived_test_names():
+    code = 'from stats_a import media\n\n\nclass TestStatsA:\n    def test_stats_a_media(self):\n        pass\n'
+    renamed = main_cli.rename_identifiers(code, {'stats_a': 'stats_b'})
+    assert 'from stats_b import media' in renamed
+    assert 'class TestStatsB' in renamed and 'def test_stats_b_media' in renamed
+
+
+def fake_llm(calls):
+    """LLM que importa o módulo indicado na linha MÓDULO do prompt."""
+    def call(prompt, *args):
+        calls.append(prompt)
+        module = re.search(r'`from (\w+) import', prompt).group(1)
+        return f'from {module} import media\n\n\ndef test_media():\n    assert media([1, 3]) == 2\n'
+    return call
+
+
+def test_batch_reuses_equivalent_module_without_llm(agent, monkeypatch):
+    calls = []
+    monkeypatch.setattr(agent, '_call_llm', fake_llm(calls))
+
+    first = agent.batch_generate_tests([('stats_a.py', ORIGINAL)])
+    second = agent.batch_generate_tests([('stats_b.py', EQUIVALENT)])
+
+    assert len(calls) == 1
+    result = second['results'][0]
+    assert result['cache_hit'] and result['semantic_hit']
+    assert 'from stats_b import media' in result['test_code']
+    assert second['summary']['semantic_hits'] == 1
+    assert first['summary']['semantic_hits'] == 0
+
+
+def test_semantic_cache_can_be_disabled(agent, monkeypatch):
+    agent.config.performance_config['semantic_cache'] = False
+    calls = []
+    monkeypatch.setattr(agent, '_call_llm', fake_llm(calls))
+
+    agent.batch_generate_tests([('stats_a.py', ORIGINAL)])
+    agent.batch_generate_tests([('stats_b.py', EQUIVALENT)])
+    assert len(calls) == 2
@@ -0,0 +1,76 @@
+"""Testes da API HTTP do modo `serve`: validação de requisições e autenticação."""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+import main_cli
+
+
+@pytest.fixture
+def server(agent):
+    """Servidor em loopback numa porta livre; retorna uma função para enviar requisições."""
+    service = main_cli.AgentService(agent, 'segredo')
+    server = main_cli.create_agent_server(service, '127.0.0.1', 0)
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def request(method, path, body=None, token='segredo'):
+        connection = http.client.HTTPConnection(*server.server_address, timeout=30)
+        headers = {'Content-Type': 'application/json'}
+        if token:
+            headers['Authorization'] = f"Bearer {token}"
+        data = body if isinstance(body, (bytes, type(None))) else json.dumps(body).encode('utf-8')
+        try:
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            return response.status, json.loads(response.read())
+        finally:
+            connection.close()
+
+    yield request
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.mark.parametrize('path', ['/generate', '/analyze'])
+@pytest.mark.parametrize('body', [[1], 'texto', 42, None])
+def test_non_object_body_is_rejected(server, path, body):
+    status, payload = server('POST', path, json.dumps(body).encode('utf-8'))
+    assert status == 400
+    assert 'objeto JSON' in payload['error']
+
+
+@pytest.mark.parametrize('body', [{}, {'source_code': 1}, {'source_code': 'x = 1', 'file_path': 3}])
+def test_invalid_fields_are_rejected(server, body):
+    status, _ = server('POST', '/generate', body)
+    assert status == 400
+
+
+def test_invalid_json_is_rejected(server):
+    status, payload = server('POST', '/analyze', b'{quebrado')
+    assert status == 400
+    assert 'requisição inválida' in payload['error']
+
+
+def test_missing_or_wrong_token_is_unauthorized(server):
+    assert server('POST', '/analyze', {'source_code': 'x = 1'}, token=None)[0] == 401
+    assert server('POST', '/analyze', {'source_code': 'x = 1'}, token='outro')[0] == 401
+
+
+def test_valid_requests_are_served(server):
+    status, analysis = server('POST', '/analyze', {'source_code': 'def f(x):\n    return x\n'})
+    assert status == 200
+    assert analysis['functions'][0]['name'] == 'f'
+
+    status, result = server('POST', '/generate', {'source_code': 'def f(x):\n    return x\n',
+                                                  'file_path': 'mod.py'})
+    assert status == 200
+    assert result['success'] and result['file_path'] == 'mod.py'
+
+
+def test_server_without_token_refuses_non_loopback(agent):
+    with pytest.raises(ValueError):
+        main_cli.create_agent_server(main_cli.AgentService(agent), '0.0.0.0', 0)
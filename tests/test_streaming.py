@@ -0,0 +1,72 @@
+"""Testes do parser incremental da saída do LLM em streaming."""
+
+import main_cli
+
+
+def feed_all(text, size=7):
+    parser = main_cli.StreamingTestParser()
+    for start in range(0, len(text), size):
+        if not parser.feed(text[start:start + size]):
+            break
+    parser.finish()
+    return parser
+
+
+def test_accepts_complete_blocks_inside_fence():
+    text = ('Aqui estão os testes:\n```python\nimport pytest\n\n\ndef test_a():\n    assert 1\n\n\n'
+            '@pytest.mark.parametrize("x", [1, 2])\ndef test_b(x):\n    assert x\n```\nFim.\n')
+    parser = feed_all(text)
+    assert parser.abort_reason is None and parser.finished
+    assert [name for name in ('test_a', 'test_b') if f'def {name}' in parser.code] == ['test_a', 'test_b']
+    assert 'Fim' not in parser.code
+
+
+def test_column_zero_comments_inside_class_are_kept():
+    text = ('```python\nclass TestX:\n    def test_a(self):\n        assert 1\n# --- casos extremos ---\n'
+            '    def test_b(self):\n        assert 2\n# --- mais ---\n    def test_c(self):\n'
+            '        assert 3\n\n\ndef test_d():\n    assert 4\n```\n')
+    parser = feed_all(text)
+    assert parser.abort_reason is None
+    for name in ('test_a', 'test_b', 'test_c', 'test_d'):
+        assert f'def {name}' in parser.code
+
+
+def test_indented_block_is_reattached_to_previous_block():
+    parser = main_cli.StreamingTestParser()
+    parser.blocks = ['class TestX:\n    def test_a(self):\n        pass\n']
+    parser._pending = ['    def test_b(self):\n', '        pass\n']
+    parser._complete_block()
+    assert parser.blocks == ['class TestX:\n    def test_a(self):\n        pass\n'
+                             '    def test_b(self):\n        pass\n']
+    assert parser._prose == 0
+
+
+def test_else_and_except_continue_the_block():
+    text = ('```python\ntry:\n    import numpy\nexcept ImportError:\n    numpy = None\n\n\n'
+            'def test_a():\n    assert 1\n```\n')
+    parser = feed_all(text)
+    assert 'except ImportError' in parser.code and 'def test_a' in parser.code
+
+
+def test_aborts_on_repeated_blocks():
+    block = 'def test_a():\n    assert 1\n\n\n'
+    parser = feed_all('```python\n' + block * 5)
+    assert parser.abort_reason == 'repetição de blocos'
+    assert parser.code.count('def test_a') == 1
+
+
+def test_aborts_on_repeated_lines():
+    parser = feed_all('```python\ndef test_a():\n' + '    assert 1\n' * 20)
+    assert parser.abort_reason == 'repetição de linhas'
+
+
+def test_aborts_on_prose():
+    parser = feed_all('```python\ndef test_a():\n    assert 1\n\n'
+                      'Este teste verifica a soma.\nOutro parágrafo explicativo.\nMais texto.\n')
+    assert parser.abort_reason == 'saída não é Python'
+    assert 'def test_a' in parser.code
+
+
+def test_truncated_final_block_is_dropped():
+    parser = feed_all('```python\ndef test_a():\n    assert 1\n\n\ndef test_b():\n    assert (1 ==\n')
+    assert 'def test_a' in parser.code and 'test_b' not in parser.code
@@ -0,0 +1,95 @@
+"""Testes da gravação em lote (--output-dir) e do lote por unidade."""
+
+import main_cli
+
+CALC = 'def soma(a, b):\n    return a + b\n'
+
+
+def write_tree(root, files):
+    for relative, content in files.items():
+        path = root / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding='utf-8')
+
+
+def test_targets_mirror_the_source_root(tmp_path):
+    writer = main_cli.TestWriter(tmp_path / 'out', tmp_path / 'src')
+    try:
+        assert writer.target(tmp_path / 'src' / 'pkg' / 'util.py') == tmp_path / 'out' / 'pkg' / 'test_util.py'
+    finally:
+        writer.close()
+
+
+def test_colliding_targets_get_a_suffix(tmp_path):
+    writer = main_cli.TestWriter(tmp_path / 'out')
+    try:
+        first = writer.target(tmp_path / 'a' / 'util.py')
+        second = writer.target(tmp_path / 'b' / 'util.py')
+        assert first.name == 'test_util.py'
+        assert second.name == 'test_util_2.py'
+        assert writer.target(tmp_path / 'a' / 'util.py') == first
+    finally:
+        writer.close()
+
+
+def test_reserved_targets_are_kept(tmp_path):
+    writer = main_cli.TestWriter(tmp_path / 'out')
+    try:
+        writer.reserve(tmp_path / 'b' / 'util.py', tmp_path / 'out' / 'test_util.py')
+        assert writer.target(tmp_path / 'a' / 'util.py').name == 'test_util_2.py'
+    finally:
+        writer.close()
+
+
+def test_submit_writes_atomically_and_notifies(tmp_path):
+    written = []
+    writer = main_cli.TestWriter(tmp_path / 'out', tmp_path)
+    target = writer.submit(tmp_path / 'calc.py', 'def test_x():\n    pass\n', lambda: written.append(1))
+    writer.close()
+    assert target.read_text(encoding='utf-8') == 'def test_x():\n    pass\n'
+    assert written == [1]
+    assert not list((tmp_path / 'out').glob('.*.tmp'))
+
+
+def test_should_write_skips_modules_without_units_or_tests():
+    ok = {'success': True, 'test_code': 'def test_a():\n    pass\n',
+          'code_analysis': {'functions': [{'name': 'a'}], 'classes': []},
+          'validation': {'test_count': 1}}
+    assert main_cli.TestWriter.should_write(ok)
+    assert not main_cli.TestWriter.should_write(dict(ok, validation={'test_count': 0}))
+    assert not main_cli.TestWriter.should_write(dict(ok, code_analysis={'functions': [], 'classes': []}))
+    assert not main_cli.TestWriter.should_write(dict(ok, success=False))
+
+
+def test_batch_output_skips_empty_init_and_keeps_duplicate_names(isolated_env, monkeypatch):
+    src = isolated_env / 'src'
+    write_tree(src, {'pkg/__init__.py': '', 'a/util.py': CALC, 'b/util.py': CALC.replace('soma', 'sub')})
+    monkeypatch.setenv('BATCH_OUTPUT_DIR', str(isolated_env / 'out'))
+    cli = main_cli.TestGeneratorCLI()
+
+    files = main_cli.iter_code_files(main_cli.iter_python_files(src))
+    summary = cli._process_batch_generation(files, source_root=src)
+
+    assert summary['successful'] == 3
+    written = sorted(str(path.relative_to(isolated_env / 'out'))
+                     for path in (isolated_env / 'out').rglob('test_*.py'))
+    assert written == ['a/test_util.py', 'b/test_util.py']
+
+
+def test_incremental_reports_each_file_before_later_units_start(agent):
+    events = []
+    timed_generate = agent._timed_generate
+
+    def spy(code_file):
+        events.append(('gerar', code_file[0]))
+        return timed_generate(code_file)
+
+    agent._timed_generate = spy
+    agent._supports_async = lambda: False
+    later = ''.join(f'\n\ndef f{index}(x):\n    return x + {index}\n' for index in range(4))
+    agent.incremental_generate_tests([('a.py', CALC), ('b.py', later)], main_cli.IncrementalManifest(),
+                                     max_workers=1,
+                                     on_result=lambda result: events.append(('pronto', result['file_path'])))
+
+    assert events.index(('pronto', 'a.py')) < events.index(('gerar', 'b.py::f3'))
+    assert events[-1] == ('pronto', 'b.py')